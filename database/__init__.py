@@ -1,4 +1,6 @@
 from .init_db import init_database
+from .migrations import migrate, SCHEMA_VERSION
 from .db_manager import DBManager, db_manager
+from .snapshot import export_snapshot, import_snapshot
 
-__all__ = ['init_database', 'DBManager', 'db_manager']
\ No newline at end of file
+__all__ = ['init_database', 'migrate', 'SCHEMA_VERSION', 'DBManager', 'db_manager', 'export_snapshot', 'import_snapshot']
\ No newline at end of file
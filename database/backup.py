@@ -0,0 +1,186 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from .db_manager import db_manager
+
+class BackupManager:
+    """
+    数据库在线热备份管理器
+    
+    使用 sqlite3 的 backup 接口分步复制页面，每一步之间释放源库的锁，
+    程序运行中也能得到一致的备份。备份先写入临时文件，通过
+    PRAGMA integrity_check 校验后才改为正式文件名，并只保留最近 keep 份。
+    """
+    
+    def __init__(self, manager=db_manager, backup_dir=None, keep=7, pages=256, sleep=0.005):
+        """
+        初始化备份管理器
+        
+        backup_dir 默认为数据库所在目录下的 backups 目录；pages 为每一步复制的页数，
+        sleep 为两步之间让出的秒数。
+        """
+        self.manager = manager
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.pages = pages
+        self.sleep = sleep
+        self._thread = None
+    
+    def get_backup_dir(self):
+        """
+        获取备份目录
+        """
+        if self.backup_dir:
+            return self.backup_dir
+        return os.path.join(os.path.dirname(os.path.abspath(self.manager.db_path)), 'backups')
+    
+    def _prefix(self):
+        """
+        备份文件名前缀，与数据库文件名一致
+        """
+        return os.path.splitext(os.path.basename(self.manager.db_path))[0] + '_'
+    
+    def list_backups(self):
+        """
+        获取已有的备份文件，按时间从旧到新排列
+        """
+        backup_dir = self.get_backup_dir()
+        if not os.path.isdir(backup_dir):
+            return []
+        prefix = self._prefix()
+        names = sorted(name for name in os.listdir(backup_dir)
+                       if name.startswith(prefix) and name.endswith('.db'))
+        return [os.path.join(backup_dir, name) for name in names]
+    
+    def verify(self, path):
+        """
+        校验备份文件的完整性，返回 (是否通过, 校验结果)
+        """
+        conn = sqlite3.connect(path)
+        try:
+            rows = conn.execute('PRAGMA integrity_check').fetchall()
+        finally:
+            conn.close()
+        result = '; '.join(row[0] for row in rows)
+        return result == 'ok', result
+    
+    def rotate(self):
+        """
+        删除超出保留份数的旧备份，返回被删除的文件
+        """
+        backups = self.list_backups()
+        removed = backups[:max(len(backups) - self.keep, 0)]
+        for path in removed:
+            os.remove(path)
+        return removed
+    
+    def run_backup(self, progress=None):
+        """
+        执行一次备份并返回备份文件路径，可以在任意线程中调用
+        
+        每复制一步调用 progress(已复制页数, 总页数)。校验失败时删除临时文件并抛出异常。
+        """
+        backup_dir = self.get_backup_dir()
+        os.makedirs(backup_dir, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        path = os.path.join(backup_dir, f'{self._prefix()}{stamp}.db')
+        temp_path = path + '.tmp'
+        
+        def report(status, remaining, total):
+            if progress:
+                progress(total - remaining, total)
+        
+        source = sqlite3.connect(self.manager.db_path)
+        target = sqlite3.connect(temp_path)
+        try:
+            source.backup(target, pages=self.pages, progress=report, sleep=self.sleep)
+        finally:
+            target.close()
+            source.close()
+        
+        ok, result = self.verify(temp_path)
+        if not ok:
+            os.remove(temp_path)
+            raise Exception(f'备份校验失败: {result}')
+        os.replace(temp_path, path)
+        self.rotate()
+        return path
+    
+    def start_backup(self, progress=None, finished=None, failed=None):
+        """
+        在后台线程中执行备份，已有备份在进行时返回 False
+        
+        完成时调用 finished(备份文件路径)，失败时调用 failed(错误信息)。
+        回调在后台线程中执行，界面代码应通过 Qt 信号转回主线程。
+        """
+        if self.is_running():
+            return False
+        
+        def worker():
+            try:
+                path = self.run_backup(progress)
+            except Exception as e:
+                if failed:
+                    failed(str(e))
+                return
+            if finished:
+                finished(path)
+        
+        self._thread = threading.Thread(target=worker, name='db-backup', daemon=True)
+        self._thread.start()
+        return True
+    
+    def is_running(self):
+        """
+        是否有备份正在进行
+        """
+        return self._thread is not None and self._thread.is_alive()
+    
+    def wait(self, timeout=None):
+        """
+        等待后台备份结束
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+# 全局备份管理器实例
+backup_manager = BackupManager()
+
+# 测试函数
+def test_backup_while_writing(rows=200000, writes=200):
+    """
+    测试备份期间主线程写入的等待时间
+    """
+    import tempfile
+    
+    original_path = db_manager.db_path
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_manager.switch_database(os.path.join(tmp_dir, 'bench.db'))
+        with db_manager as db:
+            db.execute('CREATE TABLE bench (id INTEGER PRIMARY KEY, value TEXT)')
+            db.cursor.executemany('INSERT INTO bench (value) VALUES (?)',
+                                  ((f'row {i}' * 4,) for i in range(rows)))
+        
+        manager = BackupManager(db_manager, backup_dir=os.path.join(tmp_dir, 'backups'), keep=2)
+        results = {}
+        manager.start_backup(finished=lambda path: results.setdefault('path', path),
+                             failed=lambda error: results.setdefault('error', error))
+        start = time.perf_counter()
+        worst_wait = 0.0
+        for i in range(writes):
+            begin = time.perf_counter()
+            with db_manager as db:
+                db.execute('INSERT INTO bench (value) VALUES (?)', ('during backup',))
+            worst_wait = max(worst_wait, time.perf_counter() - begin)
+        manager.wait()
+        elapsed = time.perf_counter() - start
+        db_manager.close_all()
+        print(f"备份结果: {results}, 写入 {writes} 次耗时 {elapsed:.2f} s, 单次最长等待 {worst_wait * 1000:.1f} ms")
+    
+    db_manager.switch_database(original_path)
+    return worst_wait
+
+if __name__ == "__main__":
+    test_backup_while_writing()
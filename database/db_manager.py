@@ -1,37 +1,134 @@
 import sqlite3
 import os
+import threading
+import time
+
+# 默认连接参数
+# WAL 让长时间的统计查询不再阻塞写入，NORMAL 同步在 WAL 下只在检查点时落盘。
+# 注意：WAL 依赖共享内存，多台电脑通过网络共享同时打开同一个数据库时
+# 应改用 {'journal_mode': 'DELETE', 'synchronous': 'FULL'}。
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
+# 每个线程最多缓存的查询结果数，超出时整体清空
+QUERY_CACHE_SIZE = 256
 
 class DBManager:
     """
     数据库管理器，负责处理数据库连接和基本操作
+    
+    每个线程持有一个长期复用的连接，`with db_manager` 只开启事务作用域，
+    退出时提交或回滚，不再关闭连接。最外层作用域用 BEGIN 开启事务，
+    作用域可以嵌套，内层作用域使用 SAVEPOINT，失败时只回滚自身的修改，
+    成功时其修改随最外层作用域一起提交或回滚。
+    
+    fetch_cached 提供按线程的查询结果缓存，本连接写入、回滚或其他连接
+    （包括其他进程）提交写入后自动失效。
     """
     
-    def __init__(self, db_path='schedule.db'):
+    def __init__(self, db_path='schedule.db', pragmas=None):
         """
         初始化数据库管理器
+        
+        pragmas 用于覆盖 DEFAULT_PRAGMAS 中的连接参数，值为 None 表示不设置该项。
         """
         self.db_path = db_path
-        self.conn = None
-        self.cursor = None
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        # 物理连接次数和事务作用域次数，用于统计每个界面操作的开销
+        self.connect_count = 0
+        self.scope_count = 0
+        self.query_hits = 0
+        self.query_misses = 0
+    
+    @property
+    def conn(self):
+        """
+        当前线程的连接
+        """
+        return getattr(self._local, 'conn', None)
+    
+    @property
+    def cursor(self):
+        """
+        当前线程的游标
+        """
+        return getattr(self._local, 'cursor', None)
     
     def connect(self):
         """
-        连接数据库
+        连接数据库，当前线程已有连接时直接复用
         """
-        self.conn = sqlite3.connect(self.db_path)
-        self.cursor = self.conn.cursor()
+        if self.conn is not None:
+            return self.conn
+        
+        conn = sqlite3.connect(self.db_path)
         # 启用外键约束
-        self.cursor.execute('PRAGMA foreign_keys = ON')
-        return self.conn
+        conn.execute('PRAGMA foreign_keys = ON')
+        self.apply_pragmas(conn)
+        self._local.conn = conn
+        self._local.cursor = conn.cursor()
+        self._local.depth = 0
+        self._local.query_cache = {}
+        self._local.query_version = None
+        with self._lock:
+            self._connections.append(conn)
+            self.connect_count += 1
+        return conn
+    
+    def apply_pragmas(self, conn):
+        """
+        将连接参数应用到连接上
+        """
+        for name, value in self.pragmas.items():
+            if value is not None:
+                conn.execute(f'PRAGMA {name} = {value}')
     
     def disconnect(self):
         """
-        断开数据库连接
+        断开当前线程的数据库连接
         """
-        if self.conn:
-            self.conn.close()
-            self.conn = None
-            self.cursor = None
+        conn = self.conn
+        if conn:
+            conn.close()
+            with self._lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+            self._local.conn = None
+            self._local.cursor = None
+            self._local.depth = 0
+    
+    def close_all(self):
+        """
+        关闭所有线程的连接，程序退出时调用
+        """
+        with self._lock:
+            connections = self._connections
+            self._connections = []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # 其他线程创建的连接只能由该线程关闭，交给垃圾回收
+                pass
+        self._local = threading.local()
+    
+    def switch_database(self, db_path):
+        """
+        切换到另一个数据库文件，已有连接全部关闭
+        """
+        self.close_all()
+        self.db_path = db_path
     
     def execute(self, query, params=None):
         """
@@ -52,6 +149,14 @@ class DBManager:
         if self.conn:
             self.conn.commit()
     
+    def rollback(self):
+        """
+        回滚事务
+        """
+        if self.conn:
+            self.conn.rollback()
+            self.invalidate_query_cache()
+    
     def fetch_all(self, query, params=None):
         """
         执行查询并返回所有结果
@@ -66,26 +171,122 @@ class DBManager:
         self.execute(query, params)
         return self.cursor.fetchone()
     
+    def iter_query(self, query, params=None, size=1000):
+        """
+        逐行返回查询结果，每次从游标取 size 行，适合导出等大结果集
+        
+        使用独立游标，迭代期间仍可在同一连接上执行其他查询。
+        """
+        cursor = self.connect().cursor()
+        try:
+            cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+    
+    def fetch_cached(self, query, params=None):
+        """
+        执行只读查询并缓存结果，数据库没有变化时直接返回缓存的结果
+        
+        缓存键为 SQL 和参数。每次调用先比较 PRAGMA data_version（其他连接提交的写入）
+        和连接的 total_changes（本连接的写入），任一变化即清空缓存。
+        返回的列表与缓存共享，调用方不要修改。
+        """
+        conn = self.connect()
+        version = (conn.execute('PRAGMA data_version').fetchone()[0], conn.total_changes)
+        cache = self._local.query_cache
+        if self._local.query_version != version:
+            cache.clear()
+            self._local.query_version = version
+        
+        if isinstance(params, dict):
+            key = (query, tuple(sorted(params.items())))
+        else:
+            key = (query, tuple(params) if params else ())
+        rows = cache.get(key)
+        if rows is None:
+            self.query_misses += 1
+            rows = self.fetch_all(query, params)
+            if len(cache) >= QUERY_CACHE_SIZE:
+                cache.clear()
+            cache[key] = rows
+        else:
+            self.query_hits += 1
+        return rows
+    
+    def invalidate_query_cache(self):
+        """
+        清空当前线程的查询结果缓存
+        
+        回滚不会减少 total_changes，因此回滚后必须显式清空。
+        """
+        cache = getattr(self._local, 'query_cache', None)
+        if cache is not None:
+            cache.clear()
+            self._local.query_version = None
+    
     def get_last_insert_id(self):
         """
         获取最后插入的ID
         """
         return self.cursor.lastrowid
     
+    def get_stats(self):
+        """
+        获取连接统计信息
+        """
+        return {
+            'connect_count': self.connect_count,
+            'scope_count': self.scope_count,
+            'open_connections': len(self._connections),
+            'query_hits': self.query_hits,
+            'query_misses': self.query_misses,
+        }
+    
+    def reset_stats(self):
+        """
+        重置连接统计信息
+        """
+        self.connect_count = 0
+        self.scope_count = 0
+        self.query_hits = 0
+        self.query_misses = 0
+    
     def __enter__(self):
         """
-        进入上下文管理器
+        进入上下文管理器，开启一个（可嵌套的）事务作用域
         """
         self.connect()
+        depth = self._local.depth
+        if depth > 0:
+            self.cursor.execute(f'SAVEPOINT scope_{depth}')
+        elif not self.conn.in_transaction:
+            # 外层只读时若不开启事务，内层 SAVEPOINT 会自行开启事务并在 RELEASE 时提交，
+            # 外层之后回滚也无法撤销内层的写入
+            self.cursor.execute('BEGIN')
+        self._local.depth = depth + 1
+        self.scope_count += 1
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         """
-        退出上下文管理器
+        退出上下文管理器，提交或回滚但保留连接
         """
-        if exc_type is None:
+        depth = self._local.depth - 1
+        self._local.depth = depth
+        if depth > 0:
+            if exc_type is not None:
+                self.cursor.execute(f'ROLLBACK TO scope_{depth}')
+                self.invalidate_query_cache()
+            self.cursor.execute(f'RELEASE scope_{depth}')
+        elif exc_type is None:
             self.commit()
-        self.disconnect()
+        else:
+            self.rollback()
 
 # 全局数据库管理器实例
 db_manager = DBManager()
@@ -107,7 +308,106 @@ def test_db_connection():
         print("数据库表:")
         for row in result:
             print(f"- {row[0]}")
+        
+        # 嵌套作用域复用同一连接
+        with db as inner:
+            inner.fetch_one('SELECT 1')
+        print(f"连接统计: {db.get_stats()}")
         print("数据库连接测试成功！")
 
+def test_nested_rollback():
+    """
+    测试外层作用域只读、内层写入成功后外层出错时，内层的写入随外层一起回滚
+    """
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = DBManager(os.path.join(tmp_dir, 'test.db'))
+        with manager as db:
+            db.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, value TEXT)')
+        
+        try:
+            with manager as db:
+                db.fetch_one('SELECT COUNT(*) FROM items')
+                with db as inner:
+                    inner.execute('INSERT INTO items (value) VALUES (?)', ('inner',))
+                raise ValueError('outer failed')
+        except ValueError:
+            pass
+        
+        # 内层失败只回滚内层，外层的写入照常提交
+        with manager as db:
+            db.execute('INSERT INTO items (value) VALUES (?)', ('outer',))
+            try:
+                with db as inner:
+                    inner.execute('INSERT INTO items (value) VALUES (?)', ('discarded',))
+                    raise ValueError('inner failed')
+            except ValueError:
+                pass
+        
+        with manager as db:
+            values = [row[0] for row in db.fetch_all('SELECT value FROM items ORDER BY id')]
+        manager.close_all()
+    
+    assert values == ['outer'], values
+    print("嵌套作用域回滚测试通过")
+
+def benchmark_pragma_profiles(writes=500, hold=0.5):
+    """
+    对比默认连接参数与调优参数的写入吞吐量和读写并发
+    
+    写入吞吐量：逐条提交 writes 次单行写入。
+    读写并发：一个读事务持有 hold 秒期间，另一线程提交写入的最大等待时间。
+    """
+    import tempfile
+    
+    # SQLite 自身默认值：回滚日志 + FULL 同步
+    legacy = {name: None for name in DEFAULT_PRAGMAS}
+    legacy['journal_mode'] = 'DELETE'
+    legacy['busy_timeout'] = 10000
+    profiles = [('默认参数', legacy), ('调优参数', {})]
+    
+    results = {}
+    for label, pragmas in profiles:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            manager = DBManager(os.path.join(tmp_dir, 'bench.db'), pragmas=pragmas)
+            with manager as db:
+                db.execute('CREATE TABLE bench (id INTEGER PRIMARY KEY, value TEXT)')
+            
+            # 写入吞吐量
+            start = time.perf_counter()
+            for i in range(writes):
+                with manager as db:
+                    db.execute('INSERT INTO bench (value) VALUES (?)', (f'row {i}',))
+            write_rate = writes / (time.perf_counter() - start)
+            
+            # 读写并发
+            reading = threading.Event()
+            
+            def long_read():
+                with manager as db:
+                    db.fetch_one('SELECT COUNT(*) FROM bench')
+                    reading.set()
+                    time.sleep(hold)
+                manager.disconnect()
+            
+            reader = threading.Thread(target=long_read)
+            reader.start()
+            reading.wait()
+            worst_wait = 0.0
+            for i in range(10):
+                start = time.perf_counter()
+                with manager as db:
+                    db.execute('INSERT INTO bench (value) VALUES (?)', ('concurrent',))
+                worst_wait = max(worst_wait, time.perf_counter() - start)
+            reader.join()
+            manager.close_all()
+        
+        results[label] = (write_rate, worst_wait)
+        print(f"{label}: 写入 {write_rate:.0f} 次/秒, 读事务期间写入最长等待 {worst_wait * 1000:.1f} ms")
+    return results
+
 if __name__ == "__main__":
-    test_db_connection()
\ No newline at end of file
+    test_db_connection()
+    test_nested_rollback()
+    benchmark_pragma_profiles()
\ No newline at end of file
@@ -1,125 +1,46 @@
 import sqlite3
 import os
+from .migrations import migrate, get_schema_version, ensure_fts_tables, SCHEMA_VERSION
+
+# 本进程内已确认为最新结构的数据库路径
+_current_databases = set()
 
 def init_database(db_path='schedule.db'):
     """
-    初始化数据库，创建所需的数据表
+    初始化数据库，按版本执行所需的数据表和索引迁移
+    
+    数据库已是最新版本时只读取一次 user_version 即返回，不执行任何DDL。
     """
+    key = os.path.abspath(db_path)
+    if key in _current_databases:
+        return []
+    
     # 检查数据库文件是否存在
     db_exists = os.path.exists(db_path)
     
     # 连接数据库
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # 创建学生表
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS students (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        contact TEXT,
-        tags TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-    
-    # 创建教师表
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS teachers (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        contact TEXT,
-        subject_types TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-    
-    # 创建课程表
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS courses (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        teacher_id INTEGER,
-        class_name TEXT,
-        course_type TEXT,
-        start_time TEXT,
-        end_time TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (teacher_id) REFERENCES teachers (id)
-    )''')
-    
-    # 创建教材表
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS textbooks (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        price REAL,
-        description TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-    
-    # 创建时间可用表
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS available_times (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        person_id INTEGER,
-        person_type TEXT,
-        day_of_week INTEGER,
-        start_time TEXT,
-        end_time TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-    
-    # 创建备忘录表
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS memos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        content TEXT NOT NULL,
-        date TEXT NOT NULL,
-        font_size INTEGER DEFAULT 12,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-    
-    # 创建学生-班级关联表
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS student_classes (
-        student_id INTEGER,
-        class_name TEXT,
-        PRIMARY KEY (student_id, class_name),
-        FOREIGN KEY (student_id) REFERENCES students (id)
-    )''')
-    
-    # 创建课程-学生关联表
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS course_students (
-        course_id INTEGER,
-        student_id INTEGER,
-        PRIMARY KEY (course_id, student_id),
-        FOREIGN KEY (course_id) REFERENCES courses (id),
-        FOREIGN KEY (student_id) REFERENCES students (id)
-    )''')
     
-    # 创建学生-教材关联表
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS student_textbooks (
-        student_id INTEGER,
-        textbook_id INTEGER,
-        is_issued INTEGER DEFAULT 0,
-        is_paid INTEGER DEFAULT 0,
-        PRIMARY KEY (student_id, textbook_id),
-        FOREIGN KEY (student_id) REFERENCES students (id),
-        FOREIGN KEY (textbook_id) REFERENCES textbooks (id)
-    )''')
+    # 结构已是最新时直接返回（只补建旧版 SQLite 上跳过的全文索引）
+    if db_exists and get_schema_version(conn) >= SCHEMA_VERSION:
+        ensure_fts_tables(conn)
+        conn.close()
+        _current_databases.add(key)
+        return []
     
-    # 提交事务
-    conn.commit()
+    # 执行未应用的迁移
+    applied = migrate(conn)
+    ensure_fts_tables(conn)
     
     # 关闭连接
     conn.close()
+    _current_databases.add(key)
     
     if not db_exists:
         print(f"数据库 {db_path} 已创建并初始化成功！")
     else:
-        print(f"数据库 {db_path} 已存在，表结构已更新！")
+        print(f"数据库 {db_path} 已存在，已升级到版本 {applied[-1]}！")
+    return applied
 
 if __name__ == "__main__":
     init_database()
\ No newline at end of file
@@ -0,0 +1,549 @@
+import sqlite3
+from utils.tools import split_list, time_to_minutes, minutes_to_time
+
+def add_column(table, column, definition):
+    """
+    生成可重复执行的加列迁移步骤，列已存在时跳过
+    """
+    def step(conn):
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+        if column not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return step
+
+# 全文索引的数据表和列，索引表名为 <表名>_fts
+FTS_TABLES = {
+    'students': ['name', 'contact', 'tags'],
+    'teachers': ['name', 'contact', 'subject_types'],
+    'textbooks': ['name', 'description'],
+    'memos': ['content'],
+}
+
+def fts_deferred_key(table):
+    """
+    settings 表中暂停某表全文索引和短关键词索引插入触发器的标记键
+    
+    批量写入在同一事务中写入该标记、插入数据、一次补齐索引后删除标记，
+    其他连接看不到标记，也不需要修改触发器（DDL）。
+    """
+    return f'fts_deferred_{table}'
+
+def create_fts_insert_trigger(conn, table):
+    """
+    创建全文索引的插入触发器，存在批量写入标记时不触发
+    """
+    fts = f'{table}_fts'
+    names = ', '.join(FTS_TABLES[table])
+    new_values = ', '.join(f'NEW.{column}' for column in FTS_TABLES[table])
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {table}
+        WHEN NOT EXISTS (SELECT 1 FROM settings WHERE key = '{fts_deferred_key(table)}')
+        BEGIN
+            INSERT INTO {fts} (rowid, {names}) VALUES (NEW.id, {new_values});
+        END""")
+
+def recreate_fts_insert_triggers(conn):
+    """
+    将已有全文索引的插入触发器改为支持批量写入标记的版本
+    """
+    for table in FTS_TABLES:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (f'{table}_fts',)).fetchone():
+            conn.execute(f'DROP TRIGGER IF EXISTS trg_{table}_fts_insert')
+            create_fts_insert_trigger(conn, table)
+
+def create_fts_tables(conn):
+    """
+    创建 trigram 全文索引表及同步触发器并填充现有数据，返回是否已创建
+    
+    SQLite 不支持 FTS5 trigram 分词器（3.34 之前）时跳过，搜索会回退为 LIKE；
+    之后 SQLite 升级时由 ensure_fts_tables 补建。
+    """
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts_probe USING fts5(x, tokenize='trigram')")
+        conn.execute('DROP TABLE temp.fts_probe')
+    except sqlite3.OperationalError:
+        return False
+    
+    for table, columns in FTS_TABLES.items():
+        fts = f'{table}_fts'
+        names = ', '.join(columns)
+        new_values = ', '.join(f'NEW.{column}' for column in columns)
+        old_values = ', '.join(f'OLD.{column}' for column in columns)
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {names}, content='{table}', content_rowid='id', tokenize='trigram'
+            )""")
+        create_fts_insert_trigger(conn, table)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', OLD.id, {old_values});
+            END""")
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE OF {names} ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', OLD.id, {old_values});
+                INSERT INTO {fts} (rowid, {names}) VALUES (NEW.id, {new_values});
+            END""")
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+    return True
+
+def ensure_fts_tables(conn):
+    """
+    补建缺失的全文索引，返回是否补建
+    
+    迁移 6 在不支持 trigram 的 SQLite 上跳过建表但版本号照常更新，
+    SQLite 升级后由数据库初始化调用此函数补建。已全部存在时只读取一次 sqlite_master。
+    """
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    if all(f'{table}_fts' in existing for table in FTS_TABLES):
+        return False
+    try:
+        conn.execute('BEGIN')
+        created = create_fts_tables(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return created
+
+# 短关键词索引的最大长度：trigram 只能匹配不少于 3 个字符的关键词，
+# 1～2 个字符的关键词改查 <表名>_grams 中各列的单字和双字（ASCII 转小写，与 LIKE 一致）
+MAX_GRAM_LENGTH = 2
+
+def gram_select(table, source, from_table=False, condition=None):
+    """
+    生成取出一行中各全文索引列所有单字和双字的 SELECT 语句，列为 (列序号, 字, 行 ID)
+    
+    source 为行的来源：触发器中为 NEW/OLD，from_table 为 True 时为数据表的别名，
+    condition 为附加的筛选条件。触发器中不能使用递归 CTE，这里用长度为 n 的
+    JSON 数组（由 zeroblob(n) 展开）生成 0～n-1 的位置序列。
+    """
+    parts = []
+    for index, column in enumerate(FTS_TABLES[table]):
+        value = f'{source}.{column}'
+        length = f'IFNULL(length({value}), 0)'
+        positions = f"'[' || substr(replace(hex(zeroblob({length})), '00', '0,'), 1, 2 * {length} - 1) || ']'"
+        sources = f'{table} {source}, ' if from_table else ''
+        where = f' AND {condition}' if condition else ''
+        parts.append(f"""
+            SELECT {index}, lower(substr({value}, p.key + 1, w.n)), {source}.id
+            FROM {sources}json_each({positions}) p,
+                 (SELECT 1 AS n UNION ALL SELECT {MAX_GRAM_LENGTH}) w
+            WHERE p.key + w.n <= {length}{where}""")
+    return ' UNION ALL '.join(parts)
+
+def create_gram_tables(conn):
+    """
+    创建短关键词索引表及同步触发器并填充现有数据
+    
+    插入触发器与全文索引共用批量写入标记，批量写入后由 models.search.executemany_indexed 一次补齐。
+    """
+    for table, columns in FTS_TABLES.items():
+        grams = f'{table}_grams'
+        names = ', '.join(columns)
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {grams} (
+                column_index INTEGER,
+                gram TEXT,
+                row_id INTEGER,
+                PRIMARY KEY (gram, column_index, row_id)
+            ) WITHOUT ROWID""")
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{grams}_insert AFTER INSERT ON {table}
+            WHEN NOT EXISTS (SELECT 1 FROM settings WHERE key = '{fts_deferred_key(table)}')
+            BEGIN
+                INSERT OR IGNORE INTO {grams} (column_index, gram, row_id) {gram_select(table, 'NEW')};
+            END""")
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{grams}_delete AFTER DELETE ON {table} BEGIN
+                DELETE FROM {grams} WHERE (column_index, gram, row_id) IN ({gram_select(table, 'OLD')});
+            END""")
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{grams}_update AFTER UPDATE OF {names} ON {table} BEGIN
+                DELETE FROM {grams} WHERE (column_index, gram, row_id) IN ({gram_select(table, 'OLD')});
+                INSERT OR IGNORE INTO {grams} (column_index, gram, row_id) {gram_select(table, 'NEW')};
+            END""")
+        fill_gram_table(conn, table)
+
+def fill_gram_table(conn, table, after_id=0):
+    """
+    写入 id 大于 after_id 的行的短关键词索引
+    """
+    conn.execute(f'INSERT OR IGNORE INTO {table}_grams (column_index, gram, row_id) '
+                 f'{gram_select(table, "t", from_table=True, condition=f"t.id > {int(after_id)}")}')
+
+# 逗号分隔的列表列及其规范化关联表：表名 -> (列表列, 关联表, 关联表外键列, 关联表值列)
+LIST_TABLES = {
+    'students': ('tags', 'student_tags', 'student_id', 'tag'),
+    'teachers': ('subject_types', 'teacher_subjects', 'teacher_id', 'subject'),
+}
+
+def sync_list_table(conn, table, after_id=0):
+    """
+    按列表列重建 id 大于 after_id 的行在关联表中的记录
+    
+    用于迁移时回填和批量写入后同步；单行保存由模型自行维护。
+    """
+    column, link_table, owner_column, value_column = LIST_TABLES[table]
+    conn.execute(f'DELETE FROM {link_table} WHERE {owner_column} > ?', (after_id,))
+    rows = conn.execute(f'SELECT id, {column} FROM {table} WHERE id > ?', (after_id,)).fetchall()
+    conn.executemany(
+        f'INSERT OR IGNORE INTO {link_table} ({owner_column}, {value_column}) VALUES (?, ?)',
+        ((row_id, item) for row_id, text in rows for item in split_list(text))
+    )
+
+def backfill_list_tables(conn):
+    """
+    从现有的逗号分隔字符串回填标签和课程类型关联表
+    """
+    for table in LIST_TABLES:
+        sync_list_table(conn, table)
+
+# 补零的 'YYYY-MM-DD HH:MM' 转换为自 1970-01-01 起的分钟数，与 utils.tools.time_to_minutes 一致。
+# strftime 不接受未补零的时间，写入前需先规范化（见 backfill_course_minutes）
+MINUTES_SQL = "CAST(strftime('%s', {column}) AS INTEGER) / 60"
+
+def backfill_course_minutes(conn):
+    """
+    用 time_to_minutes 换算课程的分钟列，并把时间改写为补零的 'YYYY-MM-DD HH:MM'
+    
+    早期的 CSV 导入会写入 '2024-1-16 9:00' 这类时间，SQLite 的 strftime 无法解析，
+    因此不用 SQL 换算。无法解析的课程不写入分钟列，逐条打印以便手动修正。
+    """
+    updates = []
+    invalid = []
+    rows = conn.execute('SELECT id, start_time, end_time, start_minute, end_minute FROM courses')
+    for course_id, start_time, end_time, start_minute, end_minute in rows:
+        start, end = time_to_minutes(start_time), time_to_minutes(end_time)
+        if start is None or end is None:
+            invalid.append((course_id, start_time, end_time))
+            continue
+        row = (minutes_to_time(start), minutes_to_time(end), start, end)
+        if row != (start_time, end_time, start_minute, end_minute):
+            updates.append(row + (course_id,))
+    conn.executemany('UPDATE courses SET start_time=?, end_time=?, start_minute=?, end_minute=? WHERE id=?',
+                     updates)
+    for course_id, start_time, end_time in invalid:
+        print(f"课程 {course_id} 的时间无法解析（{start_time} ~ {end_time}），未参与冲突检测和课表显示，请手动修正")
+
+# 数据库迁移列表，按版本号顺序执行
+# 每个迁移为 (版本号, 说明, 语句列表)，语句必须可以重复执行
+MIGRATIONS = [
+    (1, '创建基础数据表', [
+        '''
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            contact TEXT,
+            tags TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS teachers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            contact TEXT,
+            subject_types TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS courses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            teacher_id INTEGER,
+            class_name TEXT,
+            course_type TEXT,
+            start_time TEXT,
+            end_time TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (teacher_id) REFERENCES teachers (id)
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS textbooks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            price REAL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS available_times (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            person_id INTEGER,
+            person_type TEXT,
+            day_of_week INTEGER,
+            start_time TEXT,
+            end_time TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS memos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            content TEXT NOT NULL,
+            date TEXT NOT NULL,
+            font_size INTEGER DEFAULT 12,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS student_classes (
+            student_id INTEGER,
+            class_name TEXT,
+            PRIMARY KEY (student_id, class_name),
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS course_students (
+            course_id INTEGER,
+            student_id INTEGER,
+            PRIMARY KEY (course_id, student_id),
+            FOREIGN KEY (course_id) REFERENCES courses (id),
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS student_textbooks (
+            student_id INTEGER,
+            textbook_id INTEGER,
+            is_issued INTEGER DEFAULT 0,
+            is_paid INTEGER DEFAULT 0,
+            PRIMARY KEY (student_id, textbook_id),
+            FOREIGN KEY (student_id) REFERENCES students (id),
+            FOREIGN KEY (textbook_id) REFERENCES textbooks (id)
+        )''',
+    ]),
+    (2, '为高频查询列创建索引', [
+        'CREATE INDEX IF NOT EXISTS idx_courses_teacher_start ON courses (teacher_id, start_time)',
+        'CREATE INDEX IF NOT EXISTS idx_courses_start ON courses (start_time)',
+        'CREATE INDEX IF NOT EXISTS idx_course_students_student ON course_students (student_id, course_id)',
+        'CREATE INDEX IF NOT EXISTS idx_available_times_person ON available_times (person_type, person_id, day_of_week)',
+        'CREATE INDEX IF NOT EXISTS idx_memos_date ON memos (date, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_student_textbooks_textbook ON student_textbooks (textbook_id, is_issued)',
+    ]),
+    (3, '为班级冲突检测创建索引', [
+        'CREATE INDEX IF NOT EXISTS idx_courses_class_start ON courses (class_name, start_time)',
+    ]),
+    (4, '课程时间改用整数分钟列', [
+        add_column('courses', 'start_minute', 'INTEGER'),
+        add_column('courses', 'end_minute', 'INTEGER'),
+        backfill_course_minutes,
+        # 未写入分钟列的插入和修改时间字符串的更新由触发器补齐
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_courses_minutes_insert
+        AFTER INSERT ON courses
+        WHEN NEW.start_minute IS NULL OR NEW.end_minute IS NULL
+        BEGIN
+            UPDATE courses SET
+                start_minute = {MINUTES_SQL.format(column='NEW.start_time')},
+                end_minute = {MINUTES_SQL.format(column='NEW.end_time')}
+            WHERE id = NEW.id;
+        END''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_courses_minutes_update
+        AFTER UPDATE OF start_time, end_time ON courses
+        BEGIN
+            UPDATE courses SET
+                start_minute = {MINUTES_SQL.format(column='NEW.start_time')},
+                end_minute = {MINUTES_SQL.format(column='NEW.end_time')}
+            WHERE id = NEW.id;
+        END''',
+        'DROP INDEX IF EXISTS idx_courses_teacher_start',
+        'DROP INDEX IF EXISTS idx_courses_class_start',
+        'DROP INDEX IF EXISTS idx_courses_start',
+        'CREATE INDEX IF NOT EXISTS idx_courses_teacher_minute ON courses (teacher_id, start_minute)',
+        'CREATE INDEX IF NOT EXISTS idx_courses_class_minute ON courses (class_name, start_minute)',
+        'CREATE INDEX IF NOT EXISTS idx_courses_start_minute ON courses (start_minute)',
+        # 最长课程时长，用于给区间查询的开始时间加下界
+        'CREATE INDEX IF NOT EXISTS idx_courses_duration ON courses (end_minute - start_minute)',
+    ]),
+    (5, '创建设置表（学期日历等）', [
+        '''
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )''',
+    ]),
+    (6, '创建全文索引（学生、教师、教材、备忘录）', [
+        create_fts_tables,
+    ]),
+    (7, '学生标签和教师课程类型改用关联表', [
+        '''
+        CREATE TABLE IF NOT EXISTS student_tags (
+            student_id INTEGER,
+            tag TEXT,
+            PRIMARY KEY (student_id, tag),
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )''',
+        '''
+        CREATE TABLE IF NOT EXISTS teacher_subjects (
+            teacher_id INTEGER,
+            subject TEXT,
+            PRIMARY KEY (teacher_id, subject),
+            FOREIGN KEY (teacher_id) REFERENCES teachers (id)
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_student_tags_tag ON student_tags (tag, student_id)',
+        'CREATE INDEX IF NOT EXISTS idx_teacher_subjects_subject ON teacher_subjects (subject, teacher_id)',
+        backfill_list_tables,
+    ]),
+    (8, '全文索引插入触发器支持批量写入时暂停', [
+        recreate_fts_insert_triggers,
+    ]),
+    (9, '规范化未补零的课程时间并补齐分钟列', [
+        backfill_course_minutes,
+    ]),
+    (10, '为 1～2 个字符的搜索关键词创建单字和双字索引', [
+        create_gram_tables,
+    ]),
+]
+
+# 当前代码对应的数据库结构版本
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# models/*.py 中的高频查询，用于对比索引前后的查询计划
+HOT_QUERIES = [
+    ('Course.check_conflicts 教师冲突',
+     '''SELECT id FROM courses c WHERE teacher_id=:teacher_id AND
+        c.start_minute >= :start - (SELECT IFNULL(MAX(end_minute - start_minute), 0) FROM courses)
+        AND c.start_minute < :end AND c.end_minute > :start AND id != :id''',
+     {'teacher_id': 1, 'start': 28421820, 'end': 28421880, 'id': 1}),
+    ('Course.check_conflicts 班级冲突',
+     '''SELECT id FROM courses c WHERE class_name=:class_name AND
+        c.start_minute >= :start - (SELECT IFNULL(MAX(end_minute - start_minute), 0) FROM courses)
+        AND c.start_minute < :end AND c.end_minute > :start AND id != :id''',
+     {'class_name': '高一1班', 'start': 28421820, 'end': 28421880, 'id': 1}),
+    ('Course.check_conflicts 学生冲突',
+     '''SELECT c.id FROM course_students mine
+        JOIN course_students other ON other.student_id = mine.student_id
+        JOIN courses c ON c.id = other.course_id
+        WHERE mine.course_id=:id AND c.start_minute < :end AND c.end_minute > :start AND c.id != :id''',
+     {'start': 28421820, 'end': 28421880, 'id': 1}),
+    ('Course.get_by_time_range',
+     '''SELECT id FROM courses c WHERE
+        c.start_minute >= :start - (SELECT IFNULL(MAX(end_minute - start_minute), 0) FROM courses)
+        AND c.start_minute < :end AND c.end_minute > :start ORDER BY c.start_minute''',
+     {'start': 28421280, 'end': 28431360}),
+    ('Course.get_by_teacher',
+     'SELECT id FROM courses WHERE teacher_id=? ORDER BY start_minute',
+     (1,)),
+    ('Teacher.get_available_times',
+     'SELECT day_of_week, start_time, end_time FROM available_times WHERE person_id=? AND person_type=?',
+     (1, 'teacher')),
+    ('MainWindow.load_memo_by_date',
+     'SELECT id, content, font_size FROM memos WHERE date=? ORDER BY created_at',
+     ('2024-01-15',)),
+    ('Textbook.get_total_count',
+     'SELECT COUNT(*) FROM student_textbooks WHERE textbook_id=?',
+     (1,)),
+    ('Textbook.get_issued_count',
+     'SELECT COUNT(*) FROM student_textbooks WHERE textbook_id=? AND is_issued=1',
+     (1,)),
+]
+
+def get_schema_version(conn):
+    """
+    读取数据库结构版本（PRAGMA user_version）
+    """
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn, target_version=SCHEMA_VERSION):
+    """
+    依次执行尚未应用的迁移，返回本次应用的版本号列表
+    
+    每个迁移在独立事务中执行，并在同一事务中更新 user_version，
+    中途失败时该迁移整体回滚，数据库停留在上一个版本。
+    """
+    current = get_schema_version(conn)
+    applied = []
+    for version, description, statements in MIGRATIONS:
+        if version <= current or version > target_version:
+            continue
+        try:
+            conn.execute('BEGIN')
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+def explain_query_plans(conn, queries=HOT_QUERIES):
+    """
+    获取高频查询的查询计划，返回 {说明: [计划步骤, ...]}
+    """
+    plans = {}
+    for description, query, params in queries:
+        rows = conn.execute(f'EXPLAIN QUERY PLAN {query}', params).fetchall()
+        plans[description] = [row[-1] for row in rows]
+    return plans
+
+def report_query_plans():
+    """
+    在内存数据库中对比索引迁移前后的查询计划
+    """
+    conn = sqlite3.connect(':memory:')
+    migrate(conn, target_version=1)
+    # 基础表结构中还没有整数时间列，先补上以便对比同一组查询
+    add_column('courses', 'start_minute', 'INTEGER')(conn)
+    add_column('courses', 'end_minute', 'INTEGER')(conn)
+    before = explain_query_plans(conn)
+    migrate(conn)
+    after = explain_query_plans(conn)
+    conn.close()
+    
+    for description, _, _ in HOT_QUERIES:
+        print(f"{description}:")
+        print(f"  迁移前: {'; '.join(before[description])}")
+        print(f"  迁移后: {'; '.join(after[description])}")
+    return before, after
+
+def test_legacy_course_times():
+    """
+    测试未补零的旧课程时间：迁移和导入早期快照后分钟列有效，冲突检测能发现重叠课程
+    """
+    import json
+    import os
+    import tempfile
+    from database import db_manager, init_database, import_snapshot
+    from models.course import Course
+    
+    original_path = db_manager.db_path
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # 版本 3 的数据库中有一节未补零的课程和一节与之重叠的课程
+        db_path = os.path.join(tmp_dir, 'legacy.db')
+        conn = sqlite3.connect(db_path)
+        migrate(conn, target_version=3)
+        conn.executemany('INSERT INTO courses (name, class_name, start_time, end_time) VALUES (?, ?, ?, ?)',
+                         [('旧课程', '甲班', '2024-1-16 9:00', '2024-1-16 10:30'),
+                          ('新课程', '甲班', '2024-01-16 10:00', '2024-01-16 11:00')])
+        conn.commit()
+        conn.close()
+        init_database(db_path)
+        db_manager.switch_database(db_path)
+        with db_manager as db:
+            legacy = db.fetch_one('SELECT start_time, end_time, start_minute, end_minute FROM courses WHERE id=1')
+        conflicts = Course.get_by_id(2).check_conflicts()
+        
+        # 版本 3 的快照中未补零的课程
+        snapshot_path = os.path.join(tmp_dir, 'legacy.ndjson')
+        with open(snapshot_path, 'w', encoding='utf-8') as f:
+            for record in ({'format': 'schedule-snapshot', 'schema_version': 3, 'tables': ['courses']},
+                           {'table': 'courses', 'columns': ['id', 'name', 'class_name', 'start_time', 'end_time']},
+                           [1, '快照课程', '乙班', '2024-1-17 8:00', '2024-1-17 9:00']):
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        import_snapshot(snapshot_path)
+        imported = [(c.start_time, c.start_minute) for c in Course.get_by_time_range('2024-01-17 00:00', '2024-01-18 00:00')]
+        db_manager.close_all()
+    db_manager.switch_database(original_path)
+    
+    assert legacy == ('2024-01-16 09:00', '2024-01-16 10:30', 28423260, 28423350), legacy
+    assert [row[0] for row in conflicts] == [1], conflicts
+    assert imported == [('2024-01-17 08:00', 28424640)], imported
+    print("未补零课程时间迁移测试通过")
+
+if __name__ == "__main__":
+    test_legacy_course_times()
+    report_query_plans()
\ No newline at end of file
@@ -0,0 +1,208 @@
+import gzip
+import json
+from .db_manager import db_manager
+from .migrations import SCHEMA_VERSION, LIST_TABLES, sync_list_table
+from utils.tools import time_to_minutes, minutes_to_time
+
+# 快照格式标识
+SNAPSHOT_FORMAT = 'schedule-snapshot'
+
+# 导出和导入的数据表，被引用的表在前
+# student_tags、teacher_subjects 可由字符串列重建，不写入快照
+SNAPSHOT_TABLES = [
+    'students', 'teachers', 'textbooks', 'courses', 'memos', 'available_times',
+    'settings', 'student_classes', 'course_students', 'student_textbooks',
+]
+
+# 以自增 id 为主键的表，导入时 id 统一加上偏移量
+ID_TABLES = ['students', 'teachers', 'textbooks', 'courses', 'memos', 'available_times']
+
+# 外键列引用的表，导入时按被引用表的偏移量重新映射
+FOREIGN_KEYS = {
+    'courses': {'teacher_id': 'teachers'},
+    'student_classes': {'student_id': 'students'},
+    'course_students': {'course_id': 'courses', 'student_id': 'students'},
+    'student_textbooks': {'student_id': 'students', 'textbook_id': 'textbooks'},
+}
+
+# available_times.person_id 按 person_type 引用学生或教师
+PERSON_TABLES = {'student': 'students', 'teacher': 'teachers'}
+
+# 每次 executemany 写入的行数
+CHUNK_SIZE = 5000
+
+def _open_snapshot(file_path, mode, compress=None):
+    """
+    打开快照文件，compress 为 None 时按 .gz 扩展名决定是否使用 gzip
+    """
+    if compress is None:
+        compress = file_path.lower().endswith('.gz')
+    if compress:
+        return gzip.open(file_path, mode + 't', encoding='utf-8')
+    return open(file_path, mode, encoding='utf-8', newline='\n')
+
+def _table_columns(db, table):
+    """
+    获取数据表的列名
+    """
+    return [row[1] for row in db.fetch_all(f'PRAGMA table_info({table})')]
+
+def export_snapshot(file_path, compress=None, progress=None):
+    """
+    将整个数据库导出为 NDJSON 快照，返回 {表名: 行数}
+    
+    第一行为文件头，之后每张表先写一行 {"table": 表名, "columns": 列名}，
+    再每行写一条记录（JSON 数组）。数据从游标逐行写出，内存占用与数据量无关。
+    写完一张表后调用 progress(表名, 行数)。
+    """
+    counts = {}
+    with _open_snapshot(file_path, 'w', compress) as f:
+        f.write(json.dumps({'format': SNAPSHOT_FORMAT, 'schema_version': SCHEMA_VERSION,
+                            'tables': SNAPSHOT_TABLES}, ensure_ascii=False) + '\n')
+        # 所有表在同一个读事务中导出，保证快照一致
+        with db_manager as db:
+            for table in SNAPSHOT_TABLES:
+                columns = _table_columns(db, table)
+                f.write(json.dumps({'table': table, 'columns': columns}, ensure_ascii=False) + '\n')
+                count = 0
+                for row in db.iter_query(f"SELECT {', '.join(columns)} FROM {table}"):
+                    f.write(json.dumps(row, ensure_ascii=False) + '\n')
+                    count += 1
+                counts[table] = count
+                if progress:
+                    progress(table, count)
+    return counts
+
+def _id_offsets(db):
+    """
+    获取各表的 id 偏移量，导入的 id 加上偏移量后不会与现有数据重复
+    """
+    offsets = {}
+    for table in ID_TABLES:
+        max_id = db.fetch_one(f'SELECT IFNULL(MAX(id), 0) FROM {table}')[0]
+        sequence = db.fetch_one('SELECT seq FROM sqlite_sequence WHERE name=?', (table,))
+        offsets[table] = max(max_id, sequence[0] if sequence else 0)
+    return offsets
+
+def _row_mapper(table, columns, offsets):
+    """
+    生成单行 id 重映射函数，返回 None 表示该表无需映射
+    
+    课程的时间同时统一为补零的 'YYYY-MM-DD HH:MM' 并重新换算分钟列：早期版本的快照
+    可能含有 '2024-1-16 9:00' 这类时间，数据库触发器无法换算。无法解析的时间拒绝导入。
+    """
+    shifts = []
+    for index, column in enumerate(columns):
+        if column == 'id' and table in ID_TABLES:
+            shifts.append((index, offsets[table]))
+        elif column in FOREIGN_KEYS.get(table, {}):
+            shifts.append((index, offsets[FOREIGN_KEYS[table][column]]))
+    
+    person = None
+    if table == 'available_times' and 'person_id' in columns and 'person_type' in columns:
+        person = (columns.index('person_id'), columns.index('person_type'))
+    
+    times = None
+    if table == 'courses' and 'start_time' in columns and 'end_time' in columns:
+        times = (columns.index('start_time'), columns.index('end_time'),
+                 columns.index('start_minute') if 'start_minute' in columns else None,
+                 columns.index('end_minute') if 'end_minute' in columns else None)
+    
+    if not shifts and person is None and times is None:
+        return None
+    
+    def mapper(row):
+        row = list(row)
+        for index, offset in shifts:
+            if row[index] is not None:
+                row[index] += offset
+        if person is not None:
+            id_index, type_index = person
+            person_table = PERSON_TABLES.get(row[type_index])
+            if row[id_index] is not None and person_table:
+                row[id_index] += offsets[person_table]
+        if times is not None:
+            start_index, end_index, start_minute_index, end_minute_index = times
+            start, end = time_to_minutes(row[start_index]), time_to_minutes(row[end_index])
+            if start is None or end is None:
+                raise Exception(f'快照中课程的时间格式不正确: {row[start_index]} ~ {row[end_index]}')
+            row[start_index], row[end_index] = minutes_to_time(start), minutes_to_time(end)
+            if start_minute_index is not None:
+                row[start_minute_index] = start
+            if end_minute_index is not None:
+                row[end_minute_index] = end
+        return row
+    return mapper
+
+def import_snapshot(file_path, compress=None, progress=None):
+    """
+    将 NDJSON 快照合并导入当前数据库，返回 {表名: 行数}
+    
+    导入的 id 统一加上偏移量（各表现有的最大 id），外键按被引用表的偏移量同步调整，
+    因此可以导入到非空数据库而不破坏关联。已存在的设置项保留不变。整个导入在一个
+    事务中完成，失败时不留下部分数据；记录按 CHUNK_SIZE 行分块写入，内存占用有上限。
+    导入的课程不做冲突检测。
+    """
+    from models.cache import clear_entity_caches
+    from models.conflict_index import conflict_index
+    from models.search import executemany_indexed
+    
+    counts = {}
+    with _open_snapshot(file_path, 'r', compress) as f:
+        header = json.loads(f.readline() or '{}')
+        if header.get('format') != SNAPSHOT_FORMAT:
+            raise Exception('不是有效的数据库快照文件')
+        if header.get('schema_version', 0) > SCHEMA_VERSION:
+            raise Exception('快照来自更新版本的程序，请先升级')
+        
+        try:
+            with db_manager as db:
+                offsets = _id_offsets(db)
+                table = None
+                query = None
+                mapper = None
+                keep = None
+                chunk = []
+                
+                def flush():
+                    if chunk:
+                        executemany_indexed(db, table, query, chunk)
+                        counts[table] += len(chunk)
+                        chunk.clear()
+                
+                for line in f:
+                    record = json.loads(line)
+                    if isinstance(record, dict):
+                        # 新的数据表
+                        flush()
+                        if table is not None and progress:
+                            progress(table, counts[table])
+                        table = record['table']
+                        if table not in SNAPSHOT_TABLES:
+                            raise Exception(f'快照中包含未知的数据表: {table}')
+                        # 只导入当前结构中存在的列，缺少的列由默认值或触发器补齐
+                        existing = set(_table_columns(db, table))
+                        keep = [i for i, column in enumerate(record['columns']) if column in existing]
+                        columns = [record['columns'][i] for i in keep]
+                        verb = 'INSERT OR IGNORE' if table == 'settings' else 'INSERT'
+                        query = f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+                        mapper = _row_mapper(table, columns, offsets)
+                        counts[table] = 0
+                        continue
+                    
+                    row = [record[i] for i in keep]
+                    chunk.append(mapper(row) if mapper else row)
+                    if len(chunk) >= CHUNK_SIZE:
+                        flush()
+                flush()
+                if table is not None and progress:
+                    progress(table, counts[table])
+                
+                # 标签和课程类型关联表不在快照中，由导入的字符串列重建
+                for list_table in LIST_TABLES:
+                    sync_list_table(db.conn, list_table, offsets[list_table])
+        finally:
+            # 绕过了模型的 save，缓存和冲突索引需要整体失效
+            clear_entity_caches()
+            conflict_index.invalidate()
+    return counts
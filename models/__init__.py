@@ -2,5 +2,8 @@ from .student import Student
 from .teacher import Teacher
 from .course import Course
 from .textbook import Textbook
+from .term import Term
+from .search import search_all
+from .availability import Availability
 
-__all__ = ['Student', 'Teacher', 'Course', 'Textbook']
\ No newline at end of file
+__all__ = ['Student', 'Teacher', 'Course', 'Textbook', 'Term', 'search_all', 'Availability']
\ No newline at end of file
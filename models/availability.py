@@ -0,0 +1,220 @@
+from database import db_manager
+from utils.tools import time_to_minutes, DAY_MINUTES
+from .cache import EntityCache
+
+# 每个时间格的分钟数，一周 7 × 96 个时间格
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = DAY_MINUTES // SLOT_MINUTES
+WEEK_SLOTS = 7 * SLOTS_PER_DAY
+FULL_WEEK = (1 << WEEK_SLOTS) - 1
+
+class Availability:
+    """
+    每周可用时间位图
+    
+    第 i 位表示一周中第 i 个 15 分钟时间格（0 为周一 00:00-00:15）是否可用，
+    整个星期保存在一个 Python 整数中，交集、并集都是一次整数运算。
+    时间以相对周一零点的分钟数表示。
+    """
+    
+    __slots__ = ('bits',)
+    
+    def __init__(self, bits=0):
+        """
+        初始化位图，bits 超出一周的部分会被截掉
+        """
+        self.bits = bits & FULL_WEEK
+    
+    @classmethod
+    def full(cls):
+        """
+        全周可用
+        """
+        return cls(FULL_WEEK)
+    
+    @classmethod
+    def from_minutes(cls, ranges, inner=True):
+        """
+        由时间范围 [(开始分钟, 结束分钟), ...] 生成位图，inner 的含义见 range_mask
+        """
+        bits = 0
+        for start, end in ranges:
+            bits |= range_mask(start, end, inner)
+        return cls(bits)
+    
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        由 available_times 记录 [(星期, 开始时间, 结束时间), ...] 生成位图，星期 1 为周一
+        
+        只有完整落在可用时间内的时间格才算可用，无法解析的记录被忽略。
+        """
+        ranges = []
+        for day_of_week, start_time, end_time in rows:
+            start = time_to_minutes(f'1970-01-01 {start_time}')
+            end = time_to_minutes(f'1970-01-01 {end_time}')
+            if start is None or end is None or not 1 <= day_of_week <= 7:
+                continue
+            offset = (day_of_week - 1) * DAY_MINUTES
+            ranges.append((offset + start, offset + end))
+        return cls.from_minutes(ranges)
+    
+    def __and__(self, other):
+        return Availability(self.bits & other.bits)
+    
+    def __or__(self, other):
+        return Availability(self.bits | other.bits)
+    
+    def __sub__(self, other):
+        return Availability(self.bits & ~other.bits)
+    
+    def __invert__(self):
+        return Availability(~self.bits)
+    
+    def __eq__(self, other):
+        return isinstance(other, Availability) and self.bits == other.bits
+    
+    def __hash__(self):
+        return hash(self.bits)
+    
+    def __bool__(self):
+        return self.bits != 0
+    
+    def __len__(self):
+        """
+        可用的时间格数
+        """
+        return bin(self.bits).count('1')
+    
+    def __repr__(self):
+        return f'Availability({self.to_minutes()!r})'
+    
+    def covers(self, start, end):
+        """
+        [start, end) 所在的时间格是否全部可用
+        """
+        mask = range_mask(start, end, inner=False)
+        return self.bits & mask == mask
+    
+    def to_minutes(self):
+        """
+        合并连续的可用时间格，返回 [(开始分钟, 结束分钟), ...]
+        """
+        ranges = []
+        bits = self.bits
+        slot = 0
+        while bits:
+            # 跳过不可用的时间格，再数出连续可用的时间格
+            skip = (bits & -bits).bit_length() - 1
+            bits >>= skip
+            slot += skip
+            run = (~bits & (bits + 1)).bit_length() - 1
+            ranges.append((slot * SLOT_MINUTES, (slot + run) * SLOT_MINUTES))
+            bits >>= run
+            slot += run
+        return ranges
+
+def range_mask(start, end, inner=False):
+    """
+    时间范围 [start, end)（相对周一零点的分钟数）对应的时间格位图
+    
+    inner 为 True 时只取完整落在范围内的时间格（用于可用时间），
+    否则取与范围有重叠的全部时间格（用于占用时间）。
+    """
+    start = max(start, 0)
+    end = min(end, WEEK_SLOTS * SLOT_MINUTES)
+    if inner:
+        first = -(-start // SLOT_MINUTES)
+        last = end // SLOT_MINUTES
+    else:
+        first = start // SLOT_MINUTES
+        last = -(-end // SLOT_MINUTES)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+# 人员可用时间缓存，键为 (人员类型, 人员ID)
+_cache = EntityCache('availability', capacity=8192)
+
+def get_availabilities(person_type, person_ids):
+    """
+    批量获取人员的可用时间位图，返回 {人员ID: Availability}
+    
+    没有 available_times 记录的人员视为全周可用。未缓存的人员用一次查询读取。
+    """
+    result = {}
+    missing = []
+    for person_id in person_ids:
+        cached = _cache.get((person_type, person_id))
+        if cached is None:
+            missing.append(person_id)
+        else:
+            result[person_id] = cached
+    
+    # 每次查询的参数个数不超过 SQLite 的默认上限
+    for i in range(0, len(missing), 900):
+        ids = missing[i:i + 900]
+        with db_manager as db:
+            rows = db.fetch_all(
+                f"SELECT person_id, day_of_week, start_time, end_time FROM available_times "
+                f"WHERE person_type=? AND person_id IN ({', '.join('?' * len(ids))})",
+                [person_type] + ids
+            )
+        grouped = {}
+        for person_id, day_of_week, start_time, end_time in rows:
+            grouped.setdefault(person_id, []).append((day_of_week, start_time, end_time))
+        for person_id in ids:
+            if person_id in grouped:
+                availability = Availability.from_rows(grouped[person_id])
+            else:
+                availability = Availability.full()
+            _cache.put((person_type, person_id), availability)
+            result[person_id] = availability
+    return result
+
+def get_availability(person_type, person_id):
+    """
+    获取单个人员的可用时间位图
+    """
+    return get_availabilities(person_type, [person_id])[person_id]
+
+def invalidate_availability(person_type, person_id):
+    """
+    人员可用时间变化后使缓存失效
+    """
+    _cache.invalidate((person_type, person_id))
+
+def common_availability(teacher_id=None, student_ids=()):
+    """
+    教师和一组学生共同的可用时间
+    """
+    bits = FULL_WEEK
+    if teacher_id is not None:
+        bits &= get_availability('teacher', teacher_id).bits
+    for availability in get_availabilities('student', list(student_ids)).values():
+        bits &= availability.bits
+    return Availability(bits)
+
+# 性能测试
+def benchmark_availability(students=30, rounds=10000):
+    """
+    测试一名教师和一组学生求共同可用时间的耗时（已缓存）
+    """
+    import random
+    import time
+    
+    rng = random.Random(students)
+    people = [Availability.from_rows([(day, f'{rng.randint(8, 11):02d}:00', f'{rng.randint(14, 20):02d}:30')
+                                      for day in range(1, 6)])
+              for _ in range(students + 1)]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        bits = FULL_WEEK
+        for availability in people:
+            bits &= availability.bits
+    elapsed = (time.perf_counter() - start) / rounds
+    print(f"1 名教师 + {students} 名学生求交集: {elapsed * 1e6:.1f} µs/次, 共同可用 {Availability(bits).to_minutes()}")
+    return elapsed
+
+if __name__ == "__main__":
+    benchmark_availability()
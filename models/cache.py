@@ -0,0 +1,105 @@
+from collections import OrderedDict
+
+# 所有实体缓存，用于统一查看命中率和清空
+_caches = []
+
+class EntityCache:
+    """
+    有界LRU身份映射，同一ID在缓存期间始终返回同一个对象
+    
+    模型的 save/delete 负责更新或失效对应条目；绕过模型直接写表的操作
+    （批量导入等）需要调用 clear_entity_caches()。缓存的对象由所有调用方共享，
+    编辑界面应修改副本，保存成功后由 update 写回缓存中的对象。
+    """
+    
+    def __init__(self, name, capacity=1024):
+        """
+        初始化实体缓存
+        """
+        self.name = name
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _caches.append(self)
+    
+    def get(self, key):
+        """
+        获取缓存的实体，未命中时返回 None
+        """
+        entity = self.entries.get(key)
+        if entity is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entity
+    
+    def put(self, key, entity):
+        """
+        放入实体，超出容量时淘汰最久未使用的条目
+        """
+        self.entries[key] = entity
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+    
+    def update(self, key, entity):
+        """
+        保存成功后更新实体：已缓存其他对象时把属性复制过去，持有该对象的调用方都能看到修改
+        """
+        cached = self.entries.get(key)
+        if cached is None or cached is entity:
+            self.put(key, entity)
+            return
+        cached.__dict__.update(entity.__dict__)
+        self.entries.move_to_end(key)
+    
+    def invalidate(self, key):
+        """
+        使单个实体失效
+        """
+        self.entries.pop(key, None)
+    
+    def clear(self):
+        """
+        清空缓存
+        """
+        self.entries.clear()
+    
+    def stats(self):
+        """
+        获取缓存统计信息
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+    
+    def reset_stats(self):
+        """
+        重置统计计数
+        """
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+def get_cache_stats():
+    """
+    获取所有实体缓存的统计信息
+    """
+    return {cache.name: cache.stats() for cache in _caches}
+
+def clear_entity_caches():
+    """
+    清空所有实体缓存
+    """
+    for cache in _caches:
+        cache.clear()
\ No newline at end of file
@@ -0,0 +1,374 @@
+from bisect import bisect_left
+from database import db_manager
+from utils.tools import time_to_minutes
+
+class IntervalList:
+    """
+    单个资源（教师、学生或班级）的有序区间列表
+    
+    区间按开始时间排序保存，查询时二分定位到最后一个开始时间早于查询结束时间
+    的区间，再向前检查开始时间晚于 (查询开始 - 最长区间长度) 的少量区间。
+    课程时长有上限，因此单次查询为 O(log n)。
+    """
+    
+    def __init__(self):
+        """
+        初始化区间列表
+        """
+        self.entries = []
+        self.starts = []
+        self.max_length = 0
+    
+    def add(self, start, end, course_id):
+        """
+        添加区间
+        """
+        entry = (start, end, course_id)
+        index = bisect_left(self.entries, entry)
+        self.entries.insert(index, entry)
+        self.starts.insert(index, start)
+        self.max_length = max(self.max_length, end - start)
+    
+    def remove(self, start, end, course_id):
+        """
+        删除区间
+        """
+        entry = (start, end, course_id)
+        index = bisect_left(self.entries, entry)
+        if index < len(self.entries) and self.entries[index] == entry:
+            del self.entries[index]
+            del self.starts[index]
+    
+    def overlaps(self, start, end, exclude=None):
+        """
+        返回与 [start, end) 重叠的课程ID列表
+        """
+        result = []
+        index = bisect_left(self.starts, end) - 1
+        lower = start - self.max_length
+        while index >= 0 and self.starts[index] > lower:
+            entry_start, entry_end, course_id = self.entries[index]
+            if entry_end > start and course_id != exclude:
+                result.append(course_id)
+            index -= 1
+        return result
+    
+    def between(self, start, end, exclude=None):
+        """
+        返回与 [start, end) 重叠的区间 [(开始, 结束), ...]，按开始时间排列
+        """
+        first = bisect_left(self.starts, start - self.max_length)
+        last = bisect_left(self.starts, end)
+        return [(entry[0], entry[1]) for entry in self.entries[first:last]
+                if entry[1] > start and entry[2] != exclude]
+    
+    def __len__(self):
+        return len(self.entries)
+
+class ConflictIndex:
+    """
+    课程冲突的内存索引，按教师、学生、班级分别维护有序区间列表
+    
+    首次查询时从 courses 和 course_students 加载，Course.save/delete 和选课变化
+    时增量更新；绕过模型直接修改课程表的操作需要调用 invalidate()。
+    """
+    
+    def __init__(self):
+        """
+        初始化冲突索引
+        """
+        self.resources = {}
+        self.courses = {}
+        self.loaded = False
+    
+    def load(self):
+        """
+        从数据库加载全部课程区间
+        """
+        self.resources = {}
+        self.courses = {}
+        with db_manager as db:
+            rows = db.fetch_all('SELECT id, teacher_id, class_name, start_minute, end_minute FROM courses')
+            enrollments = db.fetch_all('SELECT course_id, student_id FROM course_students')
+        
+        students = {}
+        for course_id, student_id in enrollments:
+            students.setdefault(course_id, []).append(student_id)
+        
+        # 先按资源分组，每个资源排序一次，避免逐条插入
+        grouped = {}
+        for course_id, teacher_id, class_name, start, end in rows:
+            if start is None or end is None:
+                continue
+            keys = self._resource_keys(teacher_id, class_name, students.get(course_id, ()))
+            self.courses[course_id] = (start, end, keys)
+            entry = (start, end, course_id)
+            for key in keys:
+                grouped.setdefault(key, []).append(entry)
+        
+        for key, entries in grouped.items():
+            entries.sort()
+            intervals = self.resources[key] = IntervalList()
+            intervals.entries = entries
+            intervals.starts = [entry[0] for entry in entries]
+            intervals.max_length = max(entry[1] - entry[0] for entry in entries)
+        self.loaded = True
+    
+    def ensure_loaded(self):
+        """
+        确保索引已加载
+        """
+        if not self.loaded:
+            self.load()
+    
+    def invalidate(self):
+        """
+        丢弃索引，下次查询时重新加载
+        """
+        self.resources = {}
+        self.courses = {}
+        self.loaded = False
+    
+    def _resource_keys(self, teacher_id, class_name, student_ids):
+        """
+        生成课程占用的资源键
+        """
+        keys = []
+        if teacher_id:
+            keys.append(('teacher', teacher_id))
+        if class_name:
+            keys.append(('class', class_name))
+        for student_id in student_ids:
+            keys.append(('student', student_id))
+        return keys
+    
+    def add_course(self, course_id, start_time, end_time, teacher_id=None, class_name='', student_ids=()):
+        """
+        添加课程区间，时间可以是字符串或分钟数
+        """
+        start = time_to_minutes(start_time) if isinstance(start_time, str) else start_time
+        end = time_to_minutes(end_time) if isinstance(end_time, str) else end_time
+        if start is None or end is None:
+            return
+        
+        keys = self._resource_keys(teacher_id, class_name, student_ids)
+        self.courses[course_id] = (start, end, keys)
+        for key in keys:
+            intervals = self.resources.get(key)
+            if intervals is None:
+                intervals = self.resources[key] = IntervalList()
+            intervals.add(start, end, course_id)
+    
+    def remove_course(self, course_id):
+        """
+        删除课程区间
+        """
+        record = self.courses.pop(course_id, None)
+        if record is None:
+            return
+        start, end, keys = record
+        for key in keys:
+            intervals = self.resources.get(key)
+            if intervals is not None:
+                intervals.remove(start, end, course_id)
+    
+    def update_course(self, course, student_ids=None):
+        """
+        课程保存后同步索引，未指定学生时沿用索引中已有的学生
+        """
+        if not self.loaded:
+            return
+        if student_ids is None:
+            record = self.courses.get(course.id)
+            keys = record[2] if record else []
+            student_ids = [key[1] for key in keys if key[0] == 'student']
+        self.remove_course(course.id)
+        self.add_course(course.id, course.start_minute, course.end_minute,
+                        course.teacher_id, course.class_name, student_ids)
+    
+    def add_student(self, course_id, student_id):
+        """
+        课程新增学生后同步索引
+        """
+        record = self.courses.get(course_id)
+        if record is None:
+            return
+        start, end, keys = record
+        key = ('student', student_id)
+        if key in keys:
+            return
+        keys.append(key)
+        intervals = self.resources.get(key)
+        if intervals is None:
+            intervals = self.resources[key] = IntervalList()
+        intervals.add(start, end, course_id)
+    
+    def remove_student(self, course_id, student_id):
+        """
+        课程移除学生后同步索引
+        """
+        record = self.courses.get(course_id)
+        if record is None:
+            return
+        start, end, keys = record
+        key = ('student', student_id)
+        if key in keys:
+            keys.remove(key)
+            self.resources[key].remove(start, end, course_id)
+    
+    def find_overlaps(self, kind, key, start, end, exclude=None):
+        """
+        查询资源在 [start, end) 内已占用的课程ID
+        
+        kind 为 'teacher'、'student' 或 'class'，时间可以是字符串或分钟数。
+        """
+        self.ensure_loaded()
+        intervals = self.resources.get((kind, key))
+        if not intervals:
+            return []
+        if isinstance(start, str):
+            start = time_to_minutes(start)
+        if isinstance(end, str):
+            end = time_to_minutes(end)
+        return intervals.overlaps(start, end, exclude)
+    
+    def busy_intervals(self, keys, start, end, exclude=None):
+        """
+        合并多个资源在 [start, end) 内的占用时间，返回互不重叠、按时间排列的 [(开始, 结束), ...]
+        
+        keys 为 [(kind, key), ...]，exclude 为不计入占用的课程ID。
+        """
+        self.ensure_loaded()
+        intervals = []
+        for resource in keys:
+            entries = self.resources.get(resource)
+            if entries:
+                intervals.extend(entries.between(start, end, exclude))
+        intervals.sort()
+        
+        merged = []
+        for interval_start, interval_end in intervals:
+            if merged and interval_start <= merged[-1][1]:
+                if interval_end > merged[-1][1]:
+                    merged[-1][1] = interval_end
+            else:
+                merged.append([interval_start, interval_end])
+        return [(interval_start, interval_end) for interval_start, interval_end in merged]
+    
+    def has_overlap(self, kind, key, start, end, exclude=None):
+        """
+        资源在 [start, end) 内是否已有课程
+        """
+        return bool(self.find_overlaps(kind, key, start, end, exclude))
+    
+    def check_course(self, course, student_ids=None):
+        """
+        检查课程冲突，返回 [(课程ID, 冲突原因), ...]
+        
+        与 Course.check_conflicts 的判定一致，但完全在内存中完成。
+        """
+        self.ensure_loaded()
+        start, end = course.start_minute, course.end_minute
+        if start is None or end is None:
+            return []
+        
+        if student_ids is None:
+            record = self.courses.get(course.id)
+            keys = record[2] if record else []
+            student_ids = [key[1] for key in keys if key[0] == 'student']
+        
+        conflicts = []
+        checks = [('teacher', course.teacher_id, '教师时间冲突'),
+                  ('class', course.class_name, '班级时间冲突')]
+        checks += [('student', student_id, '学生时间冲突') for student_id in student_ids]
+        for kind, key, reason in checks:
+            if not key:
+                continue
+            for course_id in self.find_overlaps(kind, key, start, end, course.id):
+                conflicts.append((course_id, reason))
+        return conflicts
+
+# 全局冲突索引实例
+conflict_index = ConflictIndex()
+
+# 性能测试
+def benchmark_conflict_index(sizes=(10000, 100000), queries=2000, students_per_class=10):
+    """
+    对比内存冲突索引与 SQL 冲突检测的查询耗时
+    """
+    import os
+    import random
+    import tempfile
+    import time
+    from database import init_database
+    from utils.tools import minutes_to_time
+    from .course import Course
+    
+    original_path = db_manager.db_path
+    results = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, 'bench.db')
+            init_database(db_path)
+            db_manager.switch_database(db_path)
+            
+            # 每位教师固定带一个班，按小时依次排课，数据本身无冲突
+            teacher_count = max(size // 200, 1)
+            base = time_to_minutes('2024-02-26 08:00')
+            courses = []
+            for i in range(size):
+                slot = i // teacher_count
+                start = base + (slot // 10) * 1440 + (slot % 10) * 60
+                courses.append((i + 1, f'课程{i}', i % teacher_count + 1, f'班级{i % teacher_count}',
+                                minutes_to_time(start), minutes_to_time(start + 45), start, start + 45))
+            with db_manager as db:
+                db.cursor.executemany(
+                    'INSERT INTO teachers (id, name) VALUES (?, ?)',
+                    [(t + 1, f'教师{t}') for t in range(teacher_count)]
+                )
+                db.cursor.executemany(
+                    'INSERT INTO students (id, name) VALUES (?, ?)',
+                    [(s + 1, f'学生{s}') for s in range(teacher_count * students_per_class)]
+                )
+                db.cursor.executemany(
+                    'INSERT INTO courses (id, name, teacher_id, class_name, start_time, end_time, start_minute, end_minute) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    courses
+                )
+                db.cursor.executemany(
+                    'INSERT INTO course_students (course_id, student_id) VALUES (?, ?)',
+                    [(course_id, (teacher_id - 1) * students_per_class + k + 1)
+                     for course_id, _, teacher_id, *_ in courses
+                     for k in range(students_per_class)]
+                )
+            
+            rng = random.Random(size)
+            samples = []
+            for _ in range(queries):
+                course_id, name, teacher_id, class_name, _, _, start, _ = rng.choice(courses)
+                shifted = start + 30
+                samples.append(Course(id=course_id, name=name, teacher_id=teacher_id, class_name=class_name,
+                                      start_time=minutes_to_time(shifted), end_time=minutes_to_time(shifted + 45)))
+            
+            start = time.perf_counter()
+            sql_hits = sum(1 for course in samples if course.check_conflicts())
+            sql_time = time.perf_counter() - start
+            
+            index = ConflictIndex()
+            start = time.perf_counter()
+            index.load()
+            load_time = time.perf_counter() - start
+            start = time.perf_counter()
+            index_hits = sum(1 for course in samples if index.check_course(course))
+            index_time = time.perf_counter() - start
+            
+            db_manager.close_all()
+            results[size] = (sql_time / queries, index_time / queries, load_time)
+            print(f"{size} 门课程: SQL {sql_time / queries * 1e6:.0f} us/次, "
+                  f"内存索引 {index_time / queries * 1e6:.1f} us/次 (加载 {load_time:.2f} s), "
+                  f"冲突 {sql_hits}/{index_hits}")
+    
+    db_manager.switch_database(original_path)
+    return results
+
+if __name__ == "__main__":
+    benchmark_conflict_index()
\ No newline at end of file
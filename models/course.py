@@ -1,14 +1,30 @@
 from database import db_manager
-from datetime import datetime
+from utils.tools import time_to_minutes, minutes_to_time, normalize_time, DAY_MINUTES
+from .conflict_index import conflict_index
+
+# 与 [:start, :end) 重叠的课程（整数分钟）。开始时间的下界由最长课程时长推出，
+# 这样区间两端都落在 start_minute 索引上，而不是扫描之前的全部课程
+OVERLAP_CONDITION = '''
+    c.start_minute >= :start - (SELECT IFNULL(MAX(end_minute - start_minute), 0) FROM courses)
+    AND c.start_minute < :end AND c.end_minute > :start
+'''
+
+# 查询课程时一并取出教师姓名，避免逐条查询
+COURSE_SELECT = '''
+    SELECT c.id, c.name, c.teacher_id, c.class_name, c.course_type, c.start_time, c.end_time, t.name
+    FROM courses c
+    LEFT JOIN teachers t ON t.id = c.teacher_id
+'''
 
 class Course:
     """
     课程模型类
     """
     
-    def __init__(self, id=None, name='', teacher_id=None, class_name='', course_type='', start_time='', end_time=''):
+    def __init__(self, id=None, name='', teacher_id=None, class_name='', course_type='', start_time='', end_time='',
+                 teacher_name=None):
         """
-        初始化课程对象
+        初始化课程对象，teacher_name 为查询时已取得的教师姓名
         """
         self.id = id
         self.name = name
@@ -17,33 +33,56 @@ class Course:
         self.course_type = course_type
         self.start_time = start_time
         self.end_time = end_time
+        # 记录姓名对应的教师ID，修改 teacher_id 后自动失效
+        self._teacher_name = (teacher_id, teacher_name) if teacher_name is not None else None
+    
+    @property
+    def start_minute(self):
+        """
+        开始时间（自 1970-01-01 起的分钟数）
+        """
+        return time_to_minutes(self.start_time)
+    
+    @property
+    def end_minute(self):
+        """
+        结束时间（自 1970-01-01 起的分钟数）
+        """
+        return time_to_minutes(self.end_time)
     
     def save(self):
         """
         保存课程信息到数据库
         """
+        # 时间统一为补零的 'YYYY-MM-DD HH:MM'，否则数据库触发器中的 strftime
+        # 无法解析（如 '2024-9-2 8:00'），更新时会把分钟列改写为 NULL
+        start_time, end_time = normalize_time(self.start_time), normalize_time(self.end_time)
+        if start_time is None or end_time is None:
+            raise Exception(f'时间格式不正确: {self.start_time} ~ {self.end_time}')
+        self.start_time, self.end_time = start_time, end_time
+        
         # 检查时间冲突
-        if self.id is None:
-            if self.check_conflicts():
-                raise Exception('时间冲突：该时间段已有其他安排')
+        conflicts = self.check_conflicts()
+        if conflicts:
+            raise Exception(self.describe_conflicts(conflicts))
         
         with db_manager as db:
             if self.id is None:
                 # 新增课程
                 db.execute(
-                    'INSERT INTO courses (name, teacher_id, class_name, course_type, start_time, end_time) VALUES (?, ?, ?, ?, ?, ?)',
-                    (self.name, self.teacher_id, self.class_name, self.course_type, self.start_time, self.end_time)
+                    'INSERT INTO courses (name, teacher_id, class_name, course_type, start_time, end_time, start_minute, end_minute) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (self.name, self.teacher_id, self.class_name, self.course_type, self.start_time, self.end_time,
+                     self.start_minute, self.end_minute)
                 )
                 self.id = db.get_last_insert_id()
             else:
-                # 检查更新后的时间冲突
-                if self.check_conflicts():
-                    raise Exception('时间冲突：该时间段已有其他安排')
                 # 更新课程信息
                 db.execute(
-                    'UPDATE courses SET name=?, teacher_id=?, class_name=?, course_type=?, start_time=?, end_time=? WHERE id=?',
-                    (self.name, self.teacher_id, self.class_name, self.course_type, self.start_time, self.end_time, self.id)
+                    'UPDATE courses SET name=?, teacher_id=?, class_name=?, course_type=?, start_time=?, end_time=?, start_minute=?, end_minute=? WHERE id=?',
+                    (self.name, self.teacher_id, self.class_name, self.course_type, self.start_time, self.end_time,
+                     self.start_minute, self.end_minute, self.id)
                 )
+        conflict_index.update_course(self)
         return self.id
     
     def delete(self):
@@ -56,6 +95,7 @@ class Course:
                 db.execute('DELETE FROM course_students WHERE course_id=?', (self.id,))
                 # 删除课程
                 db.execute('DELETE FROM courses WHERE id=?', (self.id,))
+            conflict_index.remove_course(self.id)
     
     def add_student(self, student_id):
         """
@@ -67,6 +107,7 @@ class Course:
                     'INSERT OR IGNORE INTO course_students (course_id, student_id) VALUES (?, ?)',
                     (self.id, student_id)
                 )
+            conflict_index.add_student(self.id, student_id)
     
     def remove_student(self, student_id):
         """
@@ -78,6 +119,7 @@ class Course:
                     'DELETE FROM course_students WHERE course_id=? AND student_id=?',
                     (self.id, student_id)
                 )
+            conflict_index.remove_student(self.id, student_id)
     
     def get_students(self):
         """
@@ -95,53 +137,60 @@ class Course:
     def check_conflicts(self):
         """
         检查课程时间冲突
-        """
-        if not self.start_time or not self.end_time:
-            return False
         
-        # 检查教师时间冲突
-        if self.teacher_id:
-            with db_manager as db:
-                # 获取教师在同一时间段的其他课程
-                query = '''
-                SELECT COUNT(*) FROM courses 
-                WHERE teacher_id=? AND start_time < ? AND end_time > ?
-                '''
-                if self.id:
-                    query += ' AND id != ?'
-                    params = (self.teacher_id, self.end_time, self.start_time, self.id)
-                else:
-                    params = (self.teacher_id, self.end_time, self.start_time)
-                
-                result = db.fetch_one(query, params)
-                if result[0] > 0:
-                    return True
-        
-        # 检查学生时间冲突（如果已添加学生）
-        if self.id:
-            students = self.get_students()
-            for student_id in students:
-                with db_manager as db:
-                    # 获取学生在同一时间段的其他课程
-                    query = '''
-                    SELECT COUNT(*) FROM courses c
-                    JOIN course_students cs ON c.id = cs.course_id
-                    WHERE cs.student_id=? AND c.start_time < ? AND c.end_time > ? AND c.id != ?
-                    '''
-                    result = db.fetch_one(query, (student_id, self.end_time, self.start_time, self.id))
-                    if result[0] > 0:
-                        return True
+        用一条查询同时检查教师、班级和已选课学生，返回冲突列表
+        [(课程ID, 冲突原因, 课程名称, 开始时间, 结束时间), ...]，没有冲突时为空列表。
+        """
+        start, end = self.start_minute, self.end_minute
+        if start is None or end is None:
+            return []
         
-        return False
+        query = f'''
+        SELECT c.id, '教师时间冲突', c.name, c.start_time, c.end_time FROM courses c
+        WHERE c.teacher_id = :teacher_id AND c.id != :id AND {OVERLAP_CONDITION}
+        UNION
+        SELECT c.id, '班级时间冲突', c.name, c.start_time, c.end_time FROM courses c
+        WHERE c.class_name = :class_name AND :class_name != '' AND c.id != :id AND {OVERLAP_CONDITION}
+        UNION
+        SELECT c.id, '学生时间冲突', c.name, c.start_time, c.end_time FROM course_students mine
+        JOIN course_students other ON other.student_id = mine.student_id
+        JOIN courses c ON c.id = other.course_id
+        WHERE mine.course_id = :id AND c.id != :id
+          AND c.start_minute < :end AND c.end_minute > :start
+        ORDER BY 4, 1
+        '''
+        params = {
+            'id': self.id or 0,
+            'teacher_id': self.teacher_id,
+            'class_name': self.class_name or '',
+            'start': start,
+            'end': end,
+        }
+        with db_manager as db:
+            return db.fetch_all(query, params)
+    
+    @staticmethod
+    def describe_conflicts(conflicts):
+        """
+        将冲突列表格式化为提示信息
+        """
+        details = '；'.join(
+            f'{reason}：{name}（{start_time} - {end_time}）'
+            for _, reason, name, start_time, end_time in conflicts
+        )
+        return f'时间冲突：{details}'
     
     def get_teacher_name(self):
         """
-        获取教师姓名
+        获取教师姓名，查询时已取得姓名的直接返回
         """
+        if self._teacher_name and self._teacher_name[0] == self.teacher_id:
+            return self._teacher_name[1]
         if self.teacher_id:
             with db_manager as db:
                 result = db.fetch_one('SELECT name FROM teachers WHERE id=?', (self.teacher_id,))
                 if result:
+                    self._teacher_name = (self.teacher_id, result[0])
                     return result[0]
         return ''
     
@@ -149,16 +198,10 @@ class Course:
         """
         计算课程持续时间（分钟）
         """
-        if not self.start_time or not self.end_time:
-            return 0
-        
-        try:
-            start = datetime.strptime(self.start_time, '%Y-%m-%d %H:%M')
-            end = datetime.strptime(self.end_time, '%Y-%m-%d %H:%M')
-            duration = (end - start).total_seconds() / 60
-            return int(duration)
-        except:
+        start, end = self.start_minute, self.end_minute
+        if start is None or end is None:
             return 0
+        return end - start
     
     @classmethod
     def get_by_id(cls, course_id):
@@ -167,7 +210,7 @@ class Course:
         """
         with db_manager as db:
             result = db.fetch_one(
-                'SELECT id, name, teacher_id, class_name, course_type, start_time, end_time FROM courses WHERE id=?',
+                COURSE_SELECT + 'WHERE c.id=?',
                 (course_id,)
             )
             if result:
@@ -178,7 +221,8 @@ class Course:
                     class_name=result[3],
                     course_type=result[4],
                     start_time=result[5],
-                    end_time=result[6]
+                    end_time=result[6],
+                    teacher_name=result[7]
                 )
             return None
     
@@ -188,8 +232,8 @@ class Course:
         获取所有课程
         """
         with db_manager as db:
-            results = db.fetch_all(
-                'SELECT id, name, teacher_id, class_name, course_type, start_time, end_time FROM courses ORDER BY start_time'
+            results = db.fetch_cached(
+                COURSE_SELECT + 'ORDER BY c.start_minute'
             )
             return [cls(
                 id=row[0],
@@ -198,23 +242,27 @@ class Course:
                 class_name=row[3],
                 course_type=row[4],
                 start_time=row[5],
-                end_time=row[6]
+                end_time=row[6],
+                teacher_name=row[7]
             ) for row in results]
     
     @classmethod
     def get_by_time_range(cls, start_time, end_time):
         """
-        获取指定时间范围内的课程
+        获取指定时间范围内的课程，时间可以是字符串或分钟数
         """
+        if isinstance(start_time, str):
+            start_time = time_to_minutes(start_time)
+        if isinstance(end_time, str):
+            end_time = time_to_minutes(end_time)
         with db_manager as db:
             results = db.fetch_all(
-                '''
-                SELECT id, name, teacher_id, class_name, course_type, start_time, end_time 
-                FROM courses 
-                WHERE start_time < ? AND end_time > ? 
-                ORDER BY start_time
+                f'''
+                {COURSE_SELECT}
+                WHERE {OVERLAP_CONDITION}
+                ORDER BY c.start_minute
                 ''',
-                (end_time, start_time)
+                {'start': start_time, 'end': end_time}
             )
             return [cls(
                 id=row[0],
@@ -223,7 +271,8 @@ class Course:
                 class_name=row[3],
                 course_type=row[4],
                 start_time=row[5],
-                end_time=row[6]
+                end_time=row[6],
+                teacher_name=row[7]
             ) for row in results]
     
     @classmethod
@@ -233,12 +282,7 @@ class Course:
         """
         with db_manager as db:
             results = db.fetch_all(
-                '''
-                SELECT id, name, teacher_id, class_name, course_type, start_time, end_time 
-                FROM courses 
-                WHERE teacher_id=? 
-                ORDER BY start_time
-                ''',
+                COURSE_SELECT + 'WHERE c.teacher_id=? ORDER BY c.start_minute',
                 (teacher_id,)
             )
             return [cls(
@@ -248,8 +292,44 @@ class Course:
                 class_name=row[3],
                 course_type=row[4],
                 start_time=row[5],
-                end_time=row[6]
+                end_time=row[6],
+                teacher_name=row[7]
             ) for row in results]
+    
+    @classmethod
+    def prefetch_teacher_names(cls, courses):
+        """
+        用一次查询为一组课程填充教师姓名
+        """
+        teacher_ids = list({c.teacher_id for c in courses if c.teacher_id and c._teacher_name is None})
+        names = {}
+        with db_manager as db:
+            # 分批查询，避免超过 SQLite 的参数个数上限
+            for i in range(0, len(teacher_ids), 500):
+                batch = teacher_ids[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                names.update(db.fetch_all(f'SELECT id, name FROM teachers WHERE id IN ({placeholders})', batch))
+        for course in courses:
+            if course.teacher_id in names:
+                course._teacher_name = (course.teacher_id, names[course.teacher_id])
+        return courses
+    
+    @classmethod
+    def get_course_dates(cls, start_time=None, end_time=None):
+        """
+        获取有课程的日期列表（'YYYY-MM-DD'），可限定时间范围
+        """
+        query = 'SELECT DISTINCT start_minute / ? FROM courses WHERE start_minute IS NOT NULL'
+        params = [DAY_MINUTES]
+        if start_time is not None:
+            query += ' AND start_minute >= ?'
+            params.append(start_time if not isinstance(start_time, str) else time_to_minutes(start_time))
+        if end_time is not None:
+            query += ' AND start_minute < ?'
+            params.append(end_time if not isinstance(end_time, str) else time_to_minutes(end_time))
+        with db_manager as db:
+            results = db.fetch_all(query, params)
+            return [minutes_to_time(row[0] * DAY_MINUTES)[:10] for row in results]
 
 # 测试函数
 def test_course_model():
@@ -302,6 +382,15 @@ def test_course_model():
         except Exception as e:
             print(f"时间冲突检测成功: {e}")
         
+        # 未补零的时间保存时统一格式，再次保存后仍能按时间查到
+        course.start_time = '2024-1-16 9:00'
+        course.end_time = '2024-1-16 10:30'
+        course.save()
+        course.save()
+        found = [c.id for c in Course.get_by_time_range('2024-01-16 00:00', '2024-01-17 00:00')]
+        assert course.id in found, found
+        print(f"未补零时间保存为: {course.start_time} - {course.end_time}")
+    
     finally:
         # 清理测试数据
         if 'course' in locals() and course.id:
@@ -0,0 +1,225 @@
+from database import db_manager
+from database.migrations import FTS_TABLES, MAX_GRAM_LENGTH, fts_deferred_key, fill_gram_table
+
+# trigram 分词器只能匹配不少于 3 个字符的关键词
+MIN_FTS_LENGTH = 3
+
+# 各数据库中已建立的索引表：数据库路径 -> (schema_version, 表名集合)
+_index_tables = {}
+
+def _has_table(name):
+    """
+    数据库中是否有指定的表
+    
+    按数据库路径缓存，数据库结构变化（PRAGMA schema_version 改变，如迁移或补建索引）后重新读取。
+    """
+    path = db_manager.db_path
+    with db_manager as db:
+        version = db.fetch_one('PRAGMA schema_version')[0]
+        cached = _index_tables.get(path)
+        if cached is None or cached[0] != version:
+            rows = db.fetch_all("SELECT name FROM sqlite_master WHERE type='table'")
+            cached = _index_tables[path] = (version, {row[0] for row in rows})
+    return name in cached[1]
+
+def has_fts(table):
+    """
+    数据表是否有可用的全文索引
+    """
+    return _has_table(f'{table}_fts')
+
+def has_grams(table):
+    """
+    数据表是否有短关键词（单字和双字）索引
+    """
+    return _has_table(f'{table}_grams')
+
+def match_expression(keyword, columns):
+    """
+    生成在指定列中按子串匹配关键词的 FTS5 查询表达式
+    """
+    phrase = '"' + keyword.replace('"', '""') + '"'
+    return '{' + ' '.join(columns) + '} : ' + phrase
+
+def search_condition(table, keyword, columns, id_column='id'):
+    """
+    生成按关键词（子串）筛选的 WHERE 条件，返回 (条件SQL, 参数)
+    
+    关键词不少于 3 个字符时走 FTS5 trigram 索引，1～2 个字符时走单字和双字索引，
+    没有对应索引时回退为 LIKE 扫描，几种方式的匹配结果一致（子串、ASCII 不区分大小写）。
+    """
+    if len(keyword) >= MIN_FTS_LENGTH and has_fts(table):
+        return (f'{id_column} IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?)',
+                (match_expression(keyword, columns),))
+    if 0 < len(keyword) <= MAX_GRAM_LENGTH and has_grams(table):
+        indexes = ', '.join(str(FTS_TABLES[table].index(column)) for column in columns)
+        return (f'{id_column} IN (SELECT row_id FROM {table}_grams '
+                f'WHERE gram = lower(?) AND column_index IN ({indexes}))', (keyword,))
+    condition = ' OR '.join(f'{column} LIKE ?' for column in columns)
+    return f'({condition})', tuple(f'%{keyword}%' for _ in columns)
+
+def executemany_indexed(db, table, query, rows):
+    """
+    批量插入新行，并用一条语句补齐这些行的全文索引和短关键词索引
+    
+    逐行触发器维护 trigram 索引的开销是插入本身的数倍。这里在调用方的事务中写入
+    暂停标记（见 migrations.fts_deferred_key），插入触发器不再触发，插入后以
+    INSERT ... SELECT 一次写入新行（id 大于插入前最大 id）的索引，再删除标记。
+    只有普通的数据写入，不修改触发器，其他连接也看不到标记。
+    """
+    fts, grams = has_fts(table), has_grams(table)
+    if not fts and not grams:
+        db.cursor.executemany(query, rows)
+        return
+    
+    key = fts_deferred_key(table)
+    last_id = db.fetch_one(f'SELECT IFNULL(MAX(id), 0) FROM {table}')[0]
+    db.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', (key, '1'))
+    db.cursor.executemany(query, rows)
+    if fts:
+        columns = ', '.join(FTS_TABLES[table])
+        db.execute(f'INSERT INTO {table}_fts (rowid, {columns}) SELECT id, {columns} FROM {table} WHERE id > ?',
+                   (last_id,))
+    if grams:
+        fill_gram_table(db.conn, table, last_id)
+    db.execute('DELETE FROM settings WHERE key=?', (key,))
+
+def search_memos(keyword, limit=200):
+    """
+    搜索备忘录内容，返回 [(ID, 日期, 内容, 字号), ...]，按日期从新到旧排列
+    """
+    condition, params = search_condition('memos', keyword, ['content'])
+    with db_manager as db:
+        return db.fetch_all(
+            f'SELECT id, date, content, font_size FROM memos WHERE {condition} ORDER BY date DESC, created_at LIMIT ?',
+            params + (limit,)
+        )
+
+def search_all(keyword, limit=20):
+    """
+    统一搜索学生、教师、教材和备忘录
+    
+    返回 {'学生': [Student], '教师': [Teacher], '教材': [Textbook], '备忘录': [(ID, 日期, 内容, 字号)]}，
+    每类最多 limit 条。
+    """
+    from .student import Student
+    from .teacher import Teacher
+    from .textbook import Textbook
+    
+    return {
+        '学生': Student.search(keyword)[:limit],
+        '教师': Teacher.search(keyword)[:limit],
+        '教材': Textbook.search_by_name(keyword)[:limit],
+        '备忘录': search_memos(keyword, limit),
+    }
+
+# 测试函数
+def test_search_index():
+    """
+    测试批量导入后的全文索引和短关键词索引，以及旧版 SQLite 上跳过的全文索引在初始化时补建
+    """
+    import os
+    import tempfile
+    from database import init_database
+    from database.init_db import _current_databases
+    from utils.importer import bulk_import
+    from .student import Student
+    
+    original_path = db_manager.db_path
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'test.db')
+        init_database(db_path)
+        db_manager.switch_database(db_path)
+        with db_manager as db:
+            schema_before = db.fetch_one('PRAGMA schema_version')[0]
+        bulk_import('学生', ({'姓名': f'导入学生{i}'} for i in range(12000)), chunk_size=5000)
+        Student(name='手动学生').save()
+        with db_manager as db:
+            schema_after = db.fetch_one('PRAGMA schema_version')[0]
+            deferred = db.fetch_all("SELECT key FROM settings WHERE key LIKE 'fts\\_deferred\\_%' ESCAPE '\\'")
+        imported = len(Student.search_by_name('学生1199'))
+        manual = len(Student.search_by_name('手动学生'))
+        
+        # 短关键词索引在批量导入、保存、修改和删除后与 LIKE 扫描的结果一致
+        edited = Student.get_by_id(1)
+        edited.name = 'Zed'
+        edited.save()
+        Student.get_by_id(2).delete()
+        with db_manager as db:
+            mismatched = [keyword for keyword in ('动', '手动', '11', '9', 'z', 'ZE', '导入')
+                          if sorted(s.id for s in Student.search_by_name(keyword)) !=
+                          [row[0] for row in db.fetch_all('SELECT id FROM students WHERE name LIKE ? ORDER BY id',
+                                                          (f'%{keyword}%',))]]
+        
+        # 模拟迁移 6 因 SQLite 不支持 trigram 而跳过：删除全文索引后重新初始化
+        with db_manager as db:
+            for table in FTS_TABLES:
+                db.execute(f'DROP TABLE {table}_fts')
+        lost = has_fts('students')
+        _current_databases.discard(os.path.abspath(db_path))
+        init_database(db_path)
+        restored = has_fts('students') and len(Student.search_by_name('学生1199')) == imported
+        db_manager.close_all()
+    db_manager.switch_database(original_path)
+    
+    assert schema_after == schema_before, (schema_before, schema_after)
+    assert not deferred, deferred
+    assert imported == 11 and manual == 1, (imported, manual)
+    assert not mismatched, mismatched
+    assert not lost and restored
+    print("全文索引测试通过")
+
+# 性能测试
+def benchmark_search(people=100000, queries=200):
+    """
+    按关键词长度（1～3 个字符）对比索引与 LIKE 扫描的姓名搜索耗时
+    
+    返回 {关键词长度: (索引耗时, LIKE 耗时)}，单位为秒/次。
+    """
+    import os
+    import random
+    import tempfile
+    import time
+    from database import init_database
+    from utils.importer import bulk_import
+    
+    surnames = '赵钱孙李周吴郑王冯陈褚卫蒋沈韩杨朱秦尤许何吕施张孔曹严华金魏陶姜'
+    given = '伟芳娜秀英敏静丽强磊军洋勇艳杰娟涛明超秀兰霞平刚桂英'
+    rng = random.Random(people)
+    names = [rng.choice(surnames) + ''.join(rng.choice(given) for _ in range(2)) + str(i) for i in range(people)]
+    
+    original_path = db_manager.db_path
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        init_database(db_path)
+        db_manager.switch_database(db_path)
+        bulk_import('学生', ({'姓名': name, '标签': '高一'} for name in names))
+        
+        results = {}
+        for length in range(1, MIN_FTS_LENGTH + 1):
+            samples = [rng.choice(names)[1:1 + length] for _ in range(queries)]
+            # 与 Student.search_by_name 相同的条件，只取 id，不计构造对象的开销
+            start = time.perf_counter()
+            with db_manager as db:
+                index_hits = 0
+                for keyword in samples:
+                    condition, params = search_condition('students', keyword, ['name'])
+                    index_hits += len(db.fetch_all(f'SELECT id FROM students WHERE {condition}', params))
+            index_time = (time.perf_counter() - start) / queries
+            
+            start = time.perf_counter()
+            with db_manager as db:
+                like_hits = sum(len(db.fetch_all('SELECT id FROM students WHERE name LIKE ?', (f'%{keyword}%',)))
+                                for keyword in samples)
+            like_time = (time.perf_counter() - start) / queries
+            results[length] = (index_time, like_time)
+            print(f"{people} 名学生, {length} 个字符: 索引 {index_time * 1000:.2f} ms/次, "
+                  f"LIKE 扫描 {like_time * 1000:.2f} ms/次, 结果 {index_hits}/{like_hits}")
+        db_manager.close_all()
+    
+    db_manager.switch_database(original_path)
+    return results
+
+if __name__ == "__main__":
+    test_search_index()
+    benchmark_search()
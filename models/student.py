@@ -1,10 +1,18 @@
 from database import db_manager
+from utils.tools import split_list
+from .cache import EntityCache
+from .availability import get_availability, invalidate_availability
+from .search import search_condition
+from .conflict_index import conflict_index
 
 class Student:
     """
     学生模型类
     """
     
+    # 身份映射缓存，save/delete 时更新
+    _cache = EntityCache('student')
+    
     def __init__(self, id=None, name='', contact='', tags=''):
         """
         初始化学生对象
@@ -32,6 +40,13 @@ class Student:
                     'UPDATE students SET name=?, contact=?, tags=? WHERE id=?',
                     (self.name, self.contact, self.tags, self.id)
                 )
+            # 同步标签关联表
+            db.execute('DELETE FROM student_tags WHERE student_id=?', (self.id,))
+            db.cursor.executemany(
+                'INSERT INTO student_tags (student_id, tag) VALUES (?, ?)',
+                [(self.id, tag) for tag in self.get_tags()]
+            )
+        Student._cache.update(self.id, self)
         return self.id
     
     def delete(self):
@@ -42,11 +57,22 @@ class Student:
             with db_manager as db:
                 # 先删除关联数据
                 db.execute('DELETE FROM student_classes WHERE student_id=?', (self.id,))
+                db.execute('DELETE FROM student_tags WHERE student_id=?', (self.id,))
                 db.execute('DELETE FROM course_students WHERE student_id=?', (self.id,))
                 db.execute('DELETE FROM student_textbooks WHERE student_id=?', (self.id,))
                 db.execute('DELETE FROM available_times WHERE person_id=? AND person_type=?', (self.id, 'student'))
                 # 删除学生
                 db.execute('DELETE FROM students WHERE id=?', (self.id,))
+            # 关联课程或选课记录已变化，冲突索引需要重新加载
+            conflict_index.invalidate()
+            Student._cache.invalidate(self.id)
+            invalidate_availability('student', self.id)
+    
+    def get_tags(self):
+        """
+        获取学生的标签列表
+        """
+        return split_list(self.tags)
     
     def add_class(self, class_name):
         """
@@ -104,16 +130,38 @@ class Student:
                     'INSERT OR REPLACE INTO available_times (person_id, person_type, day_of_week, start_time, end_time) VALUES (?, ?, ?, ?, ?)',
                     (self.id, 'student', day_of_week, start_time, end_time)
                 )
+            invalidate_availability('student', self.id)
+    
+    def clear_available_times(self):
+        """
+        清除学生的全部可用时间（之后视为随时可用，直到重新设置）
+        """
+        if self.id:
+            with db_manager as db:
+                db.execute('DELETE FROM available_times WHERE person_id=? AND person_type=?', (self.id, 'student'))
+            invalidate_availability('student', self.id)
+    
+    def get_availability(self):
+        """
+        获取学生的每周可用时间位图（Availability），没有设置时为全周可用
+        """
+        return get_availability('student', self.id)
     
     @classmethod
     def get_by_id(cls, student_id):
         """
-        根据ID获取学生对象
+        根据ID获取学生对象，优先从缓存读取
         """
+        cached = cls._cache.get(student_id)
+        if cached is not None:
+            return cached
+        
         with db_manager as db:
             result = db.fetch_one('SELECT id, name, contact, tags FROM students WHERE id=?', (student_id,))
             if result:
-                return cls(id=result[0], name=result[1], contact=result[2], tags=result[3])
+                student = cls(id=result[0], name=result[1], contact=result[2], tags=result[3])
+                cls._cache.put(student.id, student)
+                return student
             return None
     
     @classmethod
@@ -122,7 +170,7 @@ class Student:
         获取所有学生
         """
         with db_manager as db:
-            results = db.fetch_all('SELECT id, name, contact, tags FROM students ORDER BY name')
+            results = db.fetch_cached('SELECT id, name, contact, tags FROM students ORDER BY name')
             return [cls(id=row[0], name=row[1], contact=row[2], tags=row[3]) for row in results]
     
     @classmethod
@@ -130,22 +178,36 @@ class Student:
         """
         根据姓名搜索学生
         """
+        condition, params = search_condition('students', name, ['name'])
         with db_manager as db:
             results = db.fetch_all(
-                'SELECT id, name, contact, tags FROM students WHERE name LIKE ? ORDER BY name',
-                (f'%{name}%',)
+                f'SELECT id, name, contact, tags FROM students WHERE {condition} ORDER BY name',
+                params
             )
             return [cls(id=row[0], name=row[1], contact=row[2], tags=row[3]) for row in results]
     
     @classmethod
     def search_by_tag(cls, tag):
         """
-        根据标签搜索学生
+        根据标签获取学生，标签需完全一致
+        """
+        with db_manager as db:
+            results = db.fetch_all(
+                'SELECT id, name, contact, tags FROM students WHERE id IN (SELECT student_id FROM student_tags WHERE tag=?) ORDER BY name',
+                (tag.strip(),)
+            )
+            return [cls(id=row[0], name=row[1], contact=row[2], tags=row[3]) for row in results]
+    
+    @classmethod
+    def search(cls, keyword):
+        """
+        在姓名、联系方式和标签中搜索学生
         """
+        condition, params = search_condition('students', keyword, ['name', 'contact', 'tags'])
         with db_manager as db:
             results = db.fetch_all(
-                'SELECT id, name, contact, tags FROM students WHERE tags LIKE ? ORDER BY name',
-                (f'%{tag}%',)
+                f'SELECT id, name, contact, tags FROM students WHERE {condition} ORDER BY name',
+                params
             )
             return [cls(id=row[0], name=row[1], contact=row[2], tags=row[3]) for row in results]
 
@@ -1,10 +1,18 @@
 from database import db_manager
+from utils.tools import split_list
+from .cache import EntityCache
+from .availability import get_availability, invalidate_availability
+from .search import search_condition
+from .conflict_index import conflict_index
 
 class Teacher:
     """
     教师模型类
     """
     
+    # 身份映射缓存，save/delete 时更新
+    _cache = EntityCache('teacher')
+    
     def __init__(self, id=None, name='', contact='', subject_types=''):
         """
         初始化教师对象
@@ -13,6 +21,8 @@ class Teacher:
         self.name = name
         self.contact = contact
         self.subject_types = subject_types
+        # 上次解析的 (课程类型字符串, 课程类型列表)
+        self._subjects = None
     
     def save(self):
         """
@@ -32,6 +42,13 @@ class Teacher:
                     'UPDATE teachers SET name=?, contact=?, subject_types=? WHERE id=?',
                     (self.name, self.contact, self.subject_types, self.id)
                 )
+            # 同步课程类型关联表
+            db.execute('DELETE FROM teacher_subjects WHERE teacher_id=?', (self.id,))
+            db.cursor.executemany(
+                'INSERT INTO teacher_subjects (teacher_id, subject) VALUES (?, ?)',
+                [(self.id, subject) for subject in self.get_subjects()]
+            )
+        Teacher._cache.update(self.id, self)
         return self.id
     
     def delete(self):
@@ -43,8 +60,13 @@ class Teacher:
                 # 先删除关联数据
                 db.execute('DELETE FROM courses WHERE teacher_id=?', (self.id,))
                 db.execute('DELETE FROM available_times WHERE person_id=? AND person_type=?', (self.id, 'teacher'))
+                db.execute('DELETE FROM teacher_subjects WHERE teacher_id=?', (self.id,))
                 # 删除教师
                 db.execute('DELETE FROM teachers WHERE id=?', (self.id,))
+            # 关联课程或选课记录已变化，冲突索引需要重新加载
+            conflict_index.invalidate()
+            Teacher._cache.invalidate(self.id)
+            invalidate_availability('teacher', self.id)
     
     def set_available_time(self, day_of_week, start_time, end_time):
         """
@@ -56,6 +78,16 @@ class Teacher:
                     'INSERT OR REPLACE INTO available_times (person_id, person_type, day_of_week, start_time, end_time) VALUES (?, ?, ?, ?, ?)',
                     (self.id, 'teacher', day_of_week, start_time, end_time)
                 )
+            invalidate_availability('teacher', self.id)
+    
+    def clear_available_times(self):
+        """
+        清除教师的全部可用时间（之后视为随时可用，直到重新设置）
+        """
+        if self.id:
+            with db_manager as db:
+                db.execute('DELETE FROM available_times WHERE person_id=? AND person_type=?', (self.id, 'teacher'))
+            invalidate_availability('teacher', self.id)
     
     def get_available_times(self):
         """
@@ -70,23 +102,41 @@ class Teacher:
                 return result
         return []
     
+    def get_availability(self):
+        """
+        获取教师的每周可用时间位图（Availability），没有设置时为全周可用
+        """
+        return get_availability('teacher', self.id)
+    
+    def get_subjects(self):
+        """
+        获取可教授的课程类型列表，字符串未变化时复用上次的解析结果
+        """
+        if self._subjects is None or self._subjects[0] != self.subject_types:
+            self._subjects = (self.subject_types, split_list(self.subject_types))
+        return self._subjects[1]
+    
     def can_teach(self, subject_type):
         """
         检查教师是否可以教授某课程类型
         """
-        if not self.subject_types:
-            return False
-        return subject_type in self.subject_types.split(',')
+        return subject_type in self.get_subjects()
     
     @classmethod
     def get_by_id(cls, teacher_id):
         """
-        根据ID获取教师对象
+        根据ID获取教师对象，优先从缓存读取
         """
+        cached = cls._cache.get(teacher_id)
+        if cached is not None:
+            return cached
+        
         with db_manager as db:
             result = db.fetch_one('SELECT id, name, contact, subject_types FROM teachers WHERE id=?', (teacher_id,))
             if result:
-                return cls(id=result[0], name=result[1], contact=result[2], subject_types=result[3])
+                teacher = cls(id=result[0], name=result[1], contact=result[2], subject_types=result[3])
+                cls._cache.put(teacher.id, teacher)
+                return teacher
             return None
     
     @classmethod
@@ -95,7 +145,7 @@ class Teacher:
         获取所有教师
         """
         with db_manager as db:
-            results = db.fetch_all('SELECT id, name, contact, subject_types FROM teachers ORDER BY name')
+            results = db.fetch_cached('SELECT id, name, contact, subject_types FROM teachers ORDER BY name')
             return [cls(id=row[0], name=row[1], contact=row[2], subject_types=row[3]) for row in results]
     
     @classmethod
@@ -103,22 +153,36 @@ class Teacher:
         """
         根据姓名搜索教师
         """
+        condition, params = search_condition('teachers', name, ['name'])
         with db_manager as db:
             results = db.fetch_all(
-                'SELECT id, name, contact, subject_types FROM teachers WHERE name LIKE ? ORDER BY name',
-                (f'%{name}%',)
+                f'SELECT id, name, contact, subject_types FROM teachers WHERE {condition} ORDER BY name',
+                params
             )
             return [cls(id=row[0], name=row[1], contact=row[2], subject_types=row[3]) for row in results]
     
     @classmethod
     def get_teachers_by_subject(cls, subject_type):
         """
-        根据课程类型获取教师
+        根据课程类型获取教师，课程类型需完全一致
         """
         with db_manager as db:
             results = db.fetch_all(
-                'SELECT id, name, contact, subject_types FROM teachers WHERE subject_types LIKE ? ORDER BY name',
-                (f'%{subject_type}%',)
+                'SELECT id, name, contact, subject_types FROM teachers WHERE id IN (SELECT teacher_id FROM teacher_subjects WHERE subject=?) ORDER BY name',
+                (subject_type.strip(),)
+            )
+            return [cls(id=row[0], name=row[1], contact=row[2], subject_types=row[3]) for row in results]
+    
+    @classmethod
+    def search(cls, keyword):
+        """
+        在姓名、联系方式和可教授课程类型中搜索教师
+        """
+        condition, params = search_condition('teachers', keyword, ['name', 'contact', 'subject_types'])
+        with db_manager as db:
+            results = db.fetch_all(
+                f'SELECT id, name, contact, subject_types FROM teachers WHERE {condition} ORDER BY name',
+                params
             )
             return [cls(id=row[0], name=row[1], contact=row[2], subject_types=row[3]) for row in results]
 
@@ -141,6 +205,12 @@ def test_teacher_model():
     print(f"是否可以教授数学: {teacher.can_teach('数学')}")
     print(f"是否可以教授英语: {teacher.can_teach('英语')}")
     
+    # 修改副本保存后，缓存中共享的对象同步更新
+    shared = Teacher.get_by_id(teacher_id)
+    Teacher(id=teacher_id, name='张老师', contact='13900000000', subject_types='数学,物理').save()
+    assert Teacher.get_by_id(teacher_id) is shared and shared.contact == '13900000000'
+    print(f"修改后联系方式: {shared.contact}")
+    
     # 搜索教师
     teachers = Teacher.search_by_name('张')
     print(f"搜索结果: {[t.name for t in teachers]}")
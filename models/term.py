@@ -0,0 +1,77 @@
+from datetime import date
+from database import db_manager
+from utils.tools import time_to_minutes, minutes_to_time, week_start_minutes, WEEK_MINUTES, DAY_MINUTES
+
+class Term:
+    """
+    学期模型类，保存学期开始日期和周数，负责周次与时间范围的换算
+    """
+    
+    def __init__(self, start_date='', weeks=20):
+        """
+        初始化学期对象，开始日期会对齐到所在周的周一
+        """
+        if not start_date:
+            start_date = date.today().strftime('%Y-%m-%d')
+        start = week_start_minutes(time_to_minutes(f'{start_date} 00:00'))
+        self.start_minute = start
+        self.start_date = minutes_to_time(start)[:10]
+        self.weeks = int(weeks)
+    
+    def save(self):
+        """
+        保存学期设置到数据库
+        """
+        with db_manager as db:
+            db.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
+                       ('term_start_date', self.start_date))
+            db.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
+                       ('term_weeks', str(self.weeks)))
+    
+    def week_range(self, week_index):
+        """
+        获取第 week_index 周（从0开始）的时间范围 (开始分钟, 结束分钟)
+        """
+        start = self.start_minute + week_index * WEEK_MINUTES
+        return start, start + WEEK_MINUTES
+    
+    def week_of(self, minutes):
+        """
+        获取时间所在的周次（从0开始），不在学期内时返回 None
+        """
+        index = (minutes - self.start_minute) // WEEK_MINUTES
+        if 0 <= index < self.weeks:
+            return index
+        return None
+    
+    def week_label(self, week_index):
+        """
+        获取周次的显示文本，例如 '第1周 (09-01 ~ 09-07)'
+        """
+        start, end = self.week_range(week_index)
+        first = minutes_to_time(start)[5:10]
+        last = minutes_to_time(end - DAY_MINUTES)[5:10]
+        return f'第{week_index + 1}周 ({first} ~ {last})'
+    
+    @classmethod
+    def get_current(cls):
+        """
+        获取当前学期设置
+        
+        未设置时从最早的课程（没有课程时为本周）所在周开始，
+        周数覆盖到最晚的课程和本周，至少 20 周，已有课程都能在课表中翻到。
+        """
+        with db_manager as db:
+            results = db.fetch_all(
+                "SELECT key, value FROM settings WHERE key IN ('term_start_date', 'term_weeks')"
+            )
+            settings = dict(results)
+            if 'term_start_date' in settings:
+                return cls(start_date=settings['term_start_date'], weeks=settings.get('term_weeks', 20))
+            first, last = db.fetch_one('SELECT MIN(start_minute), MAX(start_minute) FROM courses')
+        
+        today = time_to_minutes(date.today().strftime('%Y-%m-%d') + ' 00:00')
+        start = week_start_minutes(min(first, today) if first is not None else today)
+        end = max(last, today) if last is not None else today
+        weeks = max(int(settings.get('term_weeks', 20)), (end - start) // WEEK_MINUTES + 1)
+        return cls(start_date=minutes_to_time(start)[:10], weeks=weeks)
\ No newline at end of file
@@ -1,10 +1,15 @@
 from database import db_manager
+from .cache import EntityCache
+from .search import search_condition
 
 class Textbook:
     """
     教材模型类
     """
     
+    # 身份映射缓存，save/delete 时更新
+    _cache = EntityCache('textbook')
+    
     def __init__(self, id=None, name='', price=0.0, description=''):
         """
         初始化教材对象
@@ -32,6 +37,7 @@ class Textbook:
                     'UPDATE textbooks SET name=?, price=?, description=? WHERE id=?',
                     (self.name, self.price, self.description, self.id)
                 )
+        Textbook._cache.update(self.id, self)
         return self.id
     
     def delete(self):
@@ -44,6 +50,7 @@ class Textbook:
                 db.execute('DELETE FROM student_textbooks WHERE textbook_id=?', (self.id,))
                 # 删除教材
                 db.execute('DELETE FROM textbooks WHERE id=?', (self.id,))
+            Textbook._cache.invalidate(self.id)
     
     def get_students(self):
         """
@@ -97,12 +104,18 @@ class Textbook:
     @classmethod
     def get_by_id(cls, textbook_id):
         """
-        根据ID获取教材对象
+        根据ID获取教材对象，优先从缓存读取
         """
+        cached = cls._cache.get(textbook_id)
+        if cached is not None:
+            return cached
+        
         with db_manager as db:
             result = db.fetch_one('SELECT id, name, price, description FROM textbooks WHERE id=?', (textbook_id,))
             if result:
-                return cls(id=result[0], name=result[1], price=result[2], description=result[3])
+                textbook = cls(id=result[0], name=result[1], price=result[2], description=result[3])
+                cls._cache.put(textbook.id, textbook)
+                return textbook
             return None
     
     @classmethod
@@ -119,10 +132,11 @@ class Textbook:
         """
         根据名称搜索教材
         """
+        condition, params = search_condition('textbooks', name, ['name'])
         with db_manager as db:
             results = db.fetch_all(
-                'SELECT id, name, price, description FROM textbooks WHERE name LIKE ? ORDER BY name',
-                (f'%{name}%',)
+                f'SELECT id, name, price, description FROM textbooks WHERE {condition} ORDER BY name',
+                params
             )
             return [cls(id=row[0], name=row[1], price=row[2], description=row[3]) for row in results]
     
@@ -142,7 +156,7 @@ class Textbook:
             GROUP BY t.id, t.name, t.price
             ORDER BY t.name
             '''
-            return db.fetch_all(query)
+            return list(db.fetch_cached(query))
 
 # 测试函数
 def test_textbook_model():
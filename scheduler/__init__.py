@@ -0,0 +1,12 @@
+from .problem import TimeGrid, CourseRequest, ScheduleProblem, DEFAULT_PERIODS
+from .engine import Solver, Solution, solve, save_solution
+from .free_slots import find_free_slots
+from .quality import score_assignment
+from .parallel import parallel_solve, SearchResult
+from .optimizer import optimize_week, optimize_term, apply_moves, CourseMove
+from .repair import repair_courses, repair_availability, find_displaced, RepairPlan
+
+__all__ = ['TimeGrid', 'CourseRequest', 'ScheduleProblem', 'DEFAULT_PERIODS', 'Solver', 'Solution', 'solve',
+           'save_solution', 'find_free_slots', 'score_assignment', 'parallel_solve', 'SearchResult',
+           'optimize_week', 'optimize_term', 'apply_moves', 'CourseMove', 'repair_courses',
+           'repair_availability', 'find_displaced', 'RepairPlan']
\ No newline at end of file
@@ -0,0 +1,526 @@
+import random
+import time
+from database import db_manager
+from utils.tools import minutes_to_time
+from .quality import score_assignment
+
+# 每次 executemany 写入的行数
+CHUNK_SIZE = 5000
+
+class Solution:
+    """
+    排课结果
+    
+    assignment[变量] 为 (节次, 教师ID)，未能安排的变量为 None。
+    """
+    
+    def __init__(self, problem, assignment, nodes=0, elapsed=0.0):
+        """
+        初始化排课结果，nodes 为搜索的节点数，elapsed 为耗时（秒）
+        """
+        self.problem = problem
+        self.assignment = assignment
+        self.nodes = nodes
+        self.elapsed = elapsed
+    
+    @property
+    def unplaced(self):
+        """
+        未能安排的变量
+        """
+        return [var for var, value in enumerate(self.assignment) if value is None]
+    
+    @property
+    def is_complete(self):
+        """
+        是否全部安排
+        """
+        return all(value is not None for value in self.assignment)
+    
+    def score(self):
+        """
+        课表质量扣分，越低越好，见 quality.score_assignment
+        """
+        return score_assignment(self.problem, self.assignment)
+    
+    def placed_count(self):
+        """
+        已安排的节数
+        """
+        return sum(1 for value in self.assignment if value is not None)
+    
+    def iter_courses(self, week_start=None):
+        """
+        逐条返回课程 (名称, 教师ID, 班级, 课程类型, 开始分钟, 结束分钟, 变量)，week_start 默认为目标周
+        """
+        problem = self.problem
+        for var, value in enumerate(self.assignment):
+            if value is None:
+                continue
+            slot, teacher_id = value
+            request = problem.requests[problem.session_request[var]]
+            start, end = problem.session_times(slot, week_start)
+            yield request.name, teacher_id, request.class_name, request.course_type, start, end, var
+
+class Solver:
+    """
+    约束传播 + 回溯的排课求解器
+    
+    变量为每个待排节次，取值为 (节次, 教师ID)。每安排一个变量就做前向检查：
+    从有冲突的未安排变量的取值范围中删去不再可行的值（共享学生的班级不能同一节次、
+    同一教师不能同一节次、同一需求的各节由同一教师上且每天不超过 max_per_day 节），
+    某个取值范围被删空时立即回溯。变量按最少剩余值（MRV）选择，取值优先放在
+    该班级课少的日子。修改记录在撤销栈上，回溯时按栈恢复，搜索不使用递归。
+    """
+    
+    def __init__(self, problem, seed=0, max_nodes=200000, time_limit=None, stop=None):
+        """
+        初始化求解器，problem 需已调用 load()
+        
+        max_nodes 为最多搜索的节点数，time_limit 为最长秒数，stop() 返回 True 时提前停止，
+        停止时返回已找到的安排最多的结果。
+        """
+        self.problem = problem
+        self.random = random.Random(seed)
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.stop = stop
+        self._build_neighbours()
+    
+    def _build_neighbours(self):
+        """
+        预先计算每个变量在约束上相关的其他变量
+        """
+        problem = self.problem
+        count = len(problem.session_request)
+        class_vars = {}
+        teacher_vars = {}
+        request_vars = {}
+        for var in range(count):
+            index = problem.session_request[var]
+            class_vars.setdefault(problem.requests[index].class_name, []).append(var)
+            request_vars.setdefault(index, []).append(var)
+            for teacher_id in problem.candidates[index]:
+                teacher_vars.setdefault(teacher_id, []).append(var)
+        
+        # 共享学生（含同一班级）的变量，不能安排在同一节次
+        self.class_neighbours = {}
+        for class_name, conflicts in problem.class_conflicts.items():
+            self.class_neighbours[class_name] = [var for name in sorted(conflicts) for var in class_vars.get(name, ())]
+        self.teacher_vars = teacher_vars
+        self.request_vars = request_vars
+        self.day_slots = {}
+        for slot in range(len(problem.grid)):
+            self.day_slots.setdefault(slot // len(problem.grid.periods), []).append(slot)
+    
+    def solve(self):
+        """
+        求解并返回 Solution
+        """
+        problem = self.problem
+        started = time.perf_counter()
+        count = len(problem.session_request)
+        domains = [dict(domain) for domain in problem.domains]
+        assignment = [None] * count
+        self.domains = domains
+        self.assignment = assignment
+        self.trail = []
+        self.class_day_load = {}
+        self.request_day_count = {}
+        self.teacher_load = {}
+        # MRV 相同时按随机顺序选择变量，不同种子得到不同的搜索路径
+        self.rank = list(range(count))
+        self.random.shuffle(self.rank)
+        
+        # 初始取值范围为空的变量无法安排，直接跳过
+        unassigned = {var for var in range(count) if domains[var]}
+        placeable = len(unassigned)
+        best = list(assignment)
+        best_count = 0
+        nodes = 0
+        
+        # 搜索栈，每层为 [变量, 候选值, 下一个候选值的位置, 撤销栈位置]
+        stack = []
+        var = self._select(unassigned)
+        if var is not None:
+            unassigned.discard(var)
+            stack.append([var, self._order_values(var), 0, None])
+        
+        while stack:
+            frame = stack[-1]
+            var, values, position, mark = frame
+            if mark is not None:
+                # 撤销上一次尝试
+                self._unassign(var, mark)
+                frame[3] = None
+            if position >= len(values):
+                # 候选值用尽，回溯到上一层
+                stack.pop()
+                unassigned.add(var)
+                continue
+            if nodes >= self.max_nodes:
+                break
+            if nodes % 256 == 0 and ((self.time_limit is not None and time.perf_counter() - started > self.time_limit)
+                                     or (self.stop is not None and self.stop())):
+                break
+            
+            frame[2] = position + 1
+            nodes += 1
+            frame[3] = len(self.trail)
+            if not self._assign(var, values[position]):
+                continue
+            
+            placed = placeable - len(unassigned)
+            if placed > best_count:
+                best_count = placed
+                best = list(assignment)
+            next_var = self._select(unassigned)
+            if next_var is None:
+                break
+            unassigned.discard(next_var)
+            stack.append([next_var, self._order_values(next_var), 0, None])
+        
+        return Solution(problem, best, nodes, time.perf_counter() - started)
+    
+    def _select(self, unassigned):
+        """
+        选择剩余取值最少的变量，相同时选需求节数多的，再相同时按随机顺序
+        """
+        best = None
+        best_key = None
+        domains = self.domains
+        for var in unassigned:
+            key = (len(domains[var]), -len(self.request_vars[self.problem.session_request[var]]), self.rank[var])
+            if best_key is None or key < best_key:
+                best = var
+                best_key = key
+        return best
+    
+    def _order_values(self, var):
+        """
+        候选值排序：优先该班级当天课少、该需求当天未上、教师课少的值，相同时随机
+        """
+        problem = self.problem
+        index = problem.session_request[var]
+        class_name = problem.requests[index].class_name
+        periods = len(problem.grid.periods)
+        keyed = []
+        for slot, teachers in self.domains[var].items():
+            day = slot // periods
+            day_key = (self.request_day_count.get((index, day), 0),
+                       self.class_day_load.get((class_name, day), 0))
+            for teacher_id in teachers:
+                keyed.append((day_key, self.teacher_load.get(teacher_id, 0), self.random.random(), slot, teacher_id))
+        keyed.sort()
+        return [(slot, teacher_id) for _, _, _, slot, teacher_id in keyed]
+    
+    def _prune(self, var, slot, teacher_id=None):
+        """
+        从变量的取值范围中删除某个节次（teacher_id 为空时）或某节次的某位教师，删空时返回 False
+        """
+        domain = self.domains[var]
+        teachers = domain.get(slot)
+        if teachers is None:
+            return True
+        if teacher_id is None:
+            remaining = None
+        elif teacher_id not in teachers:
+            return True
+        else:
+            remaining = teachers - {teacher_id}
+        self.trail.append((var, slot, teachers))
+        if remaining:
+            domain[slot] = remaining
+        else:
+            del domain[slot]
+        return bool(domain)
+    
+    def _restrict_teacher(self, var, teacher_id):
+        """
+        变量只保留指定教师，删空时返回 False
+        """
+        domain = self.domains[var]
+        for slot, teachers in list(domain.items()):
+            if teacher_id not in teachers:
+                self.trail.append((var, slot, teachers))
+                del domain[slot]
+            elif len(teachers) > 1:
+                self.trail.append((var, slot, teachers))
+                domain[slot] = {teacher_id}
+        return bool(domain)
+    
+    def _assign(self, var, value):
+        """
+        安排变量并做前向检查，出现取值范围为空的变量时返回 False（修改保留在撤销栈上）
+        """
+        problem = self.problem
+        slot, teacher_id = value
+        index = problem.session_request[var]
+        request = problem.requests[index]
+        day = slot // len(problem.grid.periods)
+        self.assignment[var] = value
+        self.class_day_load[(request.class_name, day)] = self.class_day_load.get((request.class_name, day), 0) + 1
+        self.request_day_count[(index, day)] = self.request_day_count.get((index, day), 0) + 1
+        self.teacher_load[teacher_id] = self.teacher_load.get(teacher_id, 0) + 1
+        
+        assignment = self.assignment
+        for other in self.class_neighbours[request.class_name]:
+            if assignment[other] is None and not self._prune(other, slot):
+                return False
+        for other in self.teacher_vars.get(teacher_id, ()):
+            if assignment[other] is None and not self._prune(other, slot, teacher_id):
+                return False
+        day_full = self.request_day_count[(index, day)] >= request.max_per_day
+        for other in self.request_vars[index]:
+            if assignment[other] is not None:
+                continue
+            if not self._restrict_teacher(other, teacher_id):
+                return False
+            if day_full:
+                for day_slot in self.day_slots[day]:
+                    if not self._prune(other, day_slot):
+                        return False
+        return True
+    
+    def _unassign(self, var, mark):
+        """
+        撤销变量的安排，并把取值范围恢复到撤销栈位置 mark
+        """
+        problem = self.problem
+        slot, teacher_id = self.assignment[var]
+        index = problem.session_request[var]
+        day = slot // len(problem.grid.periods)
+        self.assignment[var] = None
+        self.class_day_load[(problem.requests[index].class_name, day)] -= 1
+        self.request_day_count[(index, day)] -= 1
+        self.teacher_load[teacher_id] -= 1
+        
+        trail = self.trail
+        domains = self.domains
+        while len(trail) > mark:
+            other, other_slot, teachers = trail.pop()
+            domains[other][other_slot] = teachers
+
+def solve(problem, seed=0, max_nodes=200000, time_limit=None, stop=None):
+    """
+    求解排课问题，problem 未加载时先从数据库加载约束
+    """
+    if not problem.domains and problem.session_request:
+        problem.load()
+    return Solver(problem, seed, max_nodes, time_limit, stop).solve()
+
+def save_solution(solution, week_starts=None):
+    """
+    将排课结果写入课程表，返回新增课程数
+    
+    week_starts 为需要排课的各周周一零点分钟数，默认为排课问题的 week_starts；
+    班级学生同时加入课程的学生名单。写入前不再逐条检测冲突（求解时已排除），
+    因此只能写入求解时已读取已有课程的周，其他周需在创建 ScheduleProblem 时加入 week_starts。
+    写入后冲突索引整体失效。
+    """
+    from models.conflict_index import conflict_index
+    
+    problem = solution.problem
+    if week_starts is None:
+        week_starts = problem.week_starts
+    unchecked = sorted(set(week_starts) - set(problem.week_starts))
+    if unchecked:
+        raise Exception(f'以下各周的已有课程未参与排课，不能直接写入: '
+                        f"{', '.join(minutes_to_time(week_start)[:10] for week_start in unchecked)}")
+    count = 0
+    with db_manager as db:
+        chunk = []
+        course_classes = []
+        
+        def flush():
+            # 逐条插入以取得课程ID，再批量写入学生名单
+            enrollments = []
+            for row, class_name in zip(chunk, course_classes):
+                db.execute(
+                    'INSERT INTO courses (name, teacher_id, class_name, course_type, start_time, end_time, start_minute, end_minute) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    row
+                )
+                course_id = db.get_last_insert_id()
+                enrollments.extend((course_id, student_id) for student_id in problem.class_students.get(class_name, ()))
+            db.cursor.executemany('INSERT OR IGNORE INTO course_students (course_id, student_id) VALUES (?, ?)',
+                                  enrollments)
+            chunk.clear()
+            course_classes.clear()
+        
+        for week_start in week_starts:
+            for name, teacher_id, class_name, course_type, start, end, _ in solution.iter_courses(week_start):
+                chunk.append((name, teacher_id, class_name, course_type, minutes_to_time(start), minutes_to_time(end),
+                              start, end))
+                course_classes.append(class_name)
+                count += 1
+                if len(chunk) >= CHUNK_SIZE:
+                    flush()
+        flush()
+    conflict_index.invalidate()
+    return count
+
+# 每周课时：科目 -> 节数
+SAMPLE_SUBJECTS = [
+    ('语文', 5), ('数学', 5), ('英语', 5), ('物理', 3), ('化学', 3), ('生物', 2),
+    ('历史', 2), ('地理', 2), ('政治', 2), ('体育', 2), ('音乐', 1), ('美术', 1),
+]
+
+def create_sample_school(classes, week_start, students_per_class=40, seed=0, main_classes=2,
+                         unavailable_rate=0.25):
+    """
+    在当前数据库中生成一所示例学校，返回排课需求列表
+    
+    每个班 students_per_class 名学生；主科（每周 5 节）教师各带 main_classes 个班，
+    其余科目各带 3 个班，比例为 unavailable_rate 的教师有半天不可用；
+    目标周每个班周一第一节已有班会。
+    """
+    from models.cache import clear_entity_caches
+    from utils.importer import bulk_import
+    from .problem import CourseRequest, DEFAULT_PERIODS
+    
+    rng = random.Random(seed)
+    class_names = [f'高一({i + 1})班' for i in range(classes)]
+    bulk_import('学生', ({'姓名': f'学生{i}', '联系方式': '', '标签': class_names[i // students_per_class]}
+                         for i in range(classes * students_per_class)))
+    
+    teachers = []
+    for subject, sessions in SAMPLE_SUBJECTS:
+        per_teacher = main_classes if sessions >= 5 else 3
+        for i in range((classes + per_teacher - 1) // per_teacher):
+            teachers.append((subject, per_teacher, i))
+    bulk_import('教师', ({'姓名': f'{subject}教师{i + 1}', '联系方式': '', '可教授课程类型': subject}
+                         for subject, _, i in teachers))
+    
+    with db_manager as db:
+        students = db.fetch_all('SELECT id, tags FROM students')
+        db.cursor.executemany('INSERT INTO student_classes (student_id, class_name) VALUES (?, ?)', students)
+        teacher_ids = dict(db.fetch_all('SELECT name, id FROM teachers'))
+        
+        # 部分教师某天上午或下午不可用，其余时间可用
+        available = []
+        for subject, _, i in teachers:
+            teacher_id = teacher_ids[f'{subject}教师{i + 1}']
+            if rng.random() >= unavailable_rate:
+                continue
+            off_day, off_half = rng.randrange(1, 6), rng.choice(['am', 'pm'])
+            for day in range(1, 6):
+                if day != off_day or off_half == 'pm':
+                    available.append((teacher_id, 'teacher', day, '08:00', '12:00'))
+                if day != off_day or off_half == 'am':
+                    available.append((teacher_id, 'teacher', day, '14:00', '18:00'))
+        db.cursor.executemany(
+            'INSERT INTO available_times (person_id, person_type, day_of_week, start_time, end_time) VALUES (?, ?, ?, ?, ?)',
+            available
+        )
+        
+        start, end = DEFAULT_PERIODS[0]
+        db.cursor.executemany(
+            'INSERT INTO courses (name, teacher_id, class_name, course_type, start_time, end_time, start_minute, end_minute) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            [('班会', None, class_name, '班会', minutes_to_time(week_start + start), minutes_to_time(week_start + end),
+              week_start + start, week_start + end) for class_name in class_names]
+        )
+    # 可用时间直接写表，缓存需要整体失效
+    clear_entity_caches()
+    
+    requests = []
+    for index, class_name in enumerate(class_names):
+        for subject, sessions in SAMPLE_SUBJECTS:
+            per_teacher = main_classes if sessions >= 5 else 3
+            teacher_id = teacher_ids[f'{subject}教师{index // per_teacher + 1}']
+            requests.append(CourseRequest(subject, class_name, sessions, teacher_id=teacher_id))
+    return requests
+
+# 测试函数
+def test_save_solution_weeks():
+    """
+    测试结果写入多周时避开每一周已有的课程
+    
+    甲班第二周前两节已有课程，两节数学只能排在后两节；未把第二周加入排课问题时拒绝写入。
+    """
+    import os
+    import tempfile
+    from database import init_database
+    from models.course import Course
+    from models.teacher import Teacher
+    from models.term import Term
+    from .problem import TimeGrid, CourseRequest, ScheduleProblem, DEFAULT_PERIODS
+    
+    term = Term('2024-09-02', 2)
+    week_starts = [term.week_range(week)[0] for week in range(2)]
+    grid = TimeGrid(days=(0,), periods=DEFAULT_PERIODS[:4])
+    original_path = db_manager.db_path
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'test.db')
+        init_database(db_path)
+        db_manager.switch_database(db_path)
+        
+        teacher = Teacher(name='数学教师', subject_types='数学')
+        teacher.save()
+        other = Teacher(name='语文教师', subject_types='语文')
+        other.save()
+        for slot in (0, 1):
+            start, end = grid.slot_range(slot)
+            Course(name='语文', teacher_id=other.id, class_name='甲班',
+                   start_time=minutes_to_time(week_starts[1] + start),
+                   end_time=minutes_to_time(week_starts[1] + end)).save()
+        requests = [CourseRequest('数学', '甲班', 2, max_per_day=2)]
+        
+        solution = solve(ScheduleProblem(requests, week_starts[0], grid).load())
+        try:
+            save_solution(solution, week_starts)
+            rejected = False
+        except Exception:
+            rejected = True
+        
+        solution = solve(ScheduleProblem(requests, week_starts[0], grid, week_starts).load())
+        saved = save_solution(solution)
+        conflicts = [course.id for course in Course.get_by_time_range(week_starts[0], term.week_range(1)[1])
+                     if course.check_conflicts()]
+        db_manager.close_all()
+    db_manager.switch_database(original_path)
+    
+    assert rejected
+    assert solution.is_complete and saved == 4, (solution.unplaced, saved)
+    assert not conflicts, conflicts
+    print("多周写入避开已有课程，测试通过")
+
+# 性能测试
+def benchmark_scheduler(sizes=(10, 30, 60), seed=0):
+    """
+    在不同规模的示例学校上测试排课耗时
+    """
+    import os
+    import tempfile
+    from database import init_database
+    from models.term import Term
+    from .problem import ScheduleProblem
+    
+    week_start = Term('2024-09-02').week_range(0)[0]
+    original_path = db_manager.db_path
+    results = []
+    for classes in sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, 'bench.db')
+            init_database(db_path)
+            db_manager.switch_database(db_path)
+            requests = create_sample_school(classes, week_start, seed=seed)
+            
+            start = time.perf_counter()
+            problem = ScheduleProblem(requests, week_start).load()
+            load_time = time.perf_counter() - start
+            solution = solve(problem, seed=seed)
+            start = time.perf_counter()
+            saved = save_solution(solution)
+            save_time = time.perf_counter() - start
+            db_manager.close_all()
+        
+        db_manager.switch_database(original_path)
+        results.append((classes, solution))
+        print(f"{classes} 个班 {len(problem.session_request)} 节: 加载 {load_time * 1000:.0f} ms, "
+              f"求解 {solution.elapsed * 1000:.0f} ms ({solution.nodes} 个节点), 写入 {saved} 节 {save_time * 1000:.0f} ms, "
+              f"未安排 {len(solution.unplaced)} 节")
+    return results
+
+if __name__ == "__main__":
+    test_save_solution_weeks()
+    benchmark_scheduler()
@@ -0,0 +1,133 @@
+import time
+from models.availability import Availability, common_availability
+from models.conflict_index import conflict_index
+from utils.tools import time_to_minutes, minutes_to_time, week_start_minutes, DAY_MINUTES, WEEK_MINUTES
+
+# 默认只在每天 08:00-22:00 内查找
+DEFAULT_DAY_WINDOW = (8 * 60, 22 * 60)
+
+def _parse_range(date_range):
+    """
+    将日期范围转换为分钟数 [开始, 结束)
+    
+    可以是 ('YYYY-MM-DD', 'YYYY-MM-DD')（结束日期包含在内）、完整时间字符串或分钟数。
+    """
+    start, end = date_range
+    if isinstance(start, str):
+        start = time_to_minutes(start if ' ' in start else f'{start} 00:00')
+    if isinstance(end, str):
+        end = time_to_minutes(end) if ' ' in end else time_to_minutes(f'{end} 00:00') + DAY_MINUTES
+    if start is None or end is None:
+        raise Exception('日期范围格式不正确')
+    return start, end
+
+def _day_window_mask(day_window):
+    """
+    每天允许排课的时间段对应的一周位图
+    """
+    first, last = day_window
+    return Availability.from_minutes([(day * DAY_MINUTES + first, day * DAY_MINUTES + last) for day in range(7)])
+
+def find_free_slots(teacher_id, student_ids, duration, date_range, limit=10, class_name=None,
+                    exclude_course_id=None, step=15, day_window=DEFAULT_DAY_WINDOW):
+    """
+    查找教师和一组学生都有空的时间，返回最早的 limit 个 [(开始时间, 结束时间), ...]
+    
+    先将教师和学生的每周可用时间位图求交集，再按周与 courses/course_students 中
+    合并后的占用区间扫描出空闲时段。每个空闲时段从按 step 分钟对齐的时刻起，
+    依次给出互不重叠的 duration 分钟时段。class_name 指定时班级的已有课程也算占用，
+    exclude_course_id 为正在调整的课程（不算占用）。逐周扫描，找够 limit 个即停止。
+    """
+    start, end = _parse_range(date_range)
+    weekly = (common_availability(teacher_id, student_ids) & _day_window_mask(day_window)).to_minutes()
+    keys = [('student', student_id) for student_id in student_ids]
+    if teacher_id is not None:
+        keys.append(('teacher', teacher_id))
+    if class_name:
+        keys.append(('class', class_name))
+    
+    slots = []
+    week_start = week_start_minutes(start)
+    while week_start < end and len(slots) < limit:
+        window_start = max(start, week_start)
+        window_end = min(end, week_start + WEEK_MINUTES)
+        busy = conflict_index.busy_intervals(keys, window_start, window_end, exclude_course_id)
+        index = 0
+        for free_start, free_end in weekly:
+            free_start = max(free_start + week_start, window_start)
+            free_end = min(free_end + week_start, window_end)
+            # 跳过在此之前结束的占用区间，按剩余的占用区间切分空闲时段
+            while index < len(busy) and busy[index][1] <= free_start:
+                index += 1
+            cursor = free_start
+            position = index
+            while cursor < free_end:
+                gap_end = free_end
+                if position < len(busy) and busy[position][0] < free_end:
+                    gap_end = max(busy[position][0], cursor)
+                slot_start = -(-cursor // step) * step
+                while slot_start + duration <= gap_end and len(slots) < limit:
+                    slots.append((slot_start, slot_start + duration))
+                    slot_start += duration
+                if len(slots) >= limit or gap_end >= free_end:
+                    break
+                cursor = max(cursor, busy[position][1])
+                position += 1
+            if len(slots) >= limit:
+                break
+        week_start += WEEK_MINUTES
+    return [(minutes_to_time(slot_start), minutes_to_time(slot_end)) for slot_start, slot_end in slots]
+
+# 性能测试
+def benchmark_free_slots(classes=30, weeks=20, queries=200, seed=0):
+    """
+    在一个学期的课程数据上测试查找共同空闲时间的耗时
+    """
+    import os
+    import random
+    import tempfile
+    from database import init_database, db_manager
+    from models.term import Term
+    from .engine import create_sample_school, solve, save_solution
+    from .problem import ScheduleProblem
+    
+    term = Term('2024-09-02', weeks)
+    week_starts = [term.week_range(week)[0] for week in range(weeks)]
+    rng = random.Random(seed)
+    original_path = db_manager.db_path
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        init_database(db_path)
+        db_manager.switch_database(db_path)
+        requests = create_sample_school(classes, term.start_minute, seed=seed)
+        solution = solve(ScheduleProblem(requests, term.start_minute, week_starts=week_starts).load(), seed=seed)
+        saved = save_solution(solution)
+        with db_manager as db:
+            teacher_ids = [row[0] for row in db.fetch_all('SELECT id FROM teachers')]
+            class_students = {}
+            for student_id, class_name in db.fetch_all('SELECT student_id, class_name FROM student_classes'):
+                class_students.setdefault(class_name, []).append(student_id)
+        
+        begin = time.perf_counter()
+        conflict_index.ensure_loaded()
+        load_time = time.perf_counter() - begin
+        date_range = (term.start_date, minutes_to_time(term.week_range(weeks - 1)[1] - DAY_MINUTES)[:10])
+        found = 0
+        worst = 0.0
+        begin = time.perf_counter()
+        for _ in range(queries):
+            students = rng.choice(list(class_students.values()))
+            query_start = time.perf_counter()
+            found += len(find_free_slots(rng.choice(teacher_ids), students, 90, date_range, limit=10))
+            worst = max(worst, time.perf_counter() - query_start)
+        elapsed = (time.perf_counter() - begin) / queries
+        db_manager.close_all()
+    
+    db_manager.switch_database(original_path)
+    conflict_index.invalidate()
+    print(f"{saved} 节课、{weeks} 周: 冲突索引加载 {load_time * 1000:.0f} ms, "
+          f"查询平均 {elapsed * 1000:.2f} ms, 最长 {worst * 1000:.2f} ms, 平均找到 {found / queries:.1f} 个时段")
+    return elapsed
+
+if __name__ == "__main__":
+    benchmark_free_slots()
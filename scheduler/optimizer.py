@@ -0,0 +1,502 @@
+import math
+import random
+import time
+from database import db_manager
+from models.availability import get_availabilities, range_mask, FULL_WEEK
+from models.course import OVERLAP_CONDITION
+from utils.tools import minutes_to_time, WEEK_MINUTES
+from .problem import TimeGrid
+from .quality import QUALITY_WEIGHTS, day_gaps, spread_penalty
+
+class CourseMove:
+    """
+    一节课的时间调整，时间为自 1970-01-01 起的分钟数
+    """
+    
+    def __init__(self, course_id, name, class_name, old_start, old_end, new_start, new_end):
+        """
+        初始化课程调整
+        """
+        self.course_id = course_id
+        self.name = name
+        self.class_name = class_name
+        self.old_start = old_start
+        self.old_end = old_end
+        self.new_start = new_start
+        self.new_end = new_end
+    
+    def describe(self):
+        """
+        调整的显示文本
+        """
+        return (f'{self.name} ({self.class_name}): {minutes_to_time(self.old_start)} -> '
+                f'{minutes_to_time(self.new_start)}')
+    
+    def __repr__(self):
+        return f'CourseMove({self.describe()!r})'
+
+def apply_moves(moves):
+    """
+    将课程调整写入数据库（一个事务），返回调整的课程数
+    """
+    from models.conflict_index import conflict_index
+    
+    with db_manager as db:
+        db.cursor.executemany(
+            'UPDATE courses SET start_time=?, end_time=?, start_minute=?, end_minute=? WHERE id=?',
+            [(minutes_to_time(move.new_start), minutes_to_time(move.new_end), move.new_start, move.new_end,
+              move.course_id) for move in moves]
+        )
+    conflict_index.invalidate()
+    return len(moves)
+
+class _Course:
+    """
+    周课表中的一节课
+    """
+    
+    __slots__ = ('id', 'name', 'class_name', 'teacher_key', 'class_key', 'keys', 'key_set', 'subject', 'slot',
+                 'allowed', 'start', 'end')
+
+class WeekSchedule:
+    """
+    一周课表的内存模型，支持 O(1) 的移动/交换可行性检查和增量评分
+    
+    与时间网格某一节完全对齐的课程可以移动（指定 movable_ids 时只有其中的课程可以移动），
+    其余课程（以及 pinned 中的课程）固定不动，
+    但都占用教师、班级和学生的时间。occupancy 记录每个 (资源, 节次) 被占用的次数，
+    检查一节课能否放到某节次只需查看它的教师、班级和学生，评分变化只需重算
+    受影响的教师日、班级日和该班该课程的日期分布。
+    """
+    
+    def __init__(self, week_start, grid=None, weights=QUALITY_WEIGHTS, pinned=(), movable_ids=None):
+        """
+        初始化周课表，week_start 为周一零点的分钟数
+        """
+        self.week_start = week_start
+        self.grid = grid or TimeGrid()
+        self.weights = weights
+        self.pinned = set(pinned)
+        self.movable_ids = set(movable_ids) if movable_ids is not None else None
+        self.periods = len(self.grid.periods)
+        self.late_period = self.periods - 1
+        self.courses = []
+        self.occupancy = {}
+        self.subject_days = {}
+    
+    def load(self):
+        """
+        从数据库读取本周课程、选课学生和可用时间
+        """
+        params = {'start': self.week_start, 'end': self.week_start + WEEK_MINUTES}
+        scope = self._related_scope()
+        with db_manager as db:
+            rows = db.fetch_all(
+                f'SELECT c.id, c.name, c.teacher_id, c.class_name, c.start_minute, c.end_minute FROM courses c WHERE {OVERLAP_CONDITION} {scope}',
+                params
+            )
+            enrollments = db.fetch_all(
+                f'''SELECT cs.course_id, cs.student_id FROM course_students cs
+                    JOIN courses c ON c.id = cs.course_id WHERE {OVERLAP_CONDITION} {scope}''',
+                params
+            )
+        students = {}
+        student_courses = {}
+        for course_id, student_id in enrollments:
+            students.setdefault(course_id, []).append(student_id)
+            student_courses.setdefault(student_id, []).append(course_id)
+        
+        # 本周所上课程完全相同的学生（通常是同一班级）归为一组，按组记录占用，
+        # 一节课的冲突检查只需查看少数几个学生组，而不是逐个学生
+        signatures = {}
+        student_group = {}
+        self.student_groups = {}
+        for student_id, course_ids in student_courses.items():
+            group = signatures.setdefault(tuple(sorted(course_ids)), len(signatures))
+            student_group[student_id] = group
+            self.student_groups.setdefault(group, []).append(student_id)
+        
+        slot_of = {self.grid.slot_range(slot): slot for slot in range(len(self.grid))}
+        movable = []
+        for course_id, name, teacher_id, class_name, start, end in rows:
+            course_students = students.get(course_id, [])
+            keys = sorted({('students', student_group[student_id]) for student_id in course_students})
+            teacher_key = ('teacher', teacher_id) if teacher_id else None
+            class_key = ('class', class_name) if class_name else None
+            keys += [key for key in (teacher_key, class_key) if key]
+            slot = slot_of.get((start - self.week_start, end - self.week_start))
+            if slot is None:
+                # 不在网格上的课程只占用时间
+                for other in self.grid.slots_overlapping(start - self.week_start, end - self.week_start):
+                    for key in keys:
+                        self.occupancy[(key, other)] = self.occupancy.get((key, other), 0) + 1
+                continue
+            
+            course = _Course()
+            course.id = course_id
+            course.name = name
+            course.class_name = class_name
+            course.teacher_key = teacher_key
+            course.class_key = class_key
+            course.keys = keys
+            course.key_set = frozenset(keys)
+            course.subject = (class_name, name)
+            course.slot = slot
+            course.start = start
+            course.end = end
+            course.allowed = 0
+            self._add(course)
+            self.courses.append(course)
+            if course_id not in self.pinned and (self.movable_ids is None or course_id in self.movable_ids):
+                movable.append((course, teacher_id, course_students))
+        
+        # 可移动课程能去的节次：教师和全部学生都可用
+        teacher_ids = list({teacher_id for _, teacher_id, _ in movable if teacher_id})
+        student_ids = list({student_id for _, _, ids in movable for student_id in ids})
+        availability = {('teacher', person_id): value.bits
+                        for person_id, value in get_availabilities('teacher', teacher_ids).items()}
+        for student_id, value in get_availabilities('student', student_ids).items():
+            key = ('students', student_group[student_id])
+            availability[key] = availability.get(key, FULL_WEEK) & value.bits
+        slot_masks = [self._slot_mask(slot) for slot in range(len(self.grid))]
+        for course, teacher_id, course_students in movable:
+            bits = FULL_WEEK
+            for key in course.keys:
+                bits &= availability.get(key, FULL_WEEK)
+            course.allowed = sum(1 << slot for slot, mask in enumerate(slot_masks) if bits & mask == mask)
+        self.movable = [course for course, _, _ in movable]
+        return self
+    
+    def _related_scope(self):
+        """
+        指定了 movable_ids 时，只加载与这些课程共用教师、班级或学生的本周课程
+        
+        其余课程既不影响它们能否放到某节次，也不影响相关的评分，
+        加载量因此只与这些课程涉及的人员有关，与学校规模无关。
+        """
+        if self.movable_ids is None:
+            return ''
+        ids = ', '.join(str(int(course_id)) for course_id in sorted(self.movable_ids)) or 'NULL'
+        return f'''AND c.id IN (
+            SELECT c.id FROM courses c
+            WHERE c.teacher_id IN (SELECT teacher_id FROM courses WHERE id IN ({ids})) AND {OVERLAP_CONDITION}
+            UNION
+            SELECT c.id FROM courses c
+            WHERE c.class_name IN (SELECT class_name FROM courses WHERE id IN ({ids})) AND {OVERLAP_CONDITION}
+            UNION
+            SELECT cs2.course_id FROM course_students cs1
+            JOIN course_students cs2 ON cs2.student_id = cs1.student_id
+            JOIN courses c ON c.id = cs2.course_id
+            WHERE cs1.course_id IN ({ids}) AND {OVERLAP_CONDITION}
+        )'''
+    
+    def _slot_mask(self, slot):
+        """
+        节次对应的可用时间位图
+        """
+        return range_mask(*self.grid.slot_range(slot))
+    
+    def _add(self, course):
+        """
+        将课程放到其当前节次
+        """
+        occupancy = self.occupancy
+        slot = course.slot
+        for key in course.keys:
+            occupancy[(key, slot)] = occupancy.get((key, slot), 0) + 1
+        self.subject_days.setdefault(course.subject, []).append(slot // self.periods)
+    
+    def _remove(self, course):
+        """
+        将课程从其当前节次移除
+        """
+        occupancy = self.occupancy
+        slot = course.slot
+        for key in course.keys:
+            occupancy[(key, slot)] -= 1
+        self.subject_days[course.subject].remove(slot // self.periods)
+    
+    def _fits(self, course, slot):
+        """
+        课程能否放到节次（课程本身需已移除）
+        """
+        if not course.allowed >> slot & 1:
+            return False
+        occupancy = self.occupancy
+        return not any(occupancy.get((key, slot)) for key in course.keys)
+    
+    def _feasible(self, changes):
+        """
+        不改动课表，检查一组调整是否可行：目标节次可用，且除了同组中要移走的课程外没有占用
+        """
+        occupancy = self.occupancy
+        for course, slot in changes:
+            if not course.allowed >> slot & 1:
+                return False
+            leaving = [other.key_set for other, _ in changes if other is not course and other.slot == slot]
+            for key in course.keys:
+                count = occupancy.get((key, slot), 0)
+                if count and count > sum(1 for key_set in leaving if key in key_set):
+                    return False
+        return True
+    
+    def _day_cost(self, key, day):
+        """
+        教师或班级某天的空节扣分
+        """
+        base = day * self.periods
+        occupancy = self.occupancy
+        mask = 0
+        for period in range(self.periods):
+            if occupancy.get((key, base + period)):
+                mask |= 1 << period
+        weight = self.weights['teacher_gap'] if key[0] == 'teacher' else self.weights['class_gap']
+        return weight * day_gaps(mask)
+    
+    def _local_cost(self, courses, days, subjects):
+        """
+        受影响部分的扣分：教师日、班级日、课程日期分布和最后一节
+        """
+        cost = 0
+        for course in courses:
+            if course.slot % self.periods >= self.late_period:
+                cost += self.weights['late']
+        for key, day in days:
+            cost += self._day_cost(key, day)
+        for subject in subjects:
+            cost += self.weights['spread'] * spread_penalty(self.subject_days[subject])
+        return cost
+    
+    def _affected(self, changes):
+        """
+        一组调整影响的 (资源, 日期) 和 (班级, 课程名称)
+        """
+        days = set()
+        subjects = set()
+        for course, slot in changes:
+            for key in (course.teacher_key, course.class_key):
+                if key:
+                    days.add((key, course.slot // self.periods))
+                    days.add((key, slot // self.periods))
+            subjects.add(course.subject)
+        return days, subjects
+    
+    def try_changes(self, changes):
+        """
+        尝试一组调整 [(课程, 新节次), ...]，不可行时返回 None，否则返回 (扣分变化, 原节次)
+        
+        调整已生效，调用方根据扣分变化决定是否用 undo 撤销。
+        """
+        if not self._feasible(changes):
+            return None
+        courses = [course for course, _ in changes]
+        days, subjects = self._affected(changes)
+        before = self._local_cost(courses, days, subjects)
+        old_slots = [course.slot for course in courses]
+        for course in courses:
+            self._remove(course)
+        placed = []
+        for course, slot in changes:
+            if not self._fits(course, slot):
+                break
+            course.slot = slot
+            self._add(course)
+            placed.append(course)
+        else:
+            return self._local_cost(courses, days, subjects) - before, old_slots
+        
+        # 不可行，恢复原位
+        for course in placed:
+            self._remove(course)
+        for course, slot in zip(courses, old_slots):
+            course.slot = slot
+            self._add(course)
+        return None
+    
+    def lift(self, course):
+        """
+        将课程从课表中取出，不再占用时间，之后用 place 放回
+        """
+        self._remove(course)
+    
+    def place(self, course, slot):
+        """
+        将取出的课程放到节次
+        """
+        course.slot = slot
+        self._add(course)
+    
+    def placement_cost(self, course, slot):
+        """
+        取出的课程放到节次的扣分变化，不可行时返回 None
+        """
+        if not self._fits(course, slot):
+            return None
+        days = {(key, slot // self.periods) for key in (course.teacher_key, course.class_key) if key}
+        subjects = {course.subject}
+        before = self._local_cost([], days, subjects)
+        course.slot = slot
+        self._add(course)
+        after = self._local_cost([course], days, subjects)
+        self._remove(course)
+        return after - before
+    
+    def undo(self, courses, old_slots):
+        """
+        撤销 try_changes 的调整
+        """
+        for course in courses:
+            self._remove(course)
+        for course, slot in zip(courses, old_slots):
+            course.slot = slot
+            self._add(course)
+    
+    def total_cost(self):
+        """
+        整周课表的扣分
+        """
+        days = set()
+        for course in self.courses:
+            for key in (course.teacher_key, course.class_key):
+                if key:
+                    days.add((key, course.slot // self.periods))
+        return self._local_cost(self.courses, days, set(self.subject_days))
+    
+    def snapshot(self):
+        """
+        当前各课程的节次
+        """
+        return [course.slot for course in self.courses]
+    
+    def moves_from(self, slots):
+        """
+        与原始时间相比的调整列表
+        """
+        moves = []
+        for course, slot in zip(self.courses, slots):
+            start, end = self.grid.slot_range(slot)
+            start += self.week_start
+            end += self.week_start
+            if start != course.start:
+                moves.append(CourseMove(course.id, course.name, course.class_name, course.start, course.end,
+                                        start, end))
+        return moves
+
+class OptimizeResult:
+    """
+    优化结果：moves 为课程调整列表，score_before/score_after 为优化前后的扣分
+    """
+    
+    def __init__(self, moves, score_before, score_after, iterations, accepted, elapsed):
+        """
+        初始化优化结果
+        """
+        self.moves = moves
+        self.score_before = score_before
+        self.score_after = score_after
+        self.iterations = iterations
+        self.accepted = accepted
+        self.elapsed = elapsed
+
+def optimize_week(week_start, iterations=50000, seed=0, start_temperature=3.0, end_temperature=0.05,
+                  time_limit=None, pinned=(), grid=None, apply=False):
+    """
+    用模拟退火优化一周课表的质量，返回 OptimizeResult
+    
+    邻域为把一节课移到同一班级的空节次（移动）或交换同一班级的两节课（交换），
+    只接受不产生教师、班级、学生冲突且符合可用时间的调整，因此结果始终无冲突。
+    扣分只对受影响的教师日、班级日和课程分布增量计算。温度从 start_temperature
+    按几何级数降到 end_temperature。apply 为 True 时直接写入数据库。
+    """
+    started = time.perf_counter()
+    schedule = WeekSchedule(week_start, grid, pinned=pinned).load()
+    rng = random.Random(seed)
+    cost = schedule.total_cost()
+    score_before = cost
+    best_cost = cost
+    best_slots = schedule.snapshot()
+    original_slots = list(best_slots)
+    movable = schedule.movable
+    class_courses = {}
+    for course in movable:
+        class_courses.setdefault(course.class_name, []).append(course)
+    slot_count = len(schedule.grid)
+    
+    accepted = 0
+    done = 0
+    if movable:
+        cooling = (end_temperature / start_temperature) ** (1.0 / max(iterations, 1))
+        temperature = start_temperature
+        for done in range(1, iterations + 1):
+            temperature *= cooling
+            if time_limit is not None and done % 1024 == 0 and time.perf_counter() - started > time_limit:
+                break
+            course = rng.choice(movable)
+            if rng.random() < 0.5:
+                changes = [(course, rng.randrange(slot_count))]
+            else:
+                other = rng.choice(class_courses[course.class_name])
+                changes = [(course, other.slot), (other, course.slot)]
+            if changes[0][1] == course.slot:
+                continue
+            outcome = schedule.try_changes(changes)
+            if outcome is None:
+                continue
+            delta, old_slots = outcome
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                cost += delta
+                accepted += 1
+                if cost < best_cost:
+                    best_cost = cost
+                    best_slots = schedule.snapshot()
+            else:
+                schedule.undo([item for item, _ in changes], old_slots)
+    
+    moves = schedule.moves_from(best_slots) if best_slots != original_slots else []
+    if apply and moves:
+        apply_moves(moves)
+    return OptimizeResult(moves, score_before, best_cost, done, accepted, time.perf_counter() - started)
+
+def optimize_term(term, iterations=50000, seed=0, time_limit=None, apply=False):
+    """
+    逐周优化整个学期的课表，返回各周的 OptimizeResult 列表
+    """
+    return [optimize_week(term.week_range(week)[0], iterations, seed, time_limit=time_limit, apply=apply)
+            for week in range(term.weeks)]
+
+# 性能测试
+def benchmark_optimizer(classes=30, iterations=100000, seed=0):
+    """
+    先自动排课，再用模拟退火优化，比较优化前后的扣分并检查结果无冲突
+    """
+    import os
+    import tempfile
+    from database import init_database
+    from models.course import Course
+    from models.term import Term
+    from .engine import create_sample_school, solve, save_solution
+    from .problem import ScheduleProblem
+    
+    week_start = Term('2024-09-02').week_range(0)[0]
+    original_path = db_manager.db_path
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        init_database(db_path)
+        db_manager.switch_database(db_path)
+        requests = create_sample_school(classes, week_start, seed=seed)
+        save_solution(solve(ScheduleProblem(requests, week_start).load(), seed=seed))
+        
+        result = optimize_week(week_start, iterations, seed, apply=True)
+        conflicts = sum(1 for course in Course.get_by_time_range(week_start, week_start + WEEK_MINUTES)
+                        if course.check_conflicts())
+        check = WeekSchedule(week_start).load().total_cost()
+        db_manager.close_all()
+    
+    db_manager.switch_database(original_path)
+    print(f"{classes} 个班: 扣分 {result.score_before} -> {result.score_after}（重新计算 {check}）, "
+          f"调整 {len(result.moves)} 节, {result.iterations} 次迭代 {result.elapsed:.2f} s "
+          f"({result.elapsed / max(result.iterations, 1) * 1e6:.1f} µs/次), 冲突 {conflicts} 节")
+    return result
+
+if __name__ == "__main__":
+    benchmark_optimizer()
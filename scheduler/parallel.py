@@ -0,0 +1,148 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from .engine import Solver, Solution
+from .quality import score_assignment
+
+# 工作进程中的排课问题和停止标志，由进程池初始化函数设置
+_worker_problem = None
+_worker_stop = None
+
+def _init_worker(problem, stop_event):
+    """
+    工作进程初始化：保存排课问题，每个进程只传输一次
+    """
+    global _worker_problem, _worker_stop
+    _worker_problem = problem
+    _worker_stop = stop_event
+
+def _run_attempt(seed, max_nodes, time_limit):
+    """
+    在工作进程中执行一次求解，返回 (种子, 安排, 节点数, 耗时)
+    """
+    solver = Solver(_worker_problem, seed, max_nodes, time_limit, _worker_stop.is_set)
+    solution = solver.solve()
+    return seed, solution.assignment, solution.nodes, solution.elapsed
+
+class SearchResult:
+    """
+    多次重启求解的结果
+    
+    best 为得分最低的 Solution（没有完成任何一次求解时为 None），
+    attempts 为每次求解的 (种子, 得分, 未安排节数, 节点数, 耗时)。
+    """
+    
+    def __init__(self, best=None, score=None, attempts=None, cancelled=False, elapsed=0.0):
+        """
+        初始化求解结果
+        """
+        self.best = best
+        self.score = score
+        self.attempts = attempts or []
+        self.cancelled = cancelled
+        self.elapsed = elapsed
+
+def parallel_solve(problem, attempts=8, workers=None, time_budget=None, seed=0, max_nodes=200000,
+                   cancel=None, progress=None):
+    """
+    用进程池并行执行 attempts 次不同种子的求解，保留质量得分最低的结果
+    
+    workers 默认为 CPU 核数，为 1 时在当前进程中依次执行。time_budget 为总时长（秒），
+    到时未完成的求解会被停止并返回各自已找到的部分结果；cancel 为带 is_set() 的对象
+    （如 threading.Event），设置后尽快停止。每完成一次调用 progress(已完成次数, 总次数, 当前最低得分)。
+    problem 需已调用 load()。
+    """
+    if not problem.domains and problem.session_request:
+        problem.load()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, attempts))
+    started = time.perf_counter()
+    deadline = started + time_budget if time_budget is not None else None
+    result = SearchResult()
+    
+    def remaining():
+        return None if deadline is None else max(deadline - time.perf_counter(), 0.0)
+    
+    def record(seed_value, assignment, nodes, elapsed):
+        score = score_assignment(problem, assignment)
+        unplaced = sum(1 for value in assignment if value is None)
+        result.attempts.append((seed_value, score, unplaced, nodes, elapsed))
+        if result.score is None or score < result.score:
+            result.score = score
+            result.best = Solution(problem, assignment, nodes, elapsed)
+        if progress:
+            progress(len(result.attempts), attempts, result.score)
+    
+    seeds = [seed + i for i in range(attempts)]
+    if workers == 1:
+        def stop():
+            return (cancel is not None and cancel.is_set()) or (deadline is not None and time.perf_counter() > deadline)
+        for seed_value in seeds:
+            if stop():
+                break
+            solution = Solver(problem, seed_value, max_nodes, remaining(), stop).solve()
+            record(seed_value, solution.assignment, solution.nodes, solution.elapsed)
+    else:
+        context = multiprocessing.get_context()
+        stop_event = context.Event()
+        executor = ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                       initargs=(problem, stop_event))
+        try:
+            # 每个求解的时长上限为剩余的总时长，保证到时所有进程都会停下
+            pending = {executor.submit(_run_attempt, seed_value, max_nodes, remaining()) for seed_value in seeds}
+            while pending:
+                if cancel is not None and cancel.is_set():
+                    stop_event.set()
+                done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if not future.cancelled():
+                        record(*future.result())
+                if deadline is not None and time.perf_counter() > deadline:
+                    stop_event.set()
+                if stop_event.is_set():
+                    # 未开始的求解直接取消，已开始的会在检查停止标志后返回部分结果
+                    for future in pending:
+                        future.cancel()
+        finally:
+            stop_event.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    result.cancelled = cancel is not None and cancel.is_set()
+    result.elapsed = time.perf_counter() - started
+    return result
+
+# 性能测试
+def benchmark_parallel(classes=60, attempts=16, time_budget=30, seed=0):
+    """
+    在较紧的示例学校上对比单次求解与并行多次重启的结果
+    """
+    import tempfile
+    from database import init_database, db_manager
+    from models.term import Term
+    from .engine import create_sample_school
+    from .problem import ScheduleProblem
+    
+    week_start = Term('2024-09-02').week_range(0)[0]
+    original_path = db_manager.db_path
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        init_database(db_path)
+        db_manager.switch_database(db_path)
+        requests = create_sample_school(classes, week_start, seed=seed, main_classes=3, unavailable_rate=0.5)
+        problem = ScheduleProblem(requests, week_start).load()
+        db_manager.close_all()
+    db_manager.switch_database(original_path)
+    
+    single = Solver(problem, seed, max_nodes=20000).solve()
+    print(f"单次求解: 得分 {single.score()}, 未安排 {len(single.unplaced)} 节, 耗时 {single.elapsed:.2f} s")
+    for workers in (1, None):
+        result = parallel_solve(problem, attempts, workers, time_budget, seed, max_nodes=20000)
+        completed = sum(1 for attempt in result.attempts if attempt[2] == 0)
+        print(f"{workers or os.cpu_count()} 个进程 {attempts} 次: 最低得分 {result.score}, "
+              f"{completed}/{len(result.attempts)} 次完整, 耗时 {result.elapsed:.2f} s")
+    return result
+
+if __name__ == "__main__":
+    benchmark_parallel()
@@ -0,0 +1,234 @@
+from database import db_manager
+from models.availability import get_availabilities, FULL_WEEK
+from models.course import OVERLAP_CONDITION
+from utils.tools import DAY_MINUTES, WEEK_MINUTES
+
+# 默认每日节次 (开始分钟, 结束分钟)，自零点起：上午 4 节、下午 4 节，每节 45 分钟
+DEFAULT_PERIODS = [
+    (480, 525), (535, 580), (600, 645), (655, 700),
+    (840, 885), (895, 940), (960, 1005), (1015, 1060),
+]
+
+class TimeGrid:
+    """
+    每周排课时间网格：上课日 × 每日节次
+    
+    节次编号 slot = 上课日序号 * 每日节数 + 节次序号，各节次互不重叠。
+    """
+    
+    def __init__(self, days=(0, 1, 2, 3, 4), periods=DEFAULT_PERIODS):
+        """
+        初始化时间网格，days 为星期几（0 为周一），periods 为每日节次
+        """
+        self.days = list(days)
+        self.periods = list(periods)
+    
+    def __len__(self):
+        return len(self.days) * len(self.periods)
+    
+    def slot_day(self, slot):
+        """
+        节次所在的星期几（0 为周一）
+        """
+        return self.days[slot // len(self.periods)]
+    
+    def slot_period(self, slot):
+        """
+        节次在当天的序号
+        """
+        return slot % len(self.periods)
+    
+    def slot_range(self, slot):
+        """
+        节次相对周一零点的时间范围 (开始分钟, 结束分钟)
+        """
+        offset = self.slot_day(slot) * DAY_MINUTES
+        start, end = self.periods[self.slot_period(slot)]
+        return offset + start, offset + end
+    
+    def slots_overlapping(self, start, end):
+        """
+        与相对周一零点的时间范围 [start, end) 重叠的节次
+        """
+        return [slot for slot in range(len(self))
+                if self.slot_range(slot)[0] < end and self.slot_range(slot)[1] > start]
+
+class CourseRequest:
+    """
+    排课需求：某个班级每周需要上 sessions 节某门课
+    """
+    
+    def __init__(self, name, class_name, sessions, teacher_id=None, subject='', course_type='', max_per_day=1):
+        """
+        初始化排课需求
+        
+        teacher_id 为空时从可教授 subject（默认同课程名称）的教师中选择；
+        max_per_day 为同一门课每天最多安排的节数。
+        """
+        self.name = name
+        self.class_name = class_name
+        self.sessions = int(sessions)
+        self.teacher_id = teacher_id
+        self.subject = subject or name
+        self.course_type = course_type
+        self.max_per_day = max_per_day
+    
+    def __repr__(self):
+        return f'CourseRequest({self.name!r}, {self.class_name!r}, {self.sessions})'
+
+class ScheduleProblem:
+    """
+    排课问题：一组排课需求、时间网格以及从数据库读取的约束
+    
+    约束包括教师和学生的可用时间（见 models.availability，没有记录的人员视为随时可用）、
+    各排课周内已有课程占用的教师、班级和学生时间，以及同时属于多个班级的学生。
+    每个需求拆成 sessions 个待排节次（变量），取值为 (节次, 教师ID)。
+    """
+    
+    def __init__(self, requests, week_start, grid=None, week_starts=None):
+        """
+        初始化排课问题，week_start 为目标周周一零点的分钟数
+        
+        week_starts 为结果要重复写入的各周（周一零点分钟数），这些周的已有课程
+        同样占用节次，默认只有目标周。
+        """
+        self.requests = list(requests)
+        self.week_start = week_start
+        self.week_starts = sorted(set(week_starts or ()) | {week_start})
+        self.grid = grid or TimeGrid()
+        # 每个变量对应的需求序号
+        self.session_request = [index for index, request in enumerate(self.requests)
+                                for _ in range(request.sessions)]
+        self.class_students = {}
+        self.candidates = []
+        self.blocked = {}
+        self.class_conflicts = {}
+        self.domains = []
+    
+    def load(self):
+        """
+        从数据库读取约束并计算每个变量的初始取值范围
+        """
+        class_names = sorted({request.class_name for request in self.requests})
+        with db_manager as db:
+            self.class_students = {name: [] for name in class_names}
+            if class_names:
+                rows = db.fetch_all(
+                    f"SELECT class_name, student_id FROM student_classes WHERE class_name IN ({', '.join('?' * len(class_names))})",
+                    class_names
+                )
+                for class_name, student_id in rows:
+                    self.class_students[class_name].append(student_id)
+            
+            self.candidates = [self._load_candidates(db, request) for request in self.requests]
+            teacher_ids = sorted({teacher_id for candidates in self.candidates for teacher_id in candidates})
+            student_ids = sorted({student_id for students in self.class_students.values() for student_id in students})
+            
+            # 不可用或已被占用的节次：('teacher', id) / ('student', id) / ('class', 名称) -> 节次集合
+            self.blocked = {}
+            self._load_unavailable('teacher', teacher_ids)
+            self._load_unavailable('student', student_ids)
+            self._load_busy(db)
+        
+        # 同时属于多个班级的学生使这些班级不能在同一节次上课
+        student_classes = {}
+        for class_name, students in self.class_students.items():
+            for student_id in students:
+                student_classes.setdefault(student_id, set()).add(class_name)
+        self.class_conflicts = {name: {name} for name in class_names}
+        for classes in student_classes.values():
+            for class_name in classes:
+                self.class_conflicts[class_name] |= classes
+        
+        self.domains = [self._initial_domain(self.session_request[var]) for var in range(len(self.session_request))]
+        return self
+    
+    def _load_candidates(self, db, request):
+        """
+        获取需求的候选教师ID
+        """
+        if request.teacher_id is not None:
+            return [request.teacher_id]
+        rows = db.fetch_all('SELECT teacher_id FROM teacher_subjects WHERE subject=? ORDER BY teacher_id',
+                            (request.subject,))
+        return [row[0] for row in rows]
+    
+    def _load_unavailable(self, person_type, person_ids):
+        """
+        根据人员的可用时间位图标记不可用的节次
+        """
+        for person_id, availability in get_availabilities(person_type, person_ids).items():
+            if availability.bits == FULL_WEEK:
+                continue
+            unavailable = {slot for slot in range(len(self.grid)) if not availability.covers(*self.grid.slot_range(slot))}
+            if unavailable:
+                self.blocked.setdefault((person_type, person_id), set()).update(unavailable)
+    
+    def _load_busy(self, db):
+        """
+        标记各排课周已有课程占用的教师、班级和学生节次
+        """
+        for week_start in self.week_starts:
+            self._load_week_busy(db, week_start)
+    
+    def _load_week_busy(self, db, week_start):
+        """
+        标记一周内已有课程占用的节次
+        """
+        params = {'start': week_start, 'end': week_start + WEEK_MINUTES}
+        courses = db.fetch_all(
+            f'SELECT c.id, c.teacher_id, c.class_name, c.start_minute, c.end_minute FROM courses c WHERE {OVERLAP_CONDITION}',
+            params
+        )
+        if not courses:
+            return
+        enrollments = db.fetch_all(
+            f'''SELECT cs.course_id, cs.student_id FROM course_students cs
+                JOIN courses c ON c.id = cs.course_id WHERE {OVERLAP_CONDITION}''',
+            params
+        )
+        students = {}
+        for course_id, student_id in enrollments:
+            students.setdefault(course_id, []).append(student_id)
+        
+        for course_id, teacher_id, class_name, start, end in courses:
+            slots = self.grid.slots_overlapping(start - week_start, end - week_start)
+            keys = [('teacher', teacher_id), ('class', class_name)]
+            keys += [('student', student_id) for student_id in students.get(course_id, ())]
+            for key in keys:
+                if key[1]:
+                    self.blocked.setdefault(key, set()).update(slots)
+    
+    def class_blocked(self, class_name):
+        """
+        班级不能上课的节次：班级已有课程、班级学生不可用或已有课程
+        """
+        blocked = set(self.blocked.get(('class', class_name), ()))
+        for student_id in self.class_students.get(class_name, ()):
+            blocked |= self.blocked.get(('student', student_id), set())
+        return blocked
+    
+    def _initial_domain(self, request_index):
+        """
+        计算需求的初始取值范围 {节次: {候选教师ID}}
+        """
+        request = self.requests[request_index]
+        class_blocked = self.class_blocked(request.class_name)
+        domain = {}
+        for slot in range(len(self.grid)):
+            if slot in class_blocked:
+                continue
+            teachers = {teacher_id for teacher_id in self.candidates[request_index]
+                        if slot not in self.blocked.get(('teacher', teacher_id), ())}
+            if teachers:
+                domain[slot] = teachers
+        return domain
+    
+    def session_times(self, slot, week_start=None):
+        """
+        节次在指定周（默认目标周）的开始和结束分钟数
+        """
+        if week_start is None:
+            week_start = self.week_start
+        start, end = self.grid.slot_range(slot)
+        return week_start + start, week_start + end
@@ -0,0 +1,68 @@
+# 课表质量各项扣分的权重，总分越低越好
+QUALITY_WEIGHTS = {
+    'unplaced': 1000,    # 未能安排的节次
+    'teacher_gap': 2,    # 教师一天中两节课之间的空节
+    'class_gap': 3,      # 班级一天中两节课之间的空节
+    'spread': 1,         # 同一门课安排在同一天或相邻两天
+    'late': 1,           # 安排在每天最后一节
+}
+
+def day_gaps(mask):
+    """
+    一天的占用位图中第一节与最后一节之间的空节数
+    """
+    if not mask:
+        return 0
+    low = (mask & -mask).bit_length()
+    return mask.bit_length() - low + 1 - bin(mask).count('1')
+
+def spread_penalty(days):
+    """
+    同一门课各节所在日期的分布扣分：同一天 3 分，相邻两天 1 分
+    """
+    penalty = 0
+    for i in range(len(days)):
+        for j in range(i + 1, len(days)):
+            distance = abs(days[i] - days[j])
+            if distance == 0:
+                penalty += 3
+            elif distance == 1:
+                penalty += 1
+    return penalty
+
+def score_breakdown(problem, assignment):
+    """
+    计算排课结果各项扣分（未加权），返回 {项目: 扣分}
+    """
+    periods = len(problem.grid.periods)
+    late_period = periods - 1
+    teacher_days = {}
+    class_days = {}
+    request_days = {}
+    breakdown = dict.fromkeys(QUALITY_WEIGHTS, 0)
+    for var, value in enumerate(assignment):
+        if value is None:
+            breakdown['unplaced'] += 1
+            continue
+        slot, teacher_id = value
+        index = problem.session_request[var]
+        day, period = divmod(slot, periods)
+        bit = 1 << period
+        teacher_days[(teacher_id, day)] = teacher_days.get((teacher_id, day), 0) | bit
+        class_name = problem.requests[index].class_name
+        class_days[(class_name, day)] = class_days.get((class_name, day), 0) | bit
+        request_days.setdefault(index, []).append(day)
+        if period >= late_period:
+            breakdown['late'] += 1
+    
+    breakdown['teacher_gap'] = sum(day_gaps(mask) for mask in teacher_days.values())
+    breakdown['class_gap'] = sum(day_gaps(mask) for mask in class_days.values())
+    breakdown['spread'] = sum(spread_penalty(days) for days in request_days.values())
+    return breakdown
+
+def score_assignment(problem, assignment, weights=QUALITY_WEIGHTS):
+    """
+    计算排课结果的加权总扣分，越低越好
+    """
+    breakdown = score_breakdown(problem, assignment)
+    return sum(weights[key] * value for key, value in breakdown.items())
@@ -0,0 +1,246 @@
+import time
+from database import db_manager
+from models.availability import get_availability
+from utils.tools import time_to_minutes, minutes_to_time, week_start_minutes, DAY_MINUTES
+from .optimizer import WeekSchedule, apply_moves
+
+class RepairPlan:
+    """
+    课表修复方案，确认后调用 apply() 写入数据库
+    
+    moves 为需要调整的课程（CourseMove），unplaced 为无法在原来那一周重新安排的课程
+    [(课程ID, 课程名称, 班级, 原开始分钟, 原因), ...]。
+    """
+    
+    def __init__(self, displaced, moves, unplaced, weeks, elapsed):
+        """
+        初始化修复方案
+        """
+        self.displaced = displaced
+        self.moves = moves
+        self.unplaced = unplaced
+        self.weeks = weeks
+        self.elapsed = elapsed
+    
+    def describe(self):
+        """
+        方案的显示文本，每行一条
+        """
+        lines = [move.describe() for move in self.moves]
+        for course_id, name, class_name, start, reason in self.unplaced:
+            lines.append(f'{name} ({class_name}): {minutes_to_time(start)} 无法调整，{reason}')
+        return lines
+    
+    def apply(self):
+        """
+        写入调整，返回调整的课程数
+        """
+        return apply_moves(self.moves)
+
+def find_displaced(person_type, person_id, start=None, end=None):
+    """
+    获取人员在 [start, end) 内已不在可用时间中的课程ID
+    
+    start 默认为今天零点，end 默认不限。只查询该人员自己的课程（走教师或选课索引），
+    耗时与其课程数有关，与数据库大小无关。
+    """
+    if start is None:
+        start = time_to_minutes(time.strftime('%Y-%m-%d 00:00'))
+    if end is None:
+        end = 2 ** 62
+    if person_type == 'teacher':
+        query = 'SELECT id, start_minute, end_minute FROM courses WHERE teacher_id=? AND start_minute >= ? AND start_minute < ?'
+    else:
+        query = '''SELECT c.id, c.start_minute, c.end_minute FROM course_students cs
+                   JOIN courses c ON c.id = cs.course_id
+                   WHERE cs.student_id=? AND c.start_minute >= ? AND c.start_minute < ?'''
+    with db_manager as db:
+        rows = db.fetch_all(query, (person_id, start, end))
+    
+    availability = get_availability(person_type, person_id)
+    displaced = []
+    for course_id, course_start, course_end in rows:
+        week_start = week_start_minutes(course_start)
+        if not availability.covers(course_start - week_start, course_end - week_start):
+            displaced.append(course_id)
+    return sorted(displaced)
+
+def repair_courses(course_ids, avoid_current=False, grid=None):
+    """
+    在各自原来的那一周内重新安排指定课程，其余课程全部固定，返回 RepairPlan（不写入数据库）
+    
+    只加载这些课程所在的周。被安排的课程按可选节次从少到多依次放入扣分增加最少的节次，
+    不会与教师、班级、学生的其他课程冲突，也符合可用时间。avoid_current 为 True 时
+    不能留在原时间（例如原时间被取消），否则原时间仍可行的课程保持不动。
+    不在排课网格上的课程无法自动调整，列入 unplaced。
+    """
+    started = time.perf_counter()
+    course_ids = sorted(set(course_ids))
+    if not course_ids:
+        return RepairPlan([], [], [], 0, 0.0)
+    rows = []
+    with db_manager as db:
+        for i in range(0, len(course_ids), 900):
+            ids = course_ids[i:i + 900]
+            rows += db.fetch_all(
+                f"SELECT id, name, class_name, start_minute FROM courses WHERE id IN ({', '.join('?' * len(ids))})",
+                ids
+            )
+    weeks = {}
+    for course_id, name, class_name, start in rows:
+        weeks.setdefault(week_start_minutes(start), []).append((course_id, name, class_name, start))
+    
+    moves = []
+    unplaced = []
+    for week_start, week_courses in sorted(weeks.items()):
+        ids = {row[0] for row in week_courses}
+        schedule = WeekSchedule(week_start, grid, movable_ids=ids).load()
+        courses = schedule.movable
+        on_grid = {course.id for course in courses}
+        for course_id, name, class_name, start in week_courses:
+            if course_id not in on_grid:
+                unplaced.append((course_id, name, class_name, start, '不在排课网格上，请手动调整'))
+        
+        original = {course.id: course.slot for course in courses}
+        
+        # 依次安排可选节次最少的课程。尚未安排的课程仍占用原节次，
+        # 无法安排的课程留在原节次，其他课程不会被调到那里
+        remaining = list(courses)
+        while remaining:
+            best = None
+            for course in remaining:
+                schedule.lift(course)
+                options = []
+                for slot in range(len(schedule.grid)):
+                    if avoid_current and slot == original[course.id]:
+                        continue
+                    cost = schedule.placement_cost(course, slot)
+                    if cost is not None:
+                        # 原时间仍可行时优先保持不动
+                        options.append((slot != original[course.id], cost, slot))
+                schedule.place(course, original[course.id])
+                if best is None or len(options) < len(best[1]):
+                    best = (course, options)
+                if not options:
+                    break
+            course, options = best
+            remaining.remove(course)
+            if not options:
+                unplaced.append((course.id, course.name, course.class_name, course.start,
+                                 '本周没有教师、班级和学生都可用的时间'))
+                continue
+            schedule.lift(course)
+            schedule.place(course, min(options)[2])
+        
+        # 无法安排的课程仍在原节次，不会出现在调整列表中
+        moves += schedule.moves_from(schedule.snapshot())
+    return RepairPlan(course_ids, moves, unplaced, len(weeks), time.perf_counter() - started)
+
+def repair_availability(person_type, person_id, start=None, end=None, grid=None):
+    """
+    人员可用时间变化后（先用 set_available_time/clear_available_times 更新），
+    找出不再可行的课程并生成修复方案
+    """
+    return repair_courses(find_displaced(person_type, person_id, start, end), grid=grid)
+
+# 测试函数
+def test_repair_keeps_unplaced():
+    """
+    测试无法安排的课程留在原时间，其他课程不会被调到该时间
+    
+    甲班两节课：语文（教师1 周一全天请假，无处可排）在第一节，数学（教师2 只在第一节有空）在第二节。
+    数学唯一可行的节次被留在原时间的语文占用，也应无法安排，而不是调过去造成班级冲突。
+    """
+    import os
+    import tempfile
+    from database import init_database
+    from models.course import Course
+    from models.teacher import Teacher
+    from models.term import Term
+    from .problem import TimeGrid, DEFAULT_PERIODS
+    
+    week_start = Term('2024-09-02').week_range(0)[0]
+    grid = TimeGrid(days=(0,), periods=DEFAULT_PERIODS[:2])
+    original_path = db_manager.db_path
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'test.db')
+        init_database(db_path)
+        db_manager.switch_database(db_path)
+        
+        chinese_teacher = Teacher(name='教师1', subject_types='语文')
+        chinese_teacher.save()
+        chinese_teacher.set_available_time(2, '08:00', '18:00')
+        math_teacher = Teacher(name='教师2', subject_types='数学')
+        math_teacher.save()
+        math_teacher.set_available_time(1, '08:00', '08:50')
+        
+        chinese = Course(name='语文', teacher_id=chinese_teacher.id, class_name='甲班',
+                         start_time='2024-09-02 08:00', end_time='2024-09-02 08:45')
+        chinese.save()
+        math = Course(name='数学', teacher_id=math_teacher.id, class_name='甲班',
+                      start_time='2024-09-02 08:55', end_time='2024-09-02 09:40')
+        math.save()
+        
+        plan = repair_courses([chinese.id, math.id], grid=grid)
+        plan.apply()
+        unplaced = sorted(row[0] for row in plan.unplaced)
+        conflicts = [course.id for course in Course.get_by_time_range(week_start, week_start + DAY_MINUTES)
+                     if course.check_conflicts()]
+        db_manager.close_all()
+    db_manager.switch_database(original_path)
+    
+    assert not plan.moves, plan.describe()
+    assert unplaced == [chinese.id, math.id], plan.unplaced
+    assert not conflicts, conflicts
+    print("无法安排的课程保持原时间，测试通过")
+
+# 性能测试
+def benchmark_repair(class_sizes=(10, 30), weeks=20, seed=0):
+    """
+    测试教师请假（周三不可用）后的修复耗时：与变化涉及的周数有关，与学校规模无关
+    """
+    import os
+    import tempfile
+    from database import init_database
+    from models.course import Course
+    from models.teacher import Teacher
+    from models.term import Term
+    from utils.tools import WEEK_MINUTES
+    from .engine import create_sample_school, solve, save_solution
+    from .problem import ScheduleProblem
+    
+    term = Term('2024-09-02', weeks)
+    week_starts = [term.week_range(week)[0] for week in range(weeks)]
+    original_path = db_manager.db_path
+    for classes in class_sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, 'bench.db')
+            init_database(db_path)
+            db_manager.switch_database(db_path)
+            requests = create_sample_school(classes, term.start_minute, seed=seed, unavailable_rate=0)
+            solution = solve(ScheduleProblem(requests, term.start_minute, week_starts=week_starts).load(), seed=seed)
+            save_solution(solution)
+            
+            # 语文教师1 周三请假
+            teacher = Teacher.get_by_id(requests[0].teacher_id)
+            teacher.clear_available_times()
+            for day in (1, 2, 4, 5):
+                teacher.set_available_time(day, '08:00', '18:00')
+            
+            for label, span in (('1 周', 1), (f'{weeks} 周', weeks)):
+                start, end = term.week_range(0)[0], term.week_range(span - 1)[1]
+                plan = repair_availability('teacher', teacher.id, start, end)
+                print(f"{classes} 个班 {len(solution.assignment) * weeks} 节课, 请假 {label}: "
+                      f"受影响 {len(plan.displaced)} 节, 调整 {len(plan.moves)} 节, 无法安排 {len(plan.unplaced)} 节, "
+                      f"耗时 {plan.elapsed * 1000:.0f} ms")
+            plan.apply()
+            conflicts = sum(1 for course in Course.get_by_time_range(term.start_minute, term.start_minute + WEEK_MINUTES)
+                            if course.check_conflicts())
+            remaining = find_displaced('teacher', teacher.id, term.start_minute, term.week_range(weeks - 1)[1])
+            print(f"应用后冲突 {conflicts} 节, 仍不可行 {len(remaining)} 节")
+            db_manager.close_all()
+        db_manager.switch_database(original_path)
+
+if __name__ == "__main__":
+    test_repair_keeps_unplaced()
+    benchmark_repair()
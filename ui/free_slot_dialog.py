@@ -0,0 +1,106 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
+                           QPushButton, QListWidget, QListWidgetItem, QMessageBox)
+from PyQt5.QtCore import Qt, QDateTime
+from scheduler.free_slots import find_free_slots
+from utils.tools import time_to_minutes, minutes_weekday
+
+# 星期显示名称，0 为周一
+WEEKDAY_NAMES = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+
+class FreeSlotDialog(QDialog):
+    """
+    课程调课对话框，列出教师和上课学生都有空的时间
+    """
+    
+    def __init__(self, parent=None, course=None, term=None, limit=20):
+        """
+        初始化调课对话框，在课程所在周（不早于当前时间）到学期结束之间查找
+        """
+        super().__init__(parent)
+        self.course = course
+        self.term = term
+        self.limit = limit
+        self.init_ui()
+        self.load_slots()
+    
+    def init_ui(self):
+        """
+        初始化UI界面
+        """
+        self.setWindowTitle('调课')
+        self.resize(420, 500)
+        
+        layout = QVBoxLayout(self)
+        
+        course = self.course
+        layout.addWidget(QLabel(f'{course.name}  {course.get_teacher_name()}  {course.class_name}\n'
+                                f'当前时间: {course.start_time} - {course.end_time[11:16]}'))
+        self.info_label = QLabel()
+        layout.addWidget(self.info_label)
+        
+        # 可选时间列表
+        self.slot_list = QListWidget()
+        self.slot_list.itemDoubleClicked.connect(self.move_course)
+        layout.addWidget(self.slot_list)
+        
+        # 按钮区域
+        button_layout = QHBoxLayout()
+        
+        move_btn = QPushButton('调到所选时间')
+        move_btn.clicked.connect(self.move_course)
+        button_layout.addWidget(move_btn)
+        
+        button_layout.addStretch()
+        
+        close_btn = QPushButton('关闭')
+        close_btn.clicked.connect(self.reject)
+        button_layout.addWidget(close_btn)
+        
+        layout.addLayout(button_layout)
+    
+    def load_slots(self):
+        """
+        查找并显示可选时间
+        """
+        course = self.course
+        student_ids = course.get_students()
+        duration = course.end_minute - course.start_minute
+        week_index = self.term.week_of(course.start_minute) or 0
+        # 不提供已经过去的时间
+        now = time_to_minutes(QDateTime.currentDateTime().toString('yyyy-MM-dd HH:mm'))
+        date_range = (max(self.term.week_range(week_index)[0], now), self.term.week_range(self.term.weeks - 1)[1])
+        slots = find_free_slots(course.teacher_id, student_ids, duration, date_range, self.limit + 1,
+                                class_name=course.class_name, exclude_course_id=course.id)
+        # 不显示课程当前的时间
+        slots = [slot for slot in slots if slot[0] != course.start_time][:self.limit]
+        
+        self.info_label.setText(f'教师和 {len(student_ids)} 名学生都有空的时间（前 {self.limit} 个）:')
+        self.slot_list.clear()
+        for start_time, end_time in slots:
+            weekday = WEEKDAY_NAMES[minutes_weekday(time_to_minutes(start_time))]
+            item = QListWidgetItem(f'{start_time} - {end_time[11:16]}  {weekday}')
+            item.setData(Qt.UserRole, (start_time, end_time))
+            self.slot_list.addItem(item)
+        if not slots:
+            self.info_label.setText('在本学期内没有找到教师和学生都有空的时间')
+    
+    def move_course(self):
+        """
+        将课程调到所选时间
+        """
+        item = self.slot_list.currentItem()
+        if not item:
+            QMessageBox.warning(self, '提示', '请先选择时间')
+            return
+        
+        start_time, end_time = item.data(Qt.UserRole)
+        old_times = (self.course.start_time, self.course.end_time)
+        self.course.start_time = start_time
+        self.course.end_time = end_time
+        try:
+            self.course.save()
+        except Exception as e:
+            self.course.start_time, self.course.end_time = old_times
+            QMessageBox.warning(self, '错误', str(e))
+            return
+        self.accept()
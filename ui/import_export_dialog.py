@@ -1,9 +1,11 @@
+import os
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
                            QPushButton, QComboBox, QFileDialog, QMessageBox,
-                           QTableWidget, QTableWidgetItem, QHeaderView)
+                           QTableWidget, QTableWidgetItem, QHeaderView, QProgressDialog)
 from PyQt5.QtCore import Qt
-from models import Student, Teacher, Course, Textbook
-from utils.tools import read_csv_file, write_csv_file, validate_student_data, validate_teacher_data, validate_course_data
+from utils.exporter import count_export_rows, export_file
+from utils.importer import bulk_import
+from utils.tools import iter_data_chunks, validate_student_data, validate_teacher_data, validate_course_data
 
 class ImportExportDialog(QDialog):
     """
@@ -66,72 +68,105 @@ class ImportExportDialog(QDialog):
             self, 
             f'选择{data_type}数据文件', 
             '', 
-            'CSV文件 (*.csv);;所有文件 (*.*)'
+            '数据文件 (*.csv *.xlsx);;CSV文件 (*.csv);;Excel文件 (*.xlsx);;所有文件 (*.*)'
         )
         
         if not file_path:
             return
         
-        # 读取CSV文件
-        data = read_csv_file(file_path)
-        if not data:
+        # 逐块读取并验证，只保留预览行
+        try:
+            total, preview, message = self.scan_file(data_type, file_path)
+        except Exception as e:
+            QMessageBox.warning(self, '错误', f'读取文件失败: {e}')
+            return
+        
+        if total == 0:
             QMessageBox.warning(self, '错误', '文件为空或格式错误')
             return
         
-        # 验证数据
-        is_valid, message = self.validate_data(data_type, data)
-        if not is_valid:
+        if message:
             QMessageBox.warning(self, '验证失败', message)
             return
         
         # 显示预览
-        self.show_preview(data)
+        self.show_preview(preview)
         
         # 确认导入
         reply = QMessageBox.question(
             self, 
             '确认导入', 
-            f'确定要导入 {len(data)} 条{data_type}数据吗？',
+            f'确定要导入 {total} 条{data_type}数据吗？',
             QMessageBox.Yes | QMessageBox.No
         )
         
         if reply == QMessageBox.Yes:
-            # 执行导入
-            success_count = self.perform_import(data_type, data)
+            # 再次逐块读取文件执行导入
+            rows = (row for chunk in iter_data_chunks(file_path) for row in chunk)
+            success_count = self.perform_import(data_type, rows, total, numbered=True)
             QMessageBox.information(self, '导入完成', f'成功导入 {success_count} 条{data_type}数据')
             self.accept()
     
     def export_data(self):
         """
-        导出数据
+        导出数据，从数据库游标逐行写入文件
         """
         data_type = self.type_combo.currentText()
         
-        # 获取数据
-        data = self.get_export_data(data_type)
-        if not data:
+        # 获取数据量
+        total = count_export_rows(data_type)
+        if not total:
             QMessageBox.information(self, '提示', f'没有可导出的{data_type}数据')
             return
         
         # 选择保存路径
-        file_path, _ = QFileDialog.getSaveFileName(
+        file_path, selected_filter = QFileDialog.getSaveFileName(
             self, 
             f'保存{data_type}数据', 
             f'{data_type}.csv', 
-            'CSV文件 (*.csv);;所有文件 (*.*)'
+            'CSV文件 (*.csv);;Excel文件 (*.xlsx)'
         )
         
         if not file_path:
             return
         
-        # 获取表头
-        headers = self.get_export_headers(data_type)
-        
-        # 写入CSV文件
-        if write_csv_file(file_path, data, headers):
-            QMessageBox.information(self, '导出完成', f'成功导出 {len(data)} 条{data_type}数据')
-        else:
+        # 选择 Excel 格式但文件名未改扩展名时，按所选格式导出
+        if selected_filter.startswith('Excel') and not file_path.lower().endswith('.xlsx'):
+            file_path = os.path.splitext(file_path)[0] + '.xlsx'
+        
+        progress_dialog = QProgressDialog(f'正在导出{data_type}数据...', None, 0, total, self)
+        progress_dialog.setWindowTitle('导出数据')
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+        
+        # 按扩展名写入 CSV 或 Excel 文件
+        try:
+            count = export_file(data_type, file_path, progress=progress_dialog.setValue)
+        except Exception as e:
+            print(f"导出文件失败: {e}")
+            progress_dialog.close()
             QMessageBox.warning(self, '错误', '导出失败')
+            return
+        progress_dialog.close()
+        QMessageBox.information(self, '导出完成', f'成功导出 {count} 条{data_type}数据')
+    
+    def scan_file(self, data_type, file_path):
+        """
+        逐块扫描文件，返回 (总行数, 前10行预览, 验证错误信息)
+        
+        遇到第一个验证错误即停止，验证通过时错误信息为空字符串。
+        """
+        total = 0
+        preview = []
+        for chunk in iter_data_chunks(file_path):
+            items = [item for _, item in chunk]
+            if len(preview) < 10:
+                preview.extend(items[:10 - len(preview)])
+            is_valid, message = self.validate_data(data_type, items)
+            if not is_valid:
+                return total + len(chunk), preview, message
+            total += len(chunk)
+        return total, preview, ''
     
     def validate_data(self, data_type, data):
         """
@@ -147,124 +182,36 @@ class ImportExportDialog(QDialog):
             return True, '验证通过'
         return False, '未知的数据类型'
     
-    def perform_import(self, data_type, data):
-        """
-        执行导入
-        """
-        success_count = 0
-        
-        for item in data:
-            try:
-                if data_type == '学生':
-                    student = Student(
-                        name=item.get('姓名', ''),
-                        contact=item.get('联系方式', ''),
-                        tags=item.get('标签', '')
-                    )
-                    student.save()
-                    success_count += 1
-                
-                elif data_type == '教师':
-                    teacher = Teacher(
-                        name=item.get('姓名', ''),
-                        contact=item.get('联系方式', ''),
-                        subject_types=item.get('可教授课程类型', '')
-                    )
-                    teacher.save()
-                    success_count += 1
-                
-                elif data_type == '课程':
-                    # 需要先找到教师
-                    teacher_name = item.get('教师姓名', '')
-                    teachers = Teacher.search_by_name(teacher_name)
-                    if teachers:
-                        course = Course(
-                            name=item.get('课程名称', ''),
-                            teacher_id=teachers[0].id,
-                            class_name=item.get('班级名称', ''),
-                            course_type=item.get('课程类型', ''),
-                            start_time=item.get('开始时间', ''),
-                            end_time=item.get('结束时间', '')
-                        )
-                        course.save()
-                        success_count += 1
-                
-                elif data_type == '教材':
-                    textbook = Textbook(
-                        name=item.get('教材名称', ''),
-                        price=float(item.get('价格', 0)),
-                        description=item.get('描述', '')
-                    )
-                    textbook.save()
-                    success_count += 1
-            
-            except Exception as e:
-                print(f'导入失败: {e}')
-                continue
-        
+    def perform_import(self, data_type, data, total=None, numbered=False):
+        """
+        执行导入，分块批量写入并显示进度
+        
+        data 可以是列表或逐行产生数据的迭代器，迭代器需要同时给出总行数 total；
+        numbered 为 True 时每行为 (源文件行号, 行字典)，错误信息使用源文件行号。
+        """
+        if total is None:
+            total = len(data)
+        progress_dialog = QProgressDialog(f'正在导入{data_type}数据...', None, 0, total, self)
+        progress_dialog.setWindowTitle('导入数据')
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+        
+        try:
+            success_count, errors = bulk_import(data_type, data, progress=progress_dialog.setValue, numbered=numbered)
+        except Exception as e:
+            progress_dialog.close()
+            QMessageBox.warning(self, '导入失败', str(e))
+            return 0
+        progress_dialog.close()
+        
+        if errors:
+            # 只显示前几条错误，完整列表输出到控制台
+            for error in errors:
+                print(f'导入失败: {error}')
+            QMessageBox.warning(self, '部分数据未导入',
+                                f'{len(errors)} 条数据未导入:\n' + '\n'.join(errors[:10]))
         return success_count
     
-    def get_export_data(self, data_type):
-        """
-        获取导出数据
-        """
-        data = []
-        
-        if data_type == '学生':
-            students = Student.get_all()
-            for student in students:
-                data.append({
-                    '姓名': student.name,
-                    '联系方式': student.contact,
-                    '标签': student.tags
-                })
-        
-        elif data_type == '教师':
-            teachers = Teacher.get_all()
-            for teacher in teachers:
-                data.append({
-                    '姓名': teacher.name,
-                    '联系方式': teacher.contact,
-                    '可教授课程类型': teacher.subject_types
-                })
-        
-        elif data_type == '课程':
-            courses = Course.get_all()
-            for course in courses:
-                data.append({
-                    '课程名称': course.name,
-                    '教师姓名': course.get_teacher_name(),
-                    '班级名称': course.class_name,
-                    '课程类型': course.course_type,
-                    '开始时间': course.start_time,
-                    '结束时间': course.end_time
-                })
-        
-        elif data_type == '教材':
-            textbooks = Textbook.get_all()
-            for textbook in textbooks:
-                data.append({
-                    '教材名称': textbook.name,
-                    '价格': str(textbook.price),
-                    '描述': textbook.description
-                })
-        
-        return data
-    
-    def get_export_headers(self, data_type):
-        """
-        获取导出表头
-        """
-        if data_type == '学生':
-            return ['姓名', '联系方式', '标签']
-        elif data_type == '教师':
-            return ['姓名', '联系方式', '可教授课程类型']
-        elif data_type == '课程':
-            return ['课程名称', '教师姓名', '班级名称', '课程类型', '开始时间', '结束时间']
-        elif data_type == '教材':
-            return ['教材名称', '价格', '描述']
-        return []
-    
     def show_preview(self, data):
         """
         显示数据预览
@@ -3,18 +3,30 @@ from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                            QCalendarWidget, QMenuBar, QAction, QSplitter,
                            QTableWidget, QTableWidgetItem, QHeaderView,
                            QMessageBox, QDialog, QListWidget, QListWidgetItem,
-                           QLineEdit, QInputDialog)
-from PyQt5.QtCore import Qt, QDate, QTime
+                           QLineEdit, QInputDialog, QFileDialog)
+from PyQt5.QtCore import Qt, QDate, QTime, QObject, pyqtSignal
 from PyQt5.QtGui import QFont, QTextCharFormat
 import sys
-from database import init_database, db_manager
-from models import Student, Teacher, Course, Textbook
+from database import init_database, db_manager, export_snapshot, import_snapshot
+from database.backup import backup_manager
+from models import Student, Teacher, Course, Textbook, Term
+from models.search import search_memos
+from utils.tools import time_to_minutes, minutes_to_time, DAY_MINUTES
 from .student_dialog import StudentManagerDialog
 from .teacher_dialog import TeacherManagerDialog
 from .course_dialog import CourseManagerDialog
 from .textbook_dialog import TextbookManagerDialog
 from .import_export_dialog import ImportExportDialog
 from .textbook_stats_dialog import TextbookStatsDialog
+from .free_slot_dialog import FreeSlotDialog
+
+class BackupSignals(QObject):
+    """
+    后台备份线程的信号，回调经由信号转回主线程处理
+    """
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(str)
+    failed = pyqtSignal(str)
 
 class MainWindow(QMainWindow):
     """
@@ -26,8 +38,15 @@ class MainWindow(QMainWindow):
         初始化主窗口
         """
         super().__init__()
-        self.init_ui()
+        # 先确认数据库结构就绪，init_ui 中会立即查询课程和备忘录
         self.init_database()
+        self.init_ui()
+        
+        # 后台备份
+        self.backup_signals = BackupSignals()
+        self.backup_signals.progress.connect(self.on_backup_progress)
+        self.backup_signals.finished.connect(self.on_backup_finished)
+        self.backup_signals.failed.connect(self.on_backup_failed)
     
     def init_ui(self):
         """
@@ -83,9 +102,21 @@ class MainWindow(QMainWindow):
         exit_action = QAction('退出', self)
         exit_action.triggered.connect(self.close)
         
+        # 整库快照
+        export_snapshot_action = QAction('导出数据库快照', self)
+        export_snapshot_action.triggered.connect(self.export_snapshot)
+        import_snapshot_action = QAction('导入数据库快照', self)
+        import_snapshot_action.triggered.connect(self.import_snapshot)
+        backup_action = QAction('备份数据库', self)
+        backup_action.triggered.connect(self.backup_database)
+        
         file_menu.addAction(import_action)
         file_menu.addAction(export_action)
         file_menu.addSeparator()
+        file_menu.addAction(export_snapshot_action)
+        file_menu.addAction(import_snapshot_action)
+        file_menu.addAction(backup_action)
+        file_menu.addSeparator()
         file_menu.addAction(exit_action)
         
         # 管理菜单
@@ -109,6 +140,12 @@ class MainWindow(QMainWindow):
         manage_menu.addAction(course_action)
         manage_menu.addAction(textbook_action)
         
+        # 学期设置
+        term_action = QAction('学期设置', self)
+        term_action.triggered.connect(self.edit_term)
+        manage_menu.addSeparator()
+        manage_menu.addAction(term_action)
+        
         # 统计菜单
         stats_menu = menu_bar.addMenu('统计')
         
@@ -163,6 +200,12 @@ class MainWindow(QMainWindow):
         
         layout.addLayout(toolbar_layout)
         
+        # 搜索框，回车搜索全部日期的备忘录，清空后恢复当天列表
+        self.memo_search = QLineEdit()
+        self.memo_search.setPlaceholderText('搜索备忘录（回车）')
+        self.memo_search.returnPressed.connect(self.search_memo)
+        layout.addWidget(self.memo_search)
+        
         # 备忘录列表
         self.memo_list = QListWidget()
         self.memo_list.itemDoubleClicked.connect(self.edit_memo_item)
@@ -189,9 +232,11 @@ class MainWindow(QMainWindow):
         # 标题栏
         title_layout = QHBoxLayout()
         
-        # 周选择器
+        # 周选择器（按学期日历生成，默认选中本周）
+        self.term = Term.get_current()
+        self.week_cache = {}
         self.week_combo = QComboBox()
-        self.week_combo.addItems(['第1周', '第2周', '第3周', '第4周', '第5周'])
+        self.populate_week_combo()
         self.week_combo.currentIndexChanged.connect(self.refresh_schedule)
         title_layout.addWidget(QLabel('周:'))
         title_layout.addWidget(self.week_combo)
@@ -219,26 +264,12 @@ class MainWindow(QMainWindow):
         
         layout.addLayout(title_layout)
         
-        # 课表区域
+        # 课表区域（时间段行数在刷新时根据课程调整）
         self.schedule_table = QTableWidget()
-        self.schedule_table.setRowCount(12)  # 12个时间段
-        self.schedule_table.setColumnCount(7)  # 7天
-        
-        # 设置表头
-        headers = ['时间', '周一', '周二', '周三', '周四', '周五', '周六', '周日']
-        self.schedule_table.setHorizontalHeaderLabels(headers)
+        self.schedule_table.setColumnCount(8)  # 时间列 + 7天
         
-        # 设置行高和列宽
+        # 设置列宽
         self.schedule_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        for i in range(12):
-            self.schedule_table.setRowHeight(i, 60)
-        
-        # 填充时间行
-        for i in range(12):
-            hour = 8 + i
-            time_str = f'{hour:02d}:00-{hour+1:02d}:00'
-            self.schedule_table.setItem(i, 0, QTableWidgetItem(time_str))
-            self.schedule_table.item(i, 0).setFlags(Qt.ItemIsEnabled)
         
         # 双击事件
         self.schedule_table.cellDoubleClicked.connect(self.on_schedule_double_click)
@@ -257,6 +288,11 @@ class MainWindow(QMainWindow):
         widget = QWidget()
         layout = QVBoxLayout(widget)
         
+        # 日历控件（导航按钮需要连接到日历，先创建）
+        self.calendar = QCalendarWidget()
+        self.calendar.setGridVisible(True)
+        self.calendar.clicked.connect(self.on_calendar_clicked)
+        
         # 标题栏
         title_layout = QHBoxLayout()
         
@@ -275,10 +311,6 @@ class MainWindow(QMainWindow):
         
         layout.addLayout(title_layout)
         
-        # 日历控件
-        self.calendar = QCalendarWidget()
-        self.calendar.setGridVisible(True)
-        self.calendar.clicked.connect(self.on_calendar_clicked)
         layout.addWidget(self.calendar)
         
         # 选中日期信息
@@ -302,21 +334,23 @@ class MainWindow(QMainWindow):
         self.current_date = date_str
         self.load_memo_by_date(date_str)
         
-        # 查找该日期的课程
-        courses = Course.get_all()
-        courses_on_date = []
+        # 课表切换到该日期所在的周
+        day_start = time_to_minutes(f'{date_str} 00:00')
+        week_index = self.term.week_of(day_start)
+        if week_index is not None and week_index != self.week_combo.currentIndex():
+            self.week_combo.setCurrentIndex(week_index)
+        elif self.view_combo.currentIndex() == 1:
+            self.refresh_schedule()
         
-        for course in courses:
-            try:
-                course_date = course.start_time.split()[0]
-                if course_date == date_str:
-                    courses_on_date.append(course)
-            except:
-                pass
+        # 查找该日期开始的课程
+        courses_on_date = [
+            course for course in Course.get_by_time_range(day_start, day_start + DAY_MINUTES)
+            if course.start_minute >= day_start
+        ]
         
         if courses_on_date:
             # 显示该日期的课程
-            course_list = '\n'.join([f'{c.name} ({c.start_time.split()[1][:5]}-{c.end_time.split()[1][:5]})' for c in courses_on_date])
+            course_list = '\n'.join([f'{c.name} ({c.start_time[11:16]}-{c.end_time[11:16]})' for c in courses_on_date])
             reply = QMessageBox.question(
                 self, 
                 f'{date_str} 的课程', 
@@ -334,8 +368,8 @@ class MainWindow(QMainWindow):
         """
         标记有课程的日期
         """
-        # 获取所有课程
-        courses = Course.get_all()
+        # 获取有课程的日期
+        course_dates = Course.get_course_dates()
         
         # 使用 QTextCharFormat 来标记日期
         from PyQt5.QtGui import QColor, QBrush
@@ -346,24 +380,23 @@ class MainWindow(QMainWindow):
         format.setForeground(QBrush(QColor(255, 255, 255)))
         
         # 标记有课程的日期
-        for course in courses:
-            try:
-                date = QDate.fromString(course.start_time.split()[0], 'yyyy-MM-dd')
-                self.calendar.setDateTextFormat(date, format)
-            except:
-                pass
+        for date_str in course_dates:
+            date = QDate.fromString(date_str, 'yyyy-MM-dd')
+            self.calendar.setDateTextFormat(date, format)
     
     def init_database(self):
         """
-        初始化数据库
+        初始化数据库，结构已是最新时立即返回
         """
-        init_database()
-        print('数据库初始化完成')
+        init_database(db_manager.db_path)
     
     def closeEvent(self, event):
         """
         关闭窗口事件
         """
+        # 等待进行中的备份完成
+        backup_manager.wait()
+        db_manager.close_all()
         event.accept()
     
     def load_memo_by_date(self, date):
@@ -396,10 +429,38 @@ class MainWindow(QMainWindow):
             self.load_memo_by_date(self.current_date)
             self.memo_status.setText(f'最后保存: {QDate.currentDate().toString()} {QTime.currentTime().toString()}')
     
+    def search_memo(self):
+        """
+        搜索备忘录，结果显示日期，双击跳转到该日期
+        """
+        keyword = self.memo_search.text().strip()
+        if not keyword:
+            self.load_memo_by_date(self.current_date)
+            return
+        
+        self.memo_list.clear()
+        for memo_id, date, content, font_size in search_memos(keyword):
+            item = QListWidgetItem(f'[{date}] {content}')
+            item.setData(Qt.UserRole, memo_id)
+            item.setData(Qt.UserRole + 1, font_size)
+            item.setData(Qt.UserRole + 2, date)
+            self.memo_list.addItem(item)
+            self.apply_font_size_to_item(item, font_size)
+    
     def edit_memo_item(self, item):
         """
         编辑备忘录项
         """
+        # 搜索结果：跳转到备忘录所在日期
+        date = item.data(Qt.UserRole + 2)
+        if date:
+            self.memo_search.clear()
+            self.calendar.setSelectedDate(QDate.fromString(date, 'yyyy-MM-dd'))
+            self.date_info.setText(f'选中日期: {date}')
+            self.current_date = date
+            self.load_memo_by_date(date)
+            return
+        
         old_content = item.text()
         new_content, ok = QInputDialog.getText(self, '编辑备忘录', '请修改备忘录内容:', text=old_content)
         if ok and new_content.strip() and new_content != old_content:
@@ -463,40 +524,120 @@ class MainWindow(QMainWindow):
         font.setPointSize(font_size)
         item.setFont(font)
     
+    def populate_week_combo(self):
+        """
+        按学期日历填充周选择器，并选中当前日期所在的周
+        """
+        self.week_combo.blockSignals(True)
+        self.week_combo.clear()
+        self.week_combo.addItems([self.term.week_label(i) for i in range(self.term.weeks)])
+        today = time_to_minutes(QDate.currentDate().toString('yyyy-MM-dd') + ' 00:00')
+        week_index = self.term.week_of(today)
+        self.week_combo.setCurrentIndex(week_index if week_index is not None else 0)
+        self.week_combo.blockSignals(False)
+    
+    def load_week_courses(self, week_index):
+        """
+        获取指定周的课程，已加载过的周直接复用，否则执行一次范围查询
+        """
+        if week_index not in self.week_cache:
+            start, end = self.term.week_range(week_index)
+            self.week_cache[week_index] = Course.get_by_time_range(start, end)
+        return self.week_cache[week_index]
+    
+    def reload_schedule(self):
+        """
+        课程、教师或学生数据变化后丢弃已加载的周并重新显示
+        """
+        # 未设置学期时周范围随课程的时间变化
+        term = Term.get_current()
+        if (term.start_minute, term.weeks) != (self.term.start_minute, self.term.weeks):
+            self.term = term
+            self.populate_week_combo()
+        self.week_cache = {}
+        self.refresh_schedule()
+        self.mark_calendar_dates()
+    
+    def set_schedule_hours(self, first_hour, last_hour):
+        """
+        设置课表显示的时间段并清空课程单元格
+        """
+        self.schedule_table.clearContents()
+        self.schedule_table.setRowCount(last_hour - first_hour)
+        for i, hour in enumerate(range(first_hour, last_hour)):
+            self.schedule_table.setRowHeight(i, 60)
+            item = QTableWidgetItem(f'{hour:02d}:00-{hour+1:02d}:00')
+            item.setFlags(Qt.ItemIsEnabled)
+            self.schedule_table.setItem(i, 0, item)
+        self.schedule_first_hour = first_hour
+    
     def refresh_schedule(self):
         """
-        刷新课表显示
+        刷新课表显示，只加载当前选中的周
         """
-        # 清空课表
-        for row in range(self.schedule_table.rowCount()):
-            for col in range(1, self.schedule_table.columnCount()):
-                item = self.schedule_table.item(row, col)
-                if item:
-                    self.schedule_table.setItem(row, col, QTableWidgetItem())
+        week_index = max(self.week_combo.currentIndex(), 0)
+        week_start, week_end = self.term.week_range(week_index)
+        courses = [c for c in self.load_week_courses(week_index) if c.start_minute >= week_start]
         
-        # 获取所有课程
-        courses = Course.get_all()
+        # 表头显示日期
+        headers = ['时间']
+        for day, name in enumerate(['周一', '周二', '周三', '周四', '周五', '周六', '周日']):
+            headers.append(f'{name}\n{minutes_to_time(week_start + day * DAY_MINUTES)[5:10]}')
+        self.schedule_table.setHorizontalHeaderLabels(headers)
         
-        # 显示课程
+        # 默认显示 8:00-20:00，本周有更早或更晚的课程时扩展
+        first_hour, last_hour = 8, 20
         for course in courses:
-            try:
-                start_dt = QDate.fromString(course.start_time.split()[0], 'yyyy-MM-dd')
-                start_time = course.start_time.split()[1][:5]
-                end_time = course.end_time.split()[1][:5]
-                
-                # 计算星期几
-                day_of_week = start_dt.dayOfWeek() - 1  # Qt的dayOfWeek()返回1-7，我们需要0-6
-                
-                # 计算时间段
-                hour = int(start_time.split(':')[0])
-                row = hour - 8  # 从8点开始
-                
-                if 0 <= row < 12 and 0 <= day_of_week < 7:
-                    # 显示课程信息
-                    item = QTableWidgetItem(f'{course.name}\n{course.get_teacher_name()}\n{start_time}-{end_time}')
-                    self.schedule_table.setItem(row, day_of_week + 1, item)
-            except:
-                pass
+            start_hour = course.start_minute % DAY_MINUTES // 60
+            first_hour = min(first_hour, start_hour)
+            last_hour = max(last_hour, start_hour + 1)
+        self.set_schedule_hours(first_hour, last_hour)
+        
+        # 同一单元格的课程合并显示
+        cells = {}
+        for course in courses:
+            offset = course.start_minute - week_start
+            day_of_week = offset // DAY_MINUTES
+            row = offset % DAY_MINUTES // 60 - first_hour
+            cells.setdefault((row, day_of_week + 1), []).append(course)
+        
+        for (row, col), cell_courses in cells.items():
+            text = '\n\n'.join(
+                f'{c.name}\n{c.get_teacher_name()}\n{c.start_time[11:16]}-{c.end_time[11:16]}'
+                for c in cell_courses
+            )
+            item = QTableWidgetItem(text)
+            item.setData(Qt.UserRole, [c.id for c in cell_courses])
+            self.schedule_table.setItem(row, col, item)
+        
+        # 日视图只显示当前日期，不在本周时显示周一
+        day_view = self.view_combo.currentIndex() == 1
+        current_day = (time_to_minutes(f'{self.current_date} 00:00') - week_start) // DAY_MINUTES
+        if not 0 <= current_day < 7:
+            current_day = 0
+        for day in range(7):
+            self.schedule_table.setColumnHidden(day + 1, day_view and day != current_day)
+    
+    def edit_term(self):
+        """
+        设置学期开始日期和周数
+        """
+        start_date, ok = QInputDialog.getText(self, '学期设置', '学期开始日期 (yyyy-MM-dd):',
+                                              text=self.term.start_date)
+        if not ok:
+            return
+        if time_to_minutes(f'{start_date.strip()} 00:00') is None:
+            QMessageBox.warning(self, '提示', '日期格式不正确')
+            return
+        
+        weeks, ok = QInputDialog.getInt(self, '学期设置', '学期周数:', self.term.weeks, 1, 60)
+        if not ok:
+            return
+        
+        self.term = Term(start_date=start_date.strip(), weeks=weeks)
+        self.term.save()
+        self.populate_week_combo()
+        self.reload_schedule()
     
     def on_schedule_double_click(self, row, col):
         """
@@ -507,8 +648,21 @@ class MainWindow(QMainWindow):
         
         item = self.schedule_table.item(row, col)
         if item and item.text():
-            # 双击了课程，打开编辑对话框
-            QMessageBox.information(self, '提示', '双击课程编辑功能待实现')
+            # 双击了课程，查找教师和学生共同的空闲时间进行调课
+            courses = [Course.get_by_id(course_id) for course_id in item.data(Qt.UserRole) or []]
+            courses = [course for course in courses if course]
+            if not courses:
+                return
+            course = courses[0]
+            if len(courses) > 1:
+                labels = [f'{c.name} {c.start_time[11:16]}-{c.end_time[11:16]}' for c in courses]
+                label, ok = QInputDialog.getItem(self, '调课', '选择课程:', labels, 0, False)
+                if not ok:
+                    return
+                course = courses[labels.index(label)]
+            dialog = FreeSlotDialog(self, course, self.term)
+            if dialog.exec_():
+                self.reload_schedule()
         else:
             # 双击了空白区域，打开添加课程对话框
             self.open_course_manager()
@@ -519,6 +673,8 @@ class MainWindow(QMainWindow):
         """
         dialog = StudentManagerDialog(self)
         dialog.exec_()
+        # 学生的删除和选课变化会影响课表
+        self.reload_schedule()
     
     def open_teacher_manager(self):
         """
@@ -526,6 +682,8 @@ class MainWindow(QMainWindow):
         """
         dialog = TeacherManagerDialog(self)
         dialog.exec_()
+        # 课表中显示教师姓名，教师改名或删除后需要重新加载
+        self.reload_schedule()
     
     def open_course_manager(self):
         """
@@ -533,7 +691,7 @@ class MainWindow(QMainWindow):
         """
         dialog = CourseManagerDialog(self)
         dialog.exec_()
-        self.refresh_schedule()
+        self.reload_schedule()
     
     def open_textbook_manager(self):
         """
@@ -555,6 +713,7 @@ class MainWindow(QMainWindow):
         """
         dialog = ImportExportDialog(self)
         dialog.exec_()
+        self.reload_schedule()
     
     def export_data(self):
         """
@@ -563,6 +722,86 @@ class MainWindow(QMainWindow):
         dialog = ImportExportDialog(self)
         dialog.exec_()
     
+    def export_snapshot(self):
+        """
+        导出整个数据库为快照文件
+        """
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, '导出数据库快照', 'schedule.ndjson.gz',
+            '压缩快照 (*.ndjson.gz);;快照 (*.ndjson)'
+        )
+        if not file_path:
+            return
+        
+        try:
+            counts = export_snapshot(file_path)
+        except Exception as e:
+            QMessageBox.warning(self, '错误', f'导出失败: {e}')
+            return
+        QMessageBox.information(self, '导出完成', f'已导出 {sum(counts.values())} 条记录')
+    
+    def import_snapshot(self):
+        """
+        将快照文件合并导入当前数据库
+        """
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, '导入数据库快照', '',
+            '快照文件 (*.ndjson.gz *.ndjson);;所有文件 (*.*)'
+        )
+        if not file_path:
+            return
+        
+        reply = QMessageBox.question(self, '确认导入',
+                                     '快照中的数据将追加到当前数据库，确定要导入吗？',
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        
+        try:
+            counts = import_snapshot(file_path)
+        except Exception as e:
+            QMessageBox.warning(self, '错误', f'导入失败: {e}')
+            return
+        
+        # 快照可能带来学期设置和备忘录
+        self.reload_schedule()
+        self.load_memo_by_date(self.current_date)
+        QMessageBox.information(self, '导入完成', f'已导入 {sum(counts.values())} 条记录')
+    
+    def backup_database(self):
+        """
+        在后台线程中备份数据库，界面保持可用
+        """
+        started = backup_manager.start_backup(
+            progress=self.backup_signals.progress.emit,
+            finished=self.backup_signals.finished.emit,
+            failed=self.backup_signals.failed.emit
+        )
+        if not started:
+            QMessageBox.information(self, '提示', '备份正在进行中')
+            return
+        self.statusBar().showMessage('正在备份数据库...')
+    
+    def on_backup_progress(self, copied, total):
+        """
+        显示备份进度
+        """
+        if total:
+            self.statusBar().showMessage(f'正在备份数据库... {copied * 100 // total}%')
+    
+    def on_backup_finished(self, path):
+        """
+        备份完成
+        """
+        self.statusBar().showMessage(f'备份完成: {path}', 10000)
+    
+    def on_backup_failed(self, error):
+        """
+        备份失败
+        """
+        self.statusBar().clearMessage()
+        QMessageBox.warning(self, '备份失败', error)
+    
     def show_about(self):
         """
         显示关于对话框
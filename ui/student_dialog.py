@@ -107,7 +107,9 @@ class StudentManagerDialog(QDialog):
         """
         self.student_table.setRowCount(len(students))
         for row, student in enumerate(students):
-            self.student_table.setItem(row, 0, QTableWidgetItem(student.name))
+            name_item = QTableWidgetItem(student.name)
+            name_item.setData(Qt.UserRole, student.id)
+            self.student_table.setItem(row, 0, name_item)
             self.student_table.setItem(row, 1, QTableWidgetItem(student.contact))
             self.student_table.setItem(row, 2, QTableWidgetItem(student.tags))
     
@@ -129,11 +131,10 @@ class StudentManagerDialog(QDialog):
             return
         
         row = selected[0].row()
-        student_name = self.student_table.item(row, 0).text()
-        students = Student.search_by_name(student_name)
+        student = Student.get_by_id(self.student_table.item(row, 0).data(Qt.UserRole))
         
-        if students:
-            dialog = StudentEditDialog(self, students[0])
+        if student:
+            dialog = StudentEditDialog(self, student)
             if dialog.exec_() == QDialog.Accepted:
                 self.load_students()
     
@@ -154,9 +155,9 @@ class StudentManagerDialog(QDialog):
                                     QMessageBox.Yes | QMessageBox.No)
         
         if reply == QMessageBox.Yes:
-            students = Student.search_by_name(student_name)
-            if students:
-                students[0].delete()
+            student = Student.get_by_id(self.student_table.item(row, 0).data(Qt.UserRole))
+            if student:
+                student.delete()
                 self.load_students()
 
 class StudentEditDialog(QDialog):
@@ -225,11 +226,14 @@ class StudentEditDialog(QDialog):
             return
         
         if self.student:
-            # 更新现有学生
-            self.student.name = name
-            self.student.contact = self.contact_input.text().strip()
-            self.student.tags = self.tags_input.text().strip()
-            self.student.save()
+            # 更新现有学生：修改副本，保存成功后才会写回缓存中共享的对象
+            student = Student(
+                id=self.student.id,
+                name=name,
+                contact=self.contact_input.text().strip(),
+                tags=self.tags_input.text().strip()
+            )
+            student.save()
         else:
             # 创建新学生
             student = Student(
@@ -107,7 +107,9 @@ class TeacherManagerDialog(QDialog):
         """
         self.teacher_table.setRowCount(len(teachers))
         for row, teacher in enumerate(teachers):
-            self.teacher_table.setItem(row, 0, QTableWidgetItem(teacher.name))
+            name_item = QTableWidgetItem(teacher.name)
+            name_item.setData(Qt.UserRole, teacher.id)
+            self.teacher_table.setItem(row, 0, name_item)
             self.teacher_table.setItem(row, 1, QTableWidgetItem(teacher.contact))
             self.teacher_table.setItem(row, 2, QTableWidgetItem(teacher.subject_types))
     
@@ -129,11 +131,10 @@ class TeacherManagerDialog(QDialog):
             return
         
         row = selected[0].row()
-        teacher_name = self.teacher_table.item(row, 0).text()
-        teachers = Teacher.search_by_name(teacher_name)
+        teacher = Teacher.get_by_id(self.teacher_table.item(row, 0).data(Qt.UserRole))
         
-        if teachers:
-            dialog = TeacherEditDialog(self, teachers[0])
+        if teacher:
+            dialog = TeacherEditDialog(self, teacher)
             if dialog.exec_() == QDialog.Accepted:
                 self.load_teachers()
     
@@ -154,9 +155,9 @@ class TeacherManagerDialog(QDialog):
                                     QMessageBox.Yes | QMessageBox.No)
         
         if reply == QMessageBox.Yes:
-            teachers = Teacher.search_by_name(teacher_name)
-            if teachers:
-                teachers[0].delete()
+            teacher = Teacher.get_by_id(self.teacher_table.item(row, 0).data(Qt.UserRole))
+            if teacher:
+                teacher.delete()
                 self.load_teachers()
 
 class TeacherEditDialog(QDialog):
@@ -225,11 +226,14 @@ class TeacherEditDialog(QDialog):
             return
         
         if self.teacher:
-            # 更新现有教师
-            self.teacher.name = name
-            self.teacher.contact = self.contact_input.text().strip()
-            self.teacher.subject_types = self.subjects_input.text().strip()
-            self.teacher.save()
+            # 更新现有教师：修改副本，保存成功后才会写回缓存中共享的对象
+            teacher = Teacher(
+                id=self.teacher.id,
+                name=name,
+                contact=self.contact_input.text().strip(),
+                subject_types=self.subjects_input.text().strip()
+            )
+            teacher.save()
         else:
             # 创建新教师
             teacher = Teacher(
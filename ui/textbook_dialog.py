@@ -102,7 +102,9 @@ class TextbookManagerDialog(QDialog):
         """
         self.textbook_table.setRowCount(len(textbooks))
         for row, textbook in enumerate(textbooks):
-            self.textbook_table.setItem(row, 0, QTableWidgetItem(textbook.name))
+            name_item = QTableWidgetItem(textbook.name)
+            name_item.setData(Qt.UserRole, textbook.id)
+            self.textbook_table.setItem(row, 0, name_item)
             self.textbook_table.setItem(row, 1, QTableWidgetItem(str(textbook.price)))
             self.textbook_table.setItem(row, 2, QTableWidgetItem(textbook.description))
     
@@ -124,11 +126,10 @@ class TextbookManagerDialog(QDialog):
             return
         
         row = selected[0].row()
-        textbook_name = self.textbook_table.item(row, 0).text()
-        textbooks = Textbook.search_by_name(textbook_name)
+        textbook = Textbook.get_by_id(self.textbook_table.item(row, 0).data(Qt.UserRole))
         
-        if textbooks:
-            dialog = TextbookEditDialog(self, textbooks[0])
+        if textbook:
+            dialog = TextbookEditDialog(self, textbook)
             if dialog.exec_() == QDialog.Accepted:
                 self.load_textbooks()
     
@@ -149,9 +150,9 @@ class TextbookManagerDialog(QDialog):
                                     QMessageBox.Yes | QMessageBox.No)
         
         if reply == QMessageBox.Yes:
-            textbooks = Textbook.search_by_name(textbook_name)
-            if textbooks:
-                textbooks[0].delete()
+            textbook = Textbook.get_by_id(self.textbook_table.item(row, 0).data(Qt.UserRole))
+            if textbook:
+                textbook.delete()
                 self.load_textbooks()
 
 class TextbookEditDialog(QDialog):
@@ -227,11 +228,14 @@ class TextbookEditDialog(QDialog):
             return
         
         if self.textbook:
-            # 更新现有教材
-            self.textbook.name = name
-            self.textbook.price = price
-            self.textbook.description = self.description_input.text().strip()
-            self.textbook.save()
+            # 更新现有教材：修改副本，保存成功后才会写回缓存中共享的对象
+            textbook = Textbook(
+                id=self.textbook.id,
+                name=name,
+                price=price,
+                description=self.description_input.text().strip()
+            )
+            textbook.save()
         else:
             # 创建新教材
             textbook = Textbook(
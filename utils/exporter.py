@@ -0,0 +1,94 @@
+import csv
+from database import db_manager
+
+# 每种数据类型的导出表头和查询，列顺序与表头一致
+EXPORT_SPECS = {
+    '学生': (['姓名', '联系方式', '标签'],
+             'SELECT name, contact, tags FROM students ORDER BY name'),
+    '教师': (['姓名', '联系方式', '可教授课程类型'],
+             'SELECT name, contact, subject_types FROM teachers ORDER BY name'),
+    '课程': (['课程名称', '教师姓名', '班级名称', '课程类型', '开始时间', '结束时间'],
+             '''SELECT c.name, t.name, c.class_name, c.course_type, c.start_time, c.end_time
+                FROM courses c LEFT JOIN teachers t ON t.id = c.teacher_id
+                ORDER BY c.start_minute'''),
+    '教材': (['教材名称', '价格', '描述'],
+             'SELECT name, price, description FROM textbooks ORDER BY name'),
+}
+
+# 导出进度回调的间隔（行数）
+PROGRESS_INTERVAL = 5000
+
+def get_export_headers(data_type):
+    """
+    获取导出表头
+    """
+    if data_type in EXPORT_SPECS:
+        return EXPORT_SPECS[data_type][0]
+    return []
+
+def count_export_rows(data_type):
+    """
+    获取待导出的行数
+    """
+    table = {'学生': 'students', '教师': 'teachers', '课程': 'courses', '教材': 'textbooks'}[data_type]
+    with db_manager as db:
+        return db.fetch_one(f'SELECT COUNT(*) FROM {table}')[0]
+
+def iter_export_rows(data_type):
+    """
+    逐行返回导出数据（元组），列顺序与表头一致
+    """
+    return db_manager.iter_query(EXPORT_SPECS[data_type][1])
+
+def export_csv(data_type, file_path, progress=None):
+    """
+    将数据流式写入CSV文件，返回导出行数
+    
+    游标结果逐行写入，内存占用与数据量无关；每写入 PROGRESS_INTERVAL 行
+    调用一次 progress(已导出行数)。
+    """
+    count = 0
+    with open(file_path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(get_export_headers(data_type))
+        for row in iter_export_rows(data_type):
+            writer.writerow(row)
+            count += 1
+            if progress and count % PROGRESS_INTERVAL == 0:
+                progress(count)
+    if progress:
+        progress(count)
+    return count
+
+def export_xlsx(data_type, file_path, progress=None):
+    """
+    将数据流式写入Excel文件，返回导出行数
+    
+    使用 openpyxl 只写模式，行写入后不再保留在内存中。
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise Exception('导出Excel文件需要安装 openpyxl')
+    
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(data_type)
+    sheet.append(get_export_headers(data_type))
+    count = 0
+    for row in iter_export_rows(data_type):
+        sheet.append(row)
+        count += 1
+        if progress and count % PROGRESS_INTERVAL == 0:
+            progress(count)
+    workbook.save(file_path)
+    if progress:
+        progress(count)
+    return count
+
+def export_file(data_type, file_path, progress=None):
+    """
+    按扩展名导出为 CSV 或 Excel 文件，返回导出行数
+    """
+    if file_path.lower().endswith('.xlsx'):
+        return export_xlsx(data_type, file_path, progress)
+    return export_csv(data_type, file_path, progress)
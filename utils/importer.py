@@ -0,0 +1,226 @@
+from database import db_manager
+from database.migrations import LIST_TABLES, sync_list_table
+from models.cache import clear_entity_caches
+from models.conflict_index import conflict_index
+from models.search import executemany_indexed
+from utils.tools import time_to_minutes, minutes_to_time
+
+# 每个事务写入的行数
+CHUNK_SIZE = 5000
+
+def _parse_price(value):
+    """
+    解析价格，空值视为 0
+    """
+    try:
+        return float(value or 0)
+    except ValueError:
+        raise Exception(f'价格格式错误: {value}')
+
+# 简单数据类型的导入配置：(表名, 列名, CSV 字段, 字段转换函数)
+IMPORT_SPECS = {
+    '学生': ('students', ['name', 'contact', 'tags'], ['姓名', '联系方式', '标签'], None),
+    '教师': ('teachers', ['name', 'contact', 'subject_types'], ['姓名', '联系方式', '可教授课程类型'], None),
+    '教材': ('textbooks', ['name', 'price', 'description'], ['教材名称', '价格', '描述'],
+             {'价格': _parse_price}),
+}
+
+COURSE_COLUMNS = ['name', 'teacher_id', 'class_name', 'course_type', 'start_time', 'end_time',
+                  'start_minute', 'end_minute']
+
+def load_teacher_ids():
+    """
+    一次读取全部教师，返回 {姓名: 教师ID}，重名时取ID最小的教师
+    """
+    teacher_ids = {}
+    with db_manager as db:
+        for teacher_id, name in db.fetch_all('SELECT id, name FROM teachers ORDER BY id'):
+            teacher_ids.setdefault(name, teacher_id)
+    return teacher_ids
+
+def _convert_simple_row(item, fields, converters):
+    """
+    将 CSV 行转换为插入参数
+    """
+    values = []
+    for field in fields:
+        value = (item.get(field) or '').strip()
+        if converters and field in converters:
+            value = converters[field](value)
+        values.append(value)
+    if not values[0]:
+        raise Exception(f'缺少必填字段: {fields[0]}')
+    return tuple(values)
+
+def _convert_course_row(item, teacher_ids, pending):
+    """
+    将课程 CSV 行转换为插入参数，并在内存中检查冲突
+    
+    pending 为本批次已接受的课程数，用作临时课程ID（负数）登记到冲突索引，
+    使同一文件内互相冲突的课程也能被发现。
+    """
+    name = (item.get('课程名称') or '').strip()
+    teacher_name = (item.get('教师姓名') or '').strip()
+    class_name = (item.get('班级名称') or '').strip()
+    start_time = (item.get('开始时间') or '').strip()
+    end_time = (item.get('结束时间') or '').strip()
+    
+    teacher_id = teacher_ids.get(teacher_name)
+    if teacher_id is None:
+        raise Exception(f'教师不存在: {teacher_name}')
+    start = time_to_minutes(start_time)
+    end = time_to_minutes(end_time)
+    if start is None or end is None:
+        raise Exception(f'时间格式错误: {start_time} ~ {end_time}')
+    
+    if conflict_index.has_overlap('teacher', teacher_id, start, end):
+        raise Exception('教师时间冲突')
+    if class_name and conflict_index.has_overlap('class', class_name, start, end):
+        raise Exception('班级时间冲突')
+    conflict_index.add_course(-(pending + 1), start, end, teacher_id, class_name)
+    
+    # 时间统一为补零格式，与 Course.save 一致，之后的更新触发器才能正确换算分钟列
+    return (name, teacher_id, class_name, (item.get('课程类型') or '').strip(),
+            minutes_to_time(start), minutes_to_time(end), start, end)
+
+def bulk_import(data_type, rows, progress=None, chunk_size=CHUNK_SIZE, numbered=False):
+    """
+    批量导入数据，返回 (成功条数, 错误信息列表)
+    
+    rows 为 CSV 行（字典）的可迭代对象；numbered 为 True 时为 (源文件行号, 行字典)，
+    如 iter_data_chunks 的各块，错误信息使用该行号，否则从第2行起依次编号。
+    有效行按 chunk_size 分块，每块在一个事务中用 executemany 写入，写入后调用
+    progress(已处理行数)。无效或冲突的行被跳过并记录在错误信息中，不影响其他行。
+    """
+    if data_type == '课程':
+        table, columns = 'courses', COURSE_COLUMNS
+        teacher_ids = load_teacher_ids()
+        conflict_index.ensure_loaded()
+    elif data_type in IMPORT_SPECS:
+        table, columns, fields, converters = IMPORT_SPECS[data_type]
+    else:
+        raise Exception(f'未知的数据类型: {data_type}')
+    
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    imported = 0
+    processed = 0
+    errors = []
+    chunk = []
+    
+    def flush():
+        nonlocal imported
+        if chunk:
+            with db_manager as db:
+                if table in LIST_TABLES:
+                    last_id = db.fetch_one(f'SELECT IFNULL(MAX(id), 0) FROM {table}')[0]
+                    executemany_indexed(db, table, query, chunk)
+                    sync_list_table(db.conn, table, last_id)
+                else:
+                    executemany_indexed(db, table, query, chunk)
+            imported += len(chunk)
+            chunk.clear()
+        if progress:
+            progress(processed)
+    
+    if not numbered:
+        # 行号从 2 开始，对应 CSV 文件中表头之后的行
+        rows = enumerate(rows, start=2)
+    
+    try:
+        for line, item in rows:
+            processed += 1
+            try:
+                if data_type == '课程':
+                    chunk.append(_convert_course_row(item, teacher_ids, imported + len(chunk)))
+                else:
+                    chunk.append(_convert_simple_row(item, fields, converters))
+            except Exception as e:
+                errors.append(f'第{line}行: {e}')
+            if len(chunk) >= chunk_size:
+                flush()
+        flush()
+    finally:
+        # 绕过了模型的 save，缓存和冲突索引（含临时ID）需要整体失效
+        clear_entity_caches()
+        conflict_index.invalidate()
+    
+    return imported, errors
+
+# 测试函数
+def test_import_line_numbers():
+    """
+    测试含空行的 CSV 和 Excel 文件导入时，错误信息中的行号与文件中的行号一致
+    """
+    import os
+    import tempfile
+    from openpyxl import Workbook
+    from database import init_database
+    from utils.tools import iter_data_chunks
+    
+    original_path = db_manager.db_path
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'test.db')
+        init_database(db_path)
+        db_manager.switch_database(db_path)
+        
+        # 第 3、4 行为空行，第 6 行缺少姓名
+        csv_path = os.path.join(tmp_dir, 'students.csv')
+        with open(csv_path, 'w', encoding='utf-8-sig', newline='') as f:
+            f.write('姓名,联系方式,标签\n张三,1,高一\n\n\n李四,2,高一\n,3,高一\n')
+        xlsx_path = os.path.join(tmp_dir, 'students.xlsx')
+        workbook = Workbook()
+        sheet = workbook.active
+        for row in (['姓名', '联系方式', '标签'], ['张三', '1', '高一'], [None, None, None], [None, None, None],
+                    ['李四', '2', '高一'], [None, '3', '高一']):
+            sheet.append(row)
+        workbook.save(xlsx_path)
+        
+        results = {}
+        for path in (csv_path, xlsx_path):
+            rows = (row for chunk in iter_data_chunks(path) for row in chunk)
+            results[os.path.basename(path)] = bulk_import('学生', rows, numbered=True)
+        db_manager.close_all()
+    db_manager.switch_database(original_path)
+    
+    for name, (imported, errors) in results.items():
+        assert imported == 2 and errors == ['第6行: 缺少必填字段: 姓名'], (name, imported, errors)
+    print("导入行号测试通过")
+
+# 性能测试
+def benchmark_bulk_import(rows=100000, sample=2000):
+    """
+    对比逐行 save 与批量导入学生数据的耗时
+    
+    逐行导入只执行 sample 行，再按比例估算 rows 行的耗时。
+    """
+    import os
+    import tempfile
+    import time
+    from database import init_database
+    from models import Student
+    
+    data = [{'姓名': f'学生{i}', '联系方式': f'138{i:08d}', '标签': '高一'} for i in range(rows)]
+    original_path = db_manager.db_path
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        init_database(db_path)
+        db_manager.switch_database(db_path)
+        
+        start = time.perf_counter()
+        for item in data[:sample]:
+            Student(name=item['姓名'], contact=item['联系方式'], tags=item['标签']).save()
+        row_time = (time.perf_counter() - start) / sample * rows
+        
+        start = time.perf_counter()
+        imported, errors = bulk_import('学生', data)
+        bulk_time = time.perf_counter() - start
+        db_manager.close_all()
+    
+    db_manager.switch_database(original_path)
+    print(f"{rows} 条学生数据: 逐行 save 约 {row_time:.1f} s（按 {sample} 行估算）, "
+          f"批量导入 {bulk_time:.2f} s, 成功 {imported} 条, 错误 {len(errors)} 条")
+    return row_time, bulk_time
+
+if __name__ == "__main__":
+    test_import_line_numbers()
+    benchmark_bulk_import()
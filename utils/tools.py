@@ -1,6 +1,14 @@
 import csv
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+# 整数时间的起点，时间统一换算为自该时刻起的分钟数
+EPOCH = datetime(1970, 1, 1)
+DAY_MINUTES = 24 * 60
+WEEK_MINUTES = 7 * DAY_MINUTES
+# 1970-01-01 是星期四，加上该偏移后按周取整即得到周一零点
+WEEK_OFFSET_MINUTES = 3 * DAY_MINUTES
 
 def read_csv_file(file_path):
     """
@@ -16,6 +24,74 @@ def read_csv_file(file_path):
         print(f"读取CSV文件失败: {e}")
     return data
 
+def iter_csv_chunks(file_path, chunk_size=5000):
+    """
+    逐块读取CSV文件，每次返回最多 chunk_size 行 [(行号, 行字典), ...]
+    
+    行号为该行在文件中的行号（表头为第1行，跳过的空行也计入；值中含换行时为结束行），
+    用于错误提示。同一时刻只保留一个分块，内存占用与文件大小无关。读取错误直接抛出。
+    """
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.DictReader(f)
+        chunk = []
+        for row in reader:
+            chunk.append((reader.line_num, row))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def _cell_to_text(value):
+    """
+    将 Excel 单元格的值转换为与 CSV 一致的字符串
+    """
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M')
+    if isinstance(value, float) and value.is_integer():
+        # 电话号码等整数在 Excel 中常被保存为浮点数
+        return str(int(value))
+    return str(value)
+
+def iter_xlsx_chunks(file_path, chunk_size=5000):
+    """
+    逐块读取Excel文件第一个工作表，每次返回最多 chunk_size 行 [(行号, 行字典), ...]
+    
+    第一行为表头，行号与 Excel 中显示的行号一致（跳过的空行也计入）。
+    使用 openpyxl 只读模式按行流式读取，不会把整个工作簿载入内存。
+    """
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise Exception('读取Excel文件需要安装 openpyxl')
+    
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        headers = [_cell_to_text(value) for value in next(rows, ())]
+        chunk = []
+        for line, values in enumerate(rows, start=2):
+            if all(value is None for value in values):
+                continue
+            chunk.append((line, dict(zip(headers, (_cell_to_text(value) for value in values)))))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        workbook.close()
+
+def iter_data_chunks(file_path, chunk_size=5000):
+    """
+    按扩展名逐块读取 CSV 或 Excel 文件，每块为 [(行号, 行字典), ...]
+    """
+    if file_path.lower().endswith('.xlsx'):
+        return iter_xlsx_chunks(file_path, chunk_size)
+    return iter_csv_chunks(file_path, chunk_size)
+
 def write_csv_file(file_path, data, headers):
     """
     写入CSV文件
@@ -48,17 +124,68 @@ def format_time_string(dt):
         return dt.strftime('%Y-%m-%d %H:%M')
     return ''
 
+@lru_cache(maxsize=65536)
+def time_to_minutes(time_str):
+    """
+    将 'YYYY-MM-DD HH:MM' 转换为自 1970-01-01 起的分钟数，无法解析时返回 None
+    """
+    try:
+        dt = datetime.strptime(time_str, '%Y-%m-%d %H:%M')
+    except (TypeError, ValueError):
+        return None
+    return int((dt - EPOCH).total_seconds()) // 60
+
+def minutes_to_time(minutes):
+    """
+    将分钟数转换回 'YYYY-MM-DD HH:MM' 字符串
+    """
+    return (EPOCH + timedelta(minutes=minutes)).strftime('%Y-%m-%d %H:%M')
+
+def normalize_time(time_str):
+    """
+    将时间统一为补零的 'YYYY-MM-DD HH:MM'（如 '2024-1-16 9:00' -> '2024-01-16 09:00'），无法解析时返回 None
+    """
+    minutes = time_to_minutes(time_str)
+    if minutes is None:
+        return None
+    return minutes_to_time(minutes)
+
+def minutes_weekday(minutes):
+    """
+    分钟数对应的星期，0 表示周一
+    """
+    return (minutes // DAY_MINUTES + 3) % 7
+
+def week_start_minutes(minutes):
+    """
+    分钟数所在周的周一零点（分钟数）
+    """
+    return (minutes + WEEK_OFFSET_MINUTES) // WEEK_MINUTES * WEEK_MINUTES - WEEK_OFFSET_MINUTES
+
+def split_list(text):
+    """
+    拆分逗号分隔的列表（中英文逗号均可），去掉空白和重复项并保持原顺序
+    """
+    if not text:
+        return []
+    items = []
+    for item in text.replace('，', ',').split(','):
+        item = item.strip()
+        if item and item not in items:
+            items.append(item)
+    return items
+
 def check_time_overlap(start1, end1, start2, end2):
     """
-    检查两个时间区间是否重叠
+    检查两个时间区间是否重叠，时间可以是字符串或分钟数
     """
-    # 解析时间
-    s1 = parse_time_string(start1)
-    e1 = parse_time_string(end1)
-    s2 = parse_time_string(start2)
-    e2 = parse_time_string(end2)
+    # 转换为分钟数
+    s1, e1, s2, e2 = [
+        time_to_minutes(value) if isinstance(value, str) else value
+        for value in (start1, end1, start2, end2)
+    ]
     
-    if not all([s1, e1, s2, e2]):
+    if None in (s1, e1, s2, e2):
         return False
     
     # 检查重叠